@@ -0,0 +1,72 @@
+'''Бенчмарк чтения тела ответа HTTP-клиентом.
+
+Запуск: python -m benchmarks.bench_body_reader
+'''
+import asyncio
+import time
+
+from src.convenience.httpclient.httpclient import ResponseError, read_body
+
+# Размер блока, который aiohttp обычно отдает из StreamReader
+BLOCK_SIZE = 2 ** 16
+MAXIMUM_BODY_SIZE = 2 ** 24
+SIZES = [2 ** 10, 2 ** 14, 2 ** 17, 2 ** 20, 2 ** 22, 2 ** 24]
+
+
+class Content:
+    '''Имитация aiohttp.StreamReader, отдающая тело блоками.'''
+
+    def __init__(self, size):
+        self.remaining = size
+        self.block = b'x' * BLOCK_SIZE
+
+    async def read(self, n):
+        size = min(n, BLOCK_SIZE, self.remaining)
+        self.remaining -= size
+        return self.block[:size]
+
+    def at_eof(self):
+        return self.remaining == 0
+
+
+async def read_body_concatenation(content, maximum_body_size):
+    '''Прежняя реализация: конкатенация bytes на каждом блоке.'''
+    body = b''
+
+    while True:
+        block = await content.read(maximum_body_size - len(body))
+        body += block
+
+        if content.at_eof():
+            break
+
+        if len(body) == maximum_body_size:
+            raise ResponseError('Response too big')
+
+    return body
+
+
+async def measure(reader, size):
+    repeats = max(1, 2 ** 26 // size)
+    started = time.perf_counter()
+
+    for _ in range(repeats):
+        await reader(Content(size), MAXIMUM_BODY_SIZE)
+
+    return (time.perf_counter() - started) / repeats
+
+
+async def main():
+    print(f'''{'size':>10} {'concatenation MiB/s':>20} {'read_body MiB/s':>16} {'speedup':>8}''')
+
+    for size in SIZES:
+        old = await measure(read_body_concatenation, size)
+        new = await measure(read_body, size)
+        print(
+            f'{size:>10} {size / old / 2 ** 20:>20.1f} {size / new / 2 ** 20:>16.1f} '
+            f'{old / new:>7.1f}x'
+        )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+'''Бенчмарк тела запроса создания заказа: aiohttp.FormData против encode_create_order.
+
+Запуск: python -m benchmarks.bench_create_order_form
+'''
+import functools
+import timeit
+from decimal import Decimal
+
+import aiohttp
+
+from src.orders.forms import encode_create_order
+
+FIELDS = [
+    ('shop_id', '1086'),
+    ('phone', '79997772211'),
+    ('first_name', 'Иван Иванов'),
+    ('email', 'example@example.com'),
+    ('external_id', 10)
+]
+
+
+def form_data(items):
+    '''Прежний путь: FormData с тремя полями на товар, тело получается при отправке.'''
+    form = aiohttp.FormData(FIELDS)
+
+    for their_id, count, price in items:
+        form.add_field('ids[]', their_id)
+        form.add_field('quantity[]', count)
+        form.add_field('prices[]', price)
+
+    return form()._value
+
+
+def main():
+    print(f'''{'items':>6} {'FormData, us':>13} {'encoder, us':>12} {'speedup':>8}''')
+
+    for items_count in (1, 10, 100, 1000, 10000):
+        items = [
+            (str(number), number % 5 + 1, Decimal('455.23'))
+            for number in range(items_count)
+        ]
+        assert form_data(items) == encode_create_order(FIELDS, items)
+
+        number = max(1, 20000 // items_count)
+        old = min(timeit.repeat(
+            functools.partial(form_data, items), number=number, repeat=5
+        )) / number
+        new = min(timeit.repeat(
+            functools.partial(encode_create_order, FIELDS, items), number=number, repeat=5
+        )) / number
+        print(f'{items_count:>6} {old * 1e6:>13.1f} {new * 1e6:>12.1f} {old / new:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
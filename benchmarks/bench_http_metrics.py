@@ -0,0 +1,47 @@
+'''Бенчмарк стоимости метрик одного запроса к партнеру.
+
+Сравнивается поиск дочерних метрик по меткам на каждый запрос с метриками,
+привязанными к меткам ендпоинта заранее (EndpointMetrics).
+
+Запуск: python -m benchmarks.bench_http_metrics
+'''
+import timeit
+
+from src.convenience.httpclient import metrics
+
+REPEATS = 100000
+CLIENT = 'bench'
+ENDPOINT = 'GET /orders-data'
+
+
+def observe_labels():
+    metrics.request_duration_histogram.labels(CLIENT, ENDPOINT, '2xx').observe(0.12)
+    metrics.response_size_histogram.labels(CLIENT, ENDPOINT).observe(4096)
+    metrics.call_duration_histogram.labels(CLIENT, ENDPOINT, 'success').observe(0.12)
+    metrics.call_attempts_histogram.labels(CLIENT, ENDPOINT).observe(1)
+
+
+endpoint_metrics = metrics.EndpointMetrics(CLIENT, ENDPOINT)
+
+
+def observe_bound():
+    endpoint_metrics.durations[2].observe(0.12)
+    endpoint_metrics.response_size.observe(4096)
+    endpoint_metrics.call_durations['success'].observe(0.12)
+    endpoint_metrics.attempts.observe(1)
+
+
+def measure(function):
+    return min(timeit.repeat(function, number=REPEATS, repeat=5)) / REPEATS
+
+
+def main():
+    old = measure(observe_labels)
+    new = measure(observe_bound)
+
+    print(f'''{'labels, us':>11} {'bound, us':>10} {'speedup':>8}''')
+    print(f'{old * 1e6:>11.2f} {new * 1e6:>10.2f} {old / new:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
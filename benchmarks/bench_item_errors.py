@@ -0,0 +1,134 @@
+'''Бенчмарк разбора ошибок партнера по товарам заказа (_get_detail_from_errors).
+
+Запуск: python -m benchmarks.bench_item_errors
+'''
+import contextlib
+import functools
+import os
+import re
+import timeit
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+# Обязательные настройки сервиса, без которых не импортируется модуль заказов
+for name in (
+    'HTTP_TIMEOUT', 'HTTP_RETRIES_COUNT', 'HTTP_RETRIES_SLEEP',
+    'HTTP_TIMEOUT_ORDER', 'HTTP_RETRIES_COUNT_ORDER', 'HTTP_RETRIES_SLEEP_ORDER',
+    'RABBITMQ_TIMEOUT', 'RABBITMQ_RETRIES_COUNT', 'RABBITMQ_RETRIES_SLEEP',
+    'SOURCE_PROJECT_ID', 'KODPOST', 'METRICS_PORT'
+):
+    os.environ.setdefault(f'PARTNERAPI_{name}', '1')
+
+os.environ.setdefault('PARTNERAPI_URL', 'http://localhost')
+
+from src.convenience.contracts.loaders.input import Order, OrderClient, OrderItem
+from src.convenience.contracts.loaders.output import (
+    ListItemsPriceError,
+    ListItemsQuantityError,
+    PriceErrorItem,
+    QuantityErrorItem,
+)
+from src.orders.v2 import _get_detail_from_errors
+
+MESSAGES = [
+    'Item not found',
+    'Wrong quantity',
+    'Wrong price: current price is 641.52 or NONE',
+    'Wrong price: current price is 455.23 or 460.10',
+    'Unknown answer from items.'
+]
+
+
+def get_detail_from_errors_regex(errors_items: dict, order: Order):
+    '''Прежняя реализация: сравнения строк и re.findall на каждый товар.'''
+    quantity_errors_items = []
+    price_errors_items = []
+
+    ordered_items = {}
+    for item in order.items:
+        ordered_items[item.their_id] = {'price': item.price, 'count': item.count}
+
+    for item_id, mssg_error in errors_items.items():
+        if mssg_error[0] == 'Item not found':
+            quantity_errors_items.append(QuantityErrorItem(
+                their_id=str(item_id), ordered=int(ordered_items[item_id]['count']), available=0
+            ))
+        elif mssg_error[0] == 'Wrong quantity':
+            quantity_errors_items.append(QuantityErrorItem(
+                their_id=str(item_id), ordered=int(ordered_items[item_id]['count']), available=None
+            ))
+        elif 'Wrong price' in mssg_error[0]:
+            all_prices = re.findall(r'NONE|[0-9]*[.,]?[0-9]+', mssg_error[0])
+            available_price = 0
+
+            with contextlib.suppress(IndexError, InvalidOperation):
+                available_price = Decimal(all_prices[0 if order.order_type == 2 else 1])
+
+            if available_price == 0:
+                quantity_errors_items.append(QuantityErrorItem(
+                    their_id=str(item_id),
+                    ordered=int(ordered_items[item_id]['count']),
+                    available=0
+                ))
+            else:
+                price_errors_items.append(PriceErrorItem(
+                    their_id=str(item_id),
+                    ordered=Decimal(ordered_items[item_id]['price']),
+                    available=available_price
+                ))
+
+    return (
+        ListItemsQuantityError(items=quantity_errors_items) if quantity_errors_items else None,
+        ListItemsPriceError(items=price_errors_items) if price_errors_items else None
+    )
+
+
+def create_order(items_count, order_type):
+    return Order(
+        order_id=1,
+        date=datetime(2024, 6, 20),
+        client=OrderClient(name='Test', phone='79997772211', email='example@example.com'),
+        their_pharmacy_id='1086',
+        order_type=order_type,
+        items=[
+            OrderItem(their_id=str(number), price=Decimal('455.23'), count=2)
+            for number in range(items_count)
+        ],
+        comment='',
+        extra={}
+    )
+
+
+def main():
+    print(f'''{'lines':>6} {'type':>5} {'regex, ms':>10} {'classifier, ms':>15} {'speedup':>8}''')
+
+    for items_count in (100, 1000, 10000):
+        errors_items = {
+            str(number): [MESSAGES[number % len(MESSAGES)]] for number in range(items_count)
+        }
+
+        for order_type in (1, 2):
+            order = create_order(items_count, order_type)
+            assert get_detail_from_errors_regex(errors_items, order) == _get_detail_from_errors(
+                errors_items, order
+            )
+
+            number = max(1, 20000 // items_count)
+            old = min(timeit.repeat(
+                functools.partial(get_detail_from_errors_regex, errors_items, order),
+                number=number,
+                repeat=5
+            )) / number
+            new = min(timeit.repeat(
+                functools.partial(_get_detail_from_errors, errors_items, order),
+                number=number,
+                repeat=5
+            )) / number
+            print(
+                f'{items_count:>6} {order_type:>5} {old * 1e3:>10.2f} {new * 1e3:>15.2f} '
+                f'{old / new:>7.1f}x'
+            )
+
+
+if __name__ == '__main__':
+    main()
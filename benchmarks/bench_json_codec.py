@@ -0,0 +1,79 @@
+'''Бенчмарк кодека JSON на типичных ответах сервиса и партнера.
+
+Запуск: python -m benchmarks.bench_json_codec
+'''
+import functools
+import json
+import timeit
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+
+from src.convenience import jsoncodec
+from src.convenience.contracts.loaders.input import OrderItem
+from src.convenience.contracts.loaders.output import SendOrderResponseSuccess
+
+REPEATS = 2000
+
+
+def create_order_response(items_count):
+    '''Ответ на создание заказа в виде, который FastAPI передает в JSONResponse.'''
+    return jsonable_encoder(SendOrderResponseSuccess(
+        their_order_id='123456',
+        items=[
+            OrderItem(their_id=str(number), price=Decimal('455.23'), count=2)
+            for number in range(items_count)
+        ]
+    ))
+
+
+def orders_data_body(orders_count):
+    '''Ответ партнера /orders-data со статусами заказов.'''
+    return json.dumps({
+        'status': 'ok',
+        'data': {
+            str(number): {'status': 'delivery', 'items': [{'id': '58', 'count': 2}]}
+            for number in range(orders_count)
+        }
+    }).encode()
+
+
+def stdlib_dumps(value):
+    # Так сериализует starlette.responses.JSONResponse
+    return json.dumps(
+        value, ensure_ascii=False, allow_nan=False, indent=None, separators=(',', ':')
+    ).encode()
+
+
+def report(name, old, new):
+    old_time = timeit.timeit(old, number=REPEATS) / REPEATS
+    new_time = timeit.timeit(new, number=REPEATS) / REPEATS
+    print(
+        f'{name:<32} {old_time * 1e6:>10.1f} {new_time * 1e6:>10.1f} '
+        f'{old_time / new_time:>7.1f}x'
+    )
+
+
+def main():
+    print(f'codec: {jsoncodec.NAME}')
+    print(f'''{'payload':<32} {'json, us':>10} {'codec, us':>10} {'speedup':>8}''')
+
+    for items_count in (10, 100, 500):
+        response = create_order_response(items_count)
+        report(
+            f'encode create ({items_count} items)',
+            functools.partial(stdlib_dumps, response),
+            functools.partial(jsoncodec.dumps, response)
+        )
+
+    for orders_count in (1, 50, 500):
+        body = orders_data_body(orders_count)
+        report(
+            f'decode orders-data ({orders_count} orders)',
+            functools.partial(json.loads, body),
+            functools.partial(jsoncodec.loads, body)
+        )
+
+
+if __name__ == '__main__':
+    main()
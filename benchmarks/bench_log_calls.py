@@ -0,0 +1,100 @@
+'''Бенчмарк стоимости вызова logs.debug.
+
+Сравнивается прежний вызов (данные о процессе, потоке и задаче собираются
+на каждую запись) с отключенным уровнем debug, отключенным уровнем с ленивым
+аргументом и включенным уровнем с запомненными данными процесса и потока.
+Записи никуда не пишутся, измеряется только стоимость вызова.
+
+Запуск: python -m benchmarks.bench_log_calls
+'''
+import asyncio
+import multiprocessing
+import sys
+import threading
+import timeit
+from datetime import datetime as dt
+
+from src.convenience.logs import logs
+
+REPEATS = 100000
+
+
+def old_log(level, frame, message, **kwargs):
+    '''Прежний сбор записи.'''
+    process = multiprocessing.current_process()
+    thread = threading.current_thread()
+
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+
+    if task is None:
+        task_ID = None
+        task_name = None
+    else:
+        task_ID = id(task)
+        task_name = task.get_name()
+
+    line = {
+        'service': logs.SERVICE,
+        'version': logs.VERSION,
+        'build_number': logs.BUILD_NUMBER,
+        'timestamp': str(dt.now()),
+        'module': frame.f_globals['__name__'],
+        'line': frame.f_lineno,
+        'level': level,
+        'process_ID': process.pid,
+        'process_name': process.name,
+        'thread_ID': thread.native_id,
+        'thread_name': thread.name,
+        'task_ID': task_ID,
+        'task_name': task_name,
+        'message': message,
+        'arguments': kwargs
+    }
+
+    logs.write_line(line)
+
+
+def old_debug(message, **kwargs):
+    old_log('debug', sys._getframe().f_back, message, **kwargs)
+
+
+def call_old():
+    old_debug('Sending order to Partner', order_ID=123)
+
+
+def call_new():
+    logs.debug('Sending order to Partner', order_ID=123)
+
+
+def call_new_lazy():
+    logs.debug('Received response block', block=logs.Lazy(repr, b'0' * 1024))
+
+
+def measure(function):
+    return min(timeit.repeat(function, number=REPEATS, repeat=5)) / REPEATS
+
+
+def main():
+    logs.write_line = lambda line: None
+
+    old = measure(call_old)
+    rows = [('old, debug enabled', old)]
+
+    logs.set_level('debug')
+    rows.append(('new, debug enabled', measure(call_new)))
+
+    logs.set_level('info')
+    rows.append(('new, debug disabled', measure(call_new)))
+    rows.append(('new, disabled, lazy', measure(call_new_lazy)))
+
+    print(f'''{'call':<22} {'ns per call':>12} {'speedup':>8}''')
+
+    for name, value in rows:
+        print(f'{name:<22} {value * 1e9:>12.0f} {old / value:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+'''Бенчмарк кодирования записей логов: str(dict) против JSON lines.
+
+Записи похожи на записи сервиса: отправка заказа, полученный блок ответа
+партнера и ошибка с трассировкой. Выводится время на запись и размер записи.
+
+Запуск: python -m benchmarks.bench_log_encoder
+'''
+import json
+import timeit
+from decimal import Decimal
+
+from src.convenience.logs import logs
+
+REPEATS = 2000
+
+
+def make_line(message, arguments):
+    return {
+        'timestamp': '2024-05-20 12:00:00.000000',
+        'module': 'src.orders.v2',
+        'line': 143,
+        'level': 'debug',
+        'process_ID': 1,
+        'process_name': 'MainProcess',
+        'thread_ID': 1,
+        'thread_name': 'MainThread',
+        'task_ID': 140000000000000,
+        'task_name': 'Task-1',
+        'message': message,
+        'arguments': arguments
+    }
+
+
+def make_lines():
+    block = json.dumps({
+        'status': 'ok',
+        'data': {str(number): {'status': 'delivery'} for number in range(100)}
+    }, ensure_ascii=False).encode() + 'Доставка'.encode()
+
+    try:
+        raise ValueError('Order status mapping error')
+    except ValueError as e:
+        error = e
+
+    return {
+        'order': make_line(
+            'Sending order to Partner',
+            {'order_ID': 123, 'price': Decimal('455.23'), 'URL': 'https://partner/create'}
+        ),
+        'block': make_line('Received response block', {'block': block}),
+        'exception': make_line('Unexpected error', {'error': error})
+    }
+
+
+def old_format_lines(lines):
+    '''Прежний формат: repr словаря с неизменными полями в каждой записи.'''
+    return ''.join(
+        str({
+            'service': logs.SERVICE,
+            'version': logs.VERSION,
+            'build_number': logs.BUILD_NUMBER,
+            **line
+        }) + '\n'
+        for line in lines
+    )
+
+
+def measure(function, lines):
+    return min(timeit.repeat(lambda: function(lines), number=REPEATS, repeat=5)) / REPEATS
+
+
+def main():
+    print(
+        f'''{'line':<10} {'str, us':>8} {'json, us':>9} {'speedup':>8} '''
+        f'''{'str, bytes':>11} {'json, bytes':>12}'''
+    )
+
+    for name, line in make_lines().items():
+        lines = [line] * 100
+        old = measure(old_format_lines, lines) / len(lines)
+        new = measure(logs.format_lines, lines) / len(lines)
+        old_size = len(old_format_lines([line]).encode())
+        new_size = len(logs.format_lines([line]).encode())
+        print(
+            f'{name:<10} {old * 1e6:>8.2f} {new * 1e6:>9.2f} {old / new:>7.1f}x '
+            f'{old_size:>11} {new_size:>12}'
+        )
+
+
+if __name__ == '__main__':
+    main()
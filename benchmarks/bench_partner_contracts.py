@@ -0,0 +1,65 @@
+'''Бенчмарк разбора ответа партнера /orders-data: json + словари против контракта.
+
+Запуск: python -m benchmarks.bench_partner_contracts
+'''
+import functools
+import json
+import timeit
+
+from src.convenience.contracts import partner
+
+REPEATS = 2000
+
+
+def orders_data_body(orders_count):
+    return json.dumps({
+        'status': 'ok',
+        'data': {
+            str(number): {'status': 'delivery', 'items': [{'id': '58', 'count': 2}]}
+            for number in range(orders_count)
+        }
+    }).encode()
+
+
+def parse_dict(body, their_order_ids):
+    '''Прежний разбор: json.loads и обход словаря по ключам.'''
+    result_dict = json.loads(body)
+
+    if result_dict['status'] != 'ok':
+        raise RuntimeError(result_dict.get('errors'))
+
+    return [result_dict['data'][their_order_id]['status'] for their_order_id in their_order_ids]
+
+
+def parse_contract(body, their_order_ids):
+    '''Разбор по контракту: конверт проверяется сразу, заказы - при получении.'''
+    result = partner.decode_orders_data(body)
+
+    if result.status != 'ok':
+        raise RuntimeError(result.errors)
+
+    return [result.get_order(their_order_id)['status'] for their_order_id in their_order_ids]
+
+
+def main():
+    print(f'''{'orders':>8} {'json + dict, us':>16} {'contract, us':>13} {'speedup':>8}''')
+
+    for orders_count in (1, 10, 50, 500):
+        body = orders_data_body(orders_count)
+        their_order_ids = [str(number) for number in range(orders_count)]
+
+        # Минимум из нескольких замеров меньше подвержен шуму
+        old = min(timeit.repeat(
+            functools.partial(parse_dict, body, their_order_ids), number=REPEATS, repeat=5
+        ))
+        new = min(timeit.repeat(
+            functools.partial(parse_contract, body, their_order_ids), number=REPEATS, repeat=5
+        ))
+        print(
+            f'{orders_count:>8} {old / REPEATS * 1e6:>16.1f} {new / REPEATS * 1e6:>13.1f} '
+            f'{old / new:>7.1f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
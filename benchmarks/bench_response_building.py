@@ -0,0 +1,86 @@
+'''Бенчмарк построения и сериализации ответа на создание заказа.
+
+Сравнивается прежний путь (проверка моделей ответа и jsonable_encoder FastAPI)
+с созданием моделей без проверки и сериализацией модели сразу в JSON.
+
+Запуск: python -m benchmarks.bench_response_building
+'''
+import timeit
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+
+from src import common
+from src.convenience import jsoncodec
+from src.convenience.contracts import loader
+from src.convenience.contracts.loaders.input import OrderItem
+from src.convenience.contracts.loaders.output import SendOrderResponseSuccess
+
+REPEATS = 200
+
+
+def v2_old(items):
+    response = SendOrderResponseSuccess(their_order_id='123456', items=items)
+    return jsoncodec.dumps(jsonable_encoder(response))
+
+
+def v2_new(items):
+    response = SendOrderResponseSuccess.model_construct(their_order_id='123456', items=items)
+    return jsoncodec.dumps_model(response)
+
+
+def v1_old(items):
+    response = loader.SendOrderResponseSuccess(
+        TheirOrderId='123456',
+        Items=[
+            {'TheirId': item.TheirId, 'Price': str(item.Price), 'Count': item.Count}
+            for item in items
+        ]
+    )
+    return jsoncodec.dumps(jsonable_encoder(response))
+
+
+def v1_new(items):
+    response = loader.SendOrderResponseSuccess.model_construct(
+        TheirOrderId='123456',
+        Items=[
+            loader.SendOrderItemsResponse.model_construct(
+                TheirId=item.TheirId, Price=str(item.Price), Count=item.Count
+            )
+            for item in items
+        ]
+    )
+    return jsoncodec.dumps_model(response)
+
+
+def measure(function, items):
+    return min(timeit.repeat(lambda: function(items), number=REPEATS, repeat=5)) / REPEATS
+
+
+def main():
+    print(f'''{'version':<8} {'items':>6} {'old, us':>10} {'new, us':>10} {'speedup':>8}''')
+
+    for items_count in (1, 10, 100, 500):
+        v2_items = [
+            OrderItem(their_id=str(number), price=Decimal('455.23'), count=2)
+            for number in range(items_count)
+        ]
+        v1_items = [
+            common.Item(TheirId=str(number), Price=Decimal('455.23'), Count=2)
+            for number in range(items_count)
+        ]
+
+        for version, old, new, items in (
+            ('v1', v1_old, v1_new, v1_items),
+            ('v2', v2_old, v2_new, v2_items)
+        ):
+            old_time = measure(old, items)
+            new_time = measure(new, items)
+            print(
+                f'{version:<8} {items_count:>6} {old_time * 1e6:>10.1f} '
+                f'{new_time * 1e6:>10.1f} {old_time / new_time:>7.1f}x'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,18 @@
 '''Главный модуль сервиса.'''
 import asyncio
+import contextlib
 import sys
 
-from .convenience.httpclient import httpclient
+from .convenience import amqp
+from .convenience.httpclient import httpclient, retries
 from .convenience.logs import logs
 from prometheus_async.aio.web import start_http_server
 import uvicorn
 
 from . import api
 from . import config
+from .consumer import CommandConsumer
+from .orders import index, outbox
 
 
 async def main():
@@ -20,23 +24,137 @@ async def main():
         log_config=None)
     )
 
+    # Бюджет повторов общий для всех клиентов партнера
+    retry_budget = retries.RetryBudget(
+        config.RETRIES_BUDGET_RATIO,
+        config.RETRIES_BUDGET_MINIMUM_PER_SECOND
+    )
+
+    circuit_breaker = None
+
+    if config.CIRCUIT_BREAKER_ENABLED:
+        circuit_breaker = {
+            'failure_rate_threshold': config.CIRCUIT_BREAKER_FAILURE_RATE,
+            'slow_call_duration': config.CIRCUIT_BREAKER_SLOW_CALL_DURATION,
+            'window_size': config.CIRCUIT_BREAKER_WINDOW_SIZE,
+            'minimum_calls': config.CIRCUIT_BREAKER_MINIMUM_CALLS,
+            'open_duration': config.CIRCUIT_BREAKER_OPEN_DURATION,
+            'half_open_probes': config.CIRCUIT_BREAKER_HALF_OPEN_PROBES
+        }
+
+    hedging = None
+
+    if config.HEDGING_ENABLED:
+        hedging = {
+            'delay': config.HEDGING_DELAY,
+            'percentile': config.HEDGING_PERCENTILE,
+            'maximum_ratio': config.HEDGING_MAXIMUM_RATIO
+        }
+
+    concurrency_limit = None
+
+    if config.CONCURRENCY_LIMIT_ENABLED:
+        concurrency_limit = {
+            'initial_limit': config.CONCURRENCY_LIMIT_INITIAL,
+            'minimum_limit': config.CONCURRENCY_LIMIT_MINIMUM,
+            'maximum_limit': config.CONCURRENCY_LIMIT_MAXIMUM,
+            'latency_threshold': config.CONCURRENCY_LIMIT_LATENCY_THRESHOLD,
+            'maximum_queue': config.CONCURRENCY_LIMIT_QUEUE_SIZE,
+            'queue_timeout': config.CONCURRENCY_LIMIT_QUEUE_TIMEOUT
+        }
+
     async with (
         httpclient.HTTP(
             config.HTTP_RETRIES_COUNT,
             config.HTTP_RETRIES_SLEEP,
-            config.HTTP_TIMEOUT
+            config.HTTP_TIMEOUT,
+            name='http',
+            limit=config.HTTP_POOL_LIMIT,
+            limit_per_host=config.HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT,
+            dns_cache_ttl=config.HTTP_DNS_CACHE_TTL,
+            force_close=config.HTTP_FORCE_CLOSE,
+            circuit_breaker=circuit_breaker,
+            retry_budget=retry_budget,
+            backoff_multiplier=config.RETRIES_BACKOFF_MULTIPLIER,
+            maximum_backoff=config.RETRIES_MAXIMUM_SLEEP,
+            maximum_retry_after=config.RETRIES_MAXIMUM_RETRY_AFTER,
+            idempotency=config.RETRIES_IDEMPOTENCY,
+            # Дублируются только идемпотентные запросы поиска и статусов заказов
+            hedging=hedging,
+            single_flight=config.SINGLE_FLIGHT_ENABLED,
+            concurrency_limit=concurrency_limit,
+            rate_limits=config.RATE_LIMITS,
+            rate_limit_maximum_wait=config.RATE_LIMIT_MAXIMUM_WAIT,
+            logging_sample_rates=config.LOG_SAMPLE_RATES
         ) as http,
         httpclient.HTTP(
             config.HTTP_RETRIES_COUNT_ORDER,
             config.HTTP_RETRIES_SLEEP_ORDER,
-            config.HTTP_TIMEOUT_ORDER
+            config.HTTP_TIMEOUT_ORDER,
+            name='order_http',
+            limit=config.HTTP_POOL_LIMIT_ORDER,
+            limit_per_host=config.HTTP_POOL_LIMIT_PER_HOST_ORDER,
+            keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT_ORDER,
+            dns_cache_ttl=config.HTTP_DNS_CACHE_TTL_ORDER,
+            force_close=config.HTTP_FORCE_CLOSE_ORDER,
+            circuit_breaker=circuit_breaker,
+            retry_budget=retry_budget,
+            backoff_multiplier=config.RETRIES_BACKOFF_MULTIPLIER,
+            maximum_backoff=config.RETRIES_MAXIMUM_SLEEP,
+            maximum_retry_after=config.RETRIES_MAXIMUM_RETRY_AFTER,
+            idempotency=config.RETRIES_IDEMPOTENCY,
+            single_flight=config.SINGLE_FLIGHT_ENABLED,
+            concurrency_limit=concurrency_limit,
+            rate_limits=config.RATE_LIMITS,
+            rate_limit_maximum_wait=config.RATE_LIMIT_MAXIMUM_WAIT,
+            logging_sample_rates=config.LOG_SAMPLE_RATES
         ) as order_http,
+        contextlib.AsyncExitStack() as stack,
         asyncio.TaskGroup() as task_group
     ):
+        if config.ORDER_INDEX_PATH:
+            index.open_index(config.ORDER_INDEX_PATH, config.ORDER_INDEX_CACHE_SIZE)
+            stack.callback(index.close_index)
+
         api.app.order_http = order_http
         api.app.http = http
 
-        task_group.create_task(server.serve(), name='API')
+        # Соединение с RabbitMQ, общее для outbox и обработчика команд
+        message_broker = None
+
+        if config.ORDER_OUTBOX_PATH or config.MODE == 'consumer':
+            message_broker = await stack.enter_async_context(amqp.AMQPBroker(
+                config.RABBITMQ_URL,
+                config.CONSUMER_PREFETCH,
+                config.RABBITMQ_TIMEOUT
+            ))
+
+        if config.ORDER_OUTBOX_PATH:
+            api.app.order_submitter = outbox.OrderSubmitter(
+                outbox.Outbox(config.ORDER_OUTBOX_PATH),
+                message_broker,
+                order_http,
+                http,
+                config.ORDER_OUTBOX_WORKERS,
+                config.ORDER_RESULTS_QUEUE
+            )
+            task_group.create_task(api.app.order_submitter.run(), name='order submitter')
+
+        # Режим consumer - команды читаются из очереди RabbitMQ вместо HTTP API
+        if config.MODE == 'consumer':
+            consumer = CommandConsumer(
+                message_broker,
+                order_http,
+                http,
+                config.CONSUMER_QUEUE,
+                config.CONSUMER_RESULTS_QUEUE,
+                config.CONSUMER_PREFETCH,
+                config.CONSUMER_CONCURRENCY
+            )
+            task_group.create_task(consumer.run(), name='consumer')
+        else:
+            task_group.create_task(server.serve(), name='API')
         task_group.create_task(start_http_server(port=config.METRICS_PORT), name='metrics')
 
         logs.info('Initialization finished')
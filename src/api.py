@@ -1,10 +1,50 @@
 '''API-роутер сервиса.'''
-from fastapi import FastAPI
-from .config import PROJECT_NAME
+import math
+
+from fastapi import FastAPI, Request
+from .config import PROJECT_NAME, REQUEST_TIMEOUT, SERVER_TIMING_ENABLED
+from .convenience.httpclient import deadline, timing
+from .convenience.jsoncodec import CodecJSONResponse
 from .routers.v1 import router as router_v1
 from .routers.v2 import router as router_v2
 
-app = FastAPI(title=PROJECT_NAME)
+# Заголовок с крайним сроком обработки запроса, секунды
+TIMEOUT_HEADER = 'X-Request-Timeout'
+
+app = FastAPI(title=PROJECT_NAME, default_response_class=CodecJSONResponse)
+
+
+@app.middleware('http')
+async def propagate_deadline(request: Request, call_next):
+    '''Установка крайнего срока обработки запроса для обращений к партнеру.'''
+    timeout = REQUEST_TIMEOUT
+
+    try:
+        requested = float(request.headers[TIMEOUT_HEADER])
+    except (KeyError, ValueError):
+        requested = None
+
+    # Срок из заголовка только сокращает срок по умолчанию, nan, inf и <= 0 игнорируются
+    if requested is not None and math.isfinite(requested) and requested > 0:
+        timeout = min(requested, timeout) if timeout else requested
+
+    with deadline.deadline(timeout):
+        return await call_next(request)
+
+
+async def add_server_timing(request: Request, call_next):
+    '''Время фаз запросов к партнеру в заголовке Server-Timing ответа.'''
+    with timing.collect() as phases:
+        response = await call_next(request)
+
+    if phases:
+        response.headers['Server-Timing'] = timing.server_timing(phases)
+
+    return response
+
+
+if SERVER_TIMING_ENABLED:
+    app.middleware('http')(add_server_timing)
 
 app.include_router(router_v1, tags=['Версия 1'])
 app.include_router(router_v2, prefix='/v2/orders', tags=['Версия 2'])
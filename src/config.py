@@ -3,6 +3,70 @@ import os
 
 PROJECT_NAME = 'PartnerAPI'
 
+
+def flag(value):
+    '''Преобразование значения переменной среды в bool.'''
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+
+def rate_limits(value):
+    '''Разбор ограничений частоты запросов вида "POST /create=10:20,GET /find-orders=50".'''
+    limits = {}
+
+    for rule in filter(None, (rule.strip() for rule in value.split(','))):
+        name, limit = rule.rsplit('=', 1)
+        method, path = endpoint(name)
+        rate, _, burst = limit.partition(':')
+        rate = float(rate)
+        burst = int(burst or max(1, rate))
+
+        if rate <= 0 or burst < 1:
+            raise ValueError(f'Rate limit must be positive: {rule!r}')
+
+        limits[f'{method} {path}'] = (rate, burst)
+
+    return limits
+
+
+def endpoint(value):
+    '''Разбор ендпоинта вида "POST /create" в пару (метод, окончание пути).'''
+    method, _, path = value.strip().partition(' ')
+    path = path.strip()
+
+    if not method.isalpha() or not method.isupper() or not path.startswith('/'):
+        raise ValueError(f'Endpoint must look like "METHOD /path": {value!r}')
+
+    return method, path
+
+
+def idempotency(value):
+    '''Разбор идемпотентности запросов по ендпоинтам вида "POST /cancel=true,GET /create=0".'''
+    rules = {}
+
+    for rule in filter(None, (rule.strip() for rule in value.split(','))):
+        name, idempotent = rule.rsplit('=', 1)
+        rules[endpoint(name)] = flag(idempotent.strip())
+
+    return rules
+
+
+def sample_rates(value):
+    '''Разбор долей логируемых запросов вида "GET /orders-data=0.01,POST /create=1".'''
+    rates = {}
+
+    for rule in filter(None, (rule.strip() for rule in value.split(','))):
+        name, rate = rule.rsplit('=', 1)
+        method, path = endpoint(name)
+        rate = float(rate)
+
+        if not 0 <= rate <= 1:
+            raise ValueError(f'Sample rate must be between 0 and 1: {rule!r}')
+
+        rates[f'{method} {path}'] = rate
+
+    return rates
+
+
 options = {
     'HTTP_TIMEOUT': float,
     'HTTP_RETRIES_COUNT': int,
@@ -12,6 +76,77 @@ options = {
     'HTTP_RETRIES_COUNT_ORDER': int,
     'HTTP_RETRIES_SLEEP_ORDER': float,
 
+    'HTTP_POOL_LIMIT': int,
+    'HTTP_POOL_LIMIT_PER_HOST': int,
+    'HTTP_KEEPALIVE_TIMEOUT': float,
+    'HTTP_DNS_CACHE_TTL': int,
+    'HTTP_FORCE_CLOSE': flag,
+
+    'HTTP_POOL_LIMIT_ORDER': int,
+    'HTTP_POOL_LIMIT_PER_HOST_ORDER': int,
+    'HTTP_KEEPALIVE_TIMEOUT_ORDER': float,
+    'HTTP_DNS_CACHE_TTL_ORDER': int,
+    'HTTP_FORCE_CLOSE_ORDER': flag,
+
+    'RETRIES_BACKOFF_MULTIPLIER': float,
+    'RETRIES_MAXIMUM_SLEEP': float,
+    'RETRIES_BUDGET_RATIO': float,
+    'RETRIES_BUDGET_MINIMUM_PER_SECOND': float,
+    'RETRIES_MAXIMUM_RETRY_AFTER': float,
+    'RETRIES_IDEMPOTENCY': idempotency,
+
+    'CIRCUIT_BREAKER_ENABLED': flag,
+    'CIRCUIT_BREAKER_FAILURE_RATE': float,
+    'CIRCUIT_BREAKER_SLOW_CALL_DURATION': float,
+    'CIRCUIT_BREAKER_WINDOW_SIZE': int,
+    'CIRCUIT_BREAKER_MINIMUM_CALLS': int,
+    'CIRCUIT_BREAKER_OPEN_DURATION': float,
+    'CIRCUIT_BREAKER_HALF_OPEN_PROBES': int,
+
+    'HEDGING_ENABLED': flag,
+    'HEDGING_DELAY': float,
+    'HEDGING_PERCENTILE': float,
+    'HEDGING_MAXIMUM_RATIO': float,
+
+    'SINGLE_FLIGHT_ENABLED': flag,
+
+    'ORDER_STATUS_BATCH_WINDOW': float,
+    'ORDER_STATUS_BATCH_MAXIMUM_SIZE': int,
+    'ORDER_STATUS_BATCH_CONCURRENCY': int,
+
+    'CONCURRENCY_LIMIT_ENABLED': flag,
+    'CONCURRENCY_LIMIT_INITIAL': int,
+    'CONCURRENCY_LIMIT_MINIMUM': int,
+    'CONCURRENCY_LIMIT_MAXIMUM': int,
+    'CONCURRENCY_LIMIT_LATENCY_THRESHOLD': float,
+    'CONCURRENCY_LIMIT_QUEUE_SIZE': int,
+    'CONCURRENCY_LIMIT_QUEUE_TIMEOUT': float,
+
+    'RATE_LIMITS': rate_limits,
+    'RATE_LIMIT_MAXIMUM_WAIT': float,
+
+    'LOG_SAMPLE_RATES': sample_rates,
+
+    'SERVER_TIMING_ENABLED': flag,
+
+    'REQUEST_TIMEOUT': float,
+
+    'ORDER_INDEX_PATH': str,
+    'ORDER_INDEX_CACHE_SIZE': int,
+
+    'ORDER_OUTBOX_PATH': str,
+    'ORDER_OUTBOX_WORKERS': int,
+    'ORDER_OUTBOX_RETRIES_SLEEP_MAX': float,
+    'ORDER_RESULTS_QUEUE': str,
+
+    'MODE': str,
+    'CONSUMER_QUEUE': str,
+    'CONSUMER_RESULTS_QUEUE': str,
+    'CONSUMER_PREFETCH': int,
+    'CONSUMER_CONCURRENCY': int,
+
+    'RABBITMQ_URL': str,
+
     'URL': str,
 
     'RABBITMQ_TIMEOUT': float,
@@ -24,7 +159,97 @@ options = {
     'METRICS_PORT': int
 }
 
+# Значения по умолчанию для необязательных переменных
+defaults = {
+    'HTTP_POOL_LIMIT': 100,
+    'HTTP_POOL_LIMIT_PER_HOST': 0,
+    'HTTP_KEEPALIVE_TIMEOUT': 15,
+    'HTTP_DNS_CACHE_TTL': 10,
+    'HTTP_FORCE_CLOSE': False,
+
+    'HTTP_POOL_LIMIT_ORDER': 100,
+    'HTTP_POOL_LIMIT_PER_HOST_ORDER': 0,
+    'HTTP_KEEPALIVE_TIMEOUT_ORDER': 15,
+    'HTTP_DNS_CACHE_TTL_ORDER': 10,
+    'HTTP_FORCE_CLOSE_ORDER': False,
+
+    'RETRIES_BACKOFF_MULTIPLIER': 2,
+    'RETRIES_MAXIMUM_SLEEP': 60,
+    'RETRIES_BUDGET_RATIO': 0.2,
+    'RETRIES_BUDGET_MINIMUM_PER_SECOND': 1,
+    'RETRIES_MAXIMUM_RETRY_AFTER': 60,
+    'RETRIES_IDEMPOTENCY': '',
+
+    'CIRCUIT_BREAKER_ENABLED': True,
+    'CIRCUIT_BREAKER_FAILURE_RATE': 0.5,
+    'CIRCUIT_BREAKER_SLOW_CALL_DURATION': 0,
+    'CIRCUIT_BREAKER_WINDOW_SIZE': 20,
+    'CIRCUIT_BREAKER_MINIMUM_CALLS': 10,
+    'CIRCUIT_BREAKER_OPEN_DURATION': 30,
+    'CIRCUIT_BREAKER_HALF_OPEN_PROBES': 1,
+
+    'HEDGING_ENABLED': False,
+    'HEDGING_DELAY': 0,
+    'HEDGING_PERCENTILE': 0.95,
+    'HEDGING_MAXIMUM_RATIO': 0.1,
+
+    'SINGLE_FLIGHT_ENABLED': True,
+
+    'ORDER_STATUS_BATCH_WINDOW': 0.01,
+    'ORDER_STATUS_BATCH_MAXIMUM_SIZE': 50,
+    'ORDER_STATUS_BATCH_CONCURRENCY': 4,
+
+    'CONCURRENCY_LIMIT_ENABLED': False,
+    'CONCURRENCY_LIMIT_INITIAL': 20,
+    'CONCURRENCY_LIMIT_MINIMUM': 1,
+    'CONCURRENCY_LIMIT_MAXIMUM': 100,
+    'CONCURRENCY_LIMIT_LATENCY_THRESHOLD': 0,
+    'CONCURRENCY_LIMIT_QUEUE_SIZE': 100,
+    'CONCURRENCY_LIMIT_QUEUE_TIMEOUT': 5,
+
+    'RATE_LIMITS': '',
+    'RATE_LIMIT_MAXIMUM_WAIT': 5,
+
+    'LOG_SAMPLE_RATES': '',
+
+    'SERVER_TIMING_ENABLED': False,
+
+    'REQUEST_TIMEOUT': 0,
+
+    'ORDER_INDEX_PATH': '',
+    'ORDER_INDEX_CACHE_SIZE': 100000,
+
+    'ORDER_OUTBOX_PATH': '',
+    'ORDER_OUTBOX_WORKERS': 4,
+    'ORDER_OUTBOX_RETRIES_SLEEP_MAX': 600,
+    'ORDER_RESULTS_QUEUE': 'partnerapi.orders.results',
+
+    'MODE': 'api',
+    'CONSUMER_QUEUE': 'partnerapi.orders.commands',
+    'CONSUMER_RESULTS_QUEUE': 'partnerapi.orders.commands.results',
+    'CONSUMER_PREFETCH': 100,
+    'CONSUMER_CONCURRENCY': 10,
+
+    'RABBITMQ_URL': ''
+}
+
 variables = globals()
 
 for name in options:
-    variables[name] = options[name](os.environ[f'{PROJECT_NAME.upper()}_{name}'])
+    key = f'{PROJECT_NAME.upper()}_{name}'
+
+    if name in defaults:
+        variables[name] = options[name](os.environ.get(key, defaults[name]))
+    else:
+        variables[name] = options[name](os.environ[key])
+
+# Outbox и режим consumer работают через RabbitMQ
+if variables['RABBITMQ_RETRIES_COUNT'] < -1:
+    raise ValueError(f'{PROJECT_NAME.upper()}_RABBITMQ_RETRIES_COUNT must be -1 or more')
+
+uses_broker = variables['ORDER_OUTBOX_PATH'] or variables['MODE'] == 'consumer'
+
+if uses_broker and not variables['RABBITMQ_URL']:
+    raise ValueError(
+        f'{PROJECT_NAME.upper()}_RABBITMQ_URL is required for outbox and consumer mode'
+    )
@@ -0,0 +1,186 @@
+'''Обработка команд по заказам из очереди сообщений.'''
+import asyncio
+
+from pydantic import ValidationError
+
+from . import config, metrics
+from .convenience import broker as brokers
+from .convenience import jsoncodec
+from .convenience.contracts.loaders.input import (
+    CancelOrderRequest,
+    GetOrderStatusRequest,
+    Order,
+)
+from .convenience.contracts.loaders.output import (
+    DataError,
+    SendOrderResponseError,
+    TransientErrorResponse,
+)
+from .convenience.logs import logs
+from .orders import v2 as orders
+
+# Модели данных команд
+COMMANDS = {
+    'create': Order,
+    'status': GetOrderStatusRequest,
+    'cancel': CancelOrderRequest
+}
+
+
+class CommandConsumer:
+    '''
+    Обработчик команд create/status/cancel из очереди.
+
+    Сообщение - json вида {"command": "create", "data": {...}, "correlation_id": ...},
+    data совпадает с телом соответствующего метода API 2 версии. Сообщения
+    читаются пачками до prefetch штук, команды статусов пачки запрашиваются
+    у партнера одним запросом на часть заказов, остальные команды выполняются
+    параллельно (не более concurrency одновременно). Ответы публикуются в
+    results_queue, после обработки пачка подтверждается одним ack.
+    '''
+
+    def __init__(
+            self,
+            broker,
+            create_order_http,
+            http,
+            queue: str,
+            results_queue: str,
+            prefetch: int,
+            concurrency: int):
+        self.broker = broker
+        self.create_order_http = create_order_http
+        self.http = http
+        self.queue = queue
+        self.results_queue = results_queue
+        self.prefetch = prefetch
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    async def receive(self, timeout: float | None = None) -> list:
+        '''Получение пачки сообщений: ожидание первого и все уже пришедшие до prefetch.'''
+        message = await self.broker.get(self.queue, timeout)
+
+        if message is None:
+            return []
+
+        messages = [message]
+
+        while len(messages) < self.prefetch:
+            message = self.broker.get_nowait(self.queue)
+
+            if message is None:
+                break
+
+            messages.append(message)
+
+        return messages
+
+    async def _create(self, order: Order):
+        async with self.semaphore:
+            try:
+                return await orders.create_order(self.create_order_http, self.http, order)
+            except Exception as e:  # noqa: BLE001
+                logs.exception_caught('Error while creating order', error=str(e))
+                return SendOrderResponseError(data=DataError(partner_error=True))
+
+    async def _cancel(self, order: CancelOrderRequest):
+        async with self.semaphore:
+            return await orders.cancel_order(
+                self.create_order_http,
+                order.order_id,
+                order.their_order_id
+            )
+
+    async def handle(self, messages: list) -> list[dict]:
+        '''Выполнение команд пачки, ответы в порядке сообщений.'''
+        results = [None] * len(messages)
+        statuses = []
+        tasks = {}
+
+        for number, message in enumerate(messages):
+            try:
+                command = jsoncodec.loads(message.body)
+                name = command['command']
+                data = COMMANDS[name].model_validate(command['data'])
+            except (ValueError, KeyError, TypeError, ValidationError) as e:
+                # Некорректное сообщение не возвращается в очередь
+                logs.error('Invalid command', error=repr(e))
+                metrics.consumer_commands_counter.labels(config.PROJECT_NAME, 'invalid').inc()
+                results[number] = {
+                    'command': None,
+                    'correlation_id': None,
+                    'response': {'result': 'invalid_command', 'message': repr(e)}
+                }
+                continue
+
+            metrics.consumer_commands_counter.labels(config.PROJECT_NAME, name).inc()
+            results[number] = {
+                'command': name,
+                'correlation_id': command.get('correlation_id')
+            }
+
+            if name == 'status':
+                statuses.append((number, data))
+            elif name == 'create':
+                tasks[number] = asyncio.ensure_future(self._create(data))
+            else:
+                tasks[number] = asyncio.ensure_future(self._cancel(data))
+
+        if statuses:
+            try:
+                responses = await orders.get_orders_statuses(
+                    self.http, [order for _, order in statuses]
+                )
+            except Exception as e:  # noqa: BLE001
+                logs.exception_caught('Error while getting orders statuses', error=str(e))
+                responses = [TransientErrorResponse(message=str(e))] * len(statuses)
+
+            for (number, _), response in zip(statuses, responses):
+                results[number]['response'] = response
+
+        if tasks:
+            await asyncio.gather(*tasks.values())
+
+            for number, task in tasks.items():
+                results[number]['response'] = task.result()
+
+        for result in results:
+            if not isinstance(result['response'], dict):
+                result['response'] = result['response'].model_dump(mode='json')
+
+        return results
+
+    async def process(self, messages: list):
+        '''Обработка пачки сообщений с публикацией ответов и подтверждением.'''
+        metrics.consumer_batch_size.labels(config.PROJECT_NAME).observe(len(messages))
+        last_tag = messages[-1].delivery_tag
+
+        try:
+            for result in await self.handle(messages):
+                await brokers.publish(
+                    self.broker,
+                    self.results_queue,
+                    jsoncodec.dumps(result),
+                    config.RABBITMQ_TIMEOUT,
+                    config.RABBITMQ_RETRIES_COUNT,
+                    config.RABBITMQ_RETRIES_SLEEP
+                )
+        except Exception:
+            # Пачка будет обработана повторно, команды идемпотентны
+            logs.exception_caught('Error while processing commands', count=len(messages))
+            await self.broker.nack(last_tag, multiple=True)
+            raise
+
+        await self.broker.ack(last_tag, multiple=True)
+
+    async def run(self):
+        '''Чтение и обработка команд, пока задача не будет отменена.'''
+        logs.info('Consumer started', queue=self.queue)
+
+        while True:
+            messages = await self.receive()
+
+            try:
+                await self.process(messages)
+            except Exception:  # noqa: BLE001
+                await asyncio.sleep(config.RABBITMQ_RETRIES_SLEEP)
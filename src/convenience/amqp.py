@@ -0,0 +1,101 @@
+'''Брокер сообщений RabbitMQ (AMQP 0-9-1) на aio-pika.'''
+import asyncio
+
+import aio_pika
+
+from .broker import Message
+
+
+class AMQPBroker:
+    # Интерфейс совпадает с InMemoryBroker: publish, get, get_nowait, ack и nack
+    # по delivery_tag. Очереди объявляются устойчивыми (durable) при первом
+    # обращении, сообщения публикуются с сохранением на диск и подтверждением
+    # публикации брокером. Чтение - через подписку с ограничением prefetch
+    # неподтвержденных сообщений
+    def __init__(self, url: str, prefetch: int = 100, timeout: float | None = None):
+        self.url = url
+        self.prefetch = prefetch
+        self.timeout = timeout
+        self.connection = None
+        self.channel = None
+        self.queues = {}
+        self.buffers = {}
+        self.unacked = {}
+
+    async def __aenter__(self):
+        self.connection = await aio_pika.connect_robust(self.url, timeout=self.timeout)
+        self.channel = await self.connection.channel()
+        await self.channel.set_qos(prefetch_count=self.prefetch)
+
+        return self
+
+    async def __aexit__(self, exception_type, exception, traceback):
+        await self.connection.close()
+
+    async def _declare(self, queue: str):
+        if queue not in self.queues:
+            self.queues[queue] = await self.channel.declare_queue(queue, durable=True)
+
+        return self.queues[queue]
+
+    async def _subscribe(self, queue: str) -> asyncio.Queue:
+        if queue not in self.buffers:
+            buffer = self.buffers[queue] = asyncio.Queue()
+            await (await self._declare(queue)).consume(buffer.put)
+
+        return self.buffers[queue]
+
+    def _received(self, queue: str, incoming) -> Message:
+        self.unacked[incoming.delivery_tag] = incoming
+
+        return Message(queue, incoming.body, incoming.delivery_tag)
+
+    async def publish(self, queue: str, body: bytes):
+        await self._declare(queue)
+        await self.channel.default_exchange.publish(
+            aio_pika.Message(body, delivery_mode=aio_pika.DeliveryMode.PERSISTENT),
+            routing_key=queue
+        )
+
+    async def get(self, queue: str, timeout: float | None = None) -> Message | None:
+        buffer = await self._subscribe(queue)
+
+        try:
+            incoming = await asyncio.wait_for(buffer.get(), timeout)
+        except TimeoutError:
+            return None
+
+        return self._received(queue, incoming)
+
+    def get_nowait(self, queue: str) -> Message | None:
+        # Без подписки (до первого get) сообщений еще нет
+        try:
+            incoming = self.buffers[queue].get_nowait()
+        except (KeyError, asyncio.QueueEmpty):
+            return None
+
+        return self._received(queue, incoming)
+
+    def _settled(self, delivery_tag: int, multiple: bool):
+        if not multiple:
+            return [delivery_tag] if delivery_tag in self.unacked else []
+
+        return [tag for tag in self.unacked if tag <= delivery_tag]
+
+    async def ack(self, delivery_tag: int, multiple: bool = False):
+        tags = self._settled(delivery_tag, multiple)
+
+        if tags:
+            await self.unacked[delivery_tag].ack(multiple=multiple)
+
+        for tag in tags:
+            del self.unacked[tag]
+
+    async def nack(self, delivery_tag: int, multiple: bool = False, requeue: bool = True):
+        tags = self._settled(delivery_tag, multiple)
+
+        if tags:
+            await self.unacked[delivery_tag].nack(multiple=multiple, requeue=requeue)
+
+        for tag in tags:
+            del self.unacked[tag]
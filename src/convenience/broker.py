@@ -0,0 +1,90 @@
+'''Брокер сообщений в памяти процесса (замена RabbitMQ в тестах).'''
+import asyncio
+import collections
+import dataclasses
+import itertools
+
+
+@dataclasses.dataclass
+class Message:
+    queue: str
+    body: bytes
+    delivery_tag: int = 0
+
+
+class InMemoryBroker:
+    # Повторяет семантику AMQP, нужную сервису: очереди по имени, подтверждение
+    # (ack) по delivery_tag, в том числе всех сообщений до него (multiple),
+    # и возврат неподтвержденных сообщений в очередь (nack)
+    def __init__(self):
+        self.queues = collections.defaultdict(asyncio.Queue)
+        self.unacked = {}
+        self.tags = itertools.count(1)
+
+    async def publish(self, queue: str, body: bytes):
+        await self.queues[queue].put(Message(queue, body))
+
+    async def get(self, queue: str, timeout: float | None = None) -> Message | None:
+        try:
+            message = await asyncio.wait_for(self.queues[queue].get(), timeout)
+        except TimeoutError:
+            return None
+
+        message = dataclasses.replace(message, delivery_tag=next(self.tags))
+        self.unacked[message.delivery_tag] = message
+
+        return message
+
+    def get_nowait(self, queue: str) -> Message | None:
+        try:
+            message = self.queues[queue].get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+
+        message = dataclasses.replace(message, delivery_tag=next(self.tags))
+        self.unacked[message.delivery_tag] = message
+
+        return message
+
+    def _settled(self, delivery_tag: int, multiple: bool):
+        if not multiple:
+            return [delivery_tag] if delivery_tag in self.unacked else []
+
+        return [tag for tag in self.unacked if tag <= delivery_tag]
+
+    async def ack(self, delivery_tag: int, multiple: bool = False):
+        for tag in self._settled(delivery_tag, multiple):
+            del self.unacked[tag]
+
+    async def nack(self, delivery_tag: int, multiple: bool = False, requeue: bool = True):
+        for tag in self._settled(delivery_tag, multiple):
+            message = self.unacked.pop(tag)
+
+            if requeue:
+                self.queues[message.queue].put_nowait(dataclasses.replace(message, delivery_tag=0))
+
+
+def attempts(retries_count: int):
+    # Номера попыток: повторов retries_count, -1 - без ограничения
+    if retries_count < 0:
+        return itertools.count()
+
+    return range(retries_count + 1)
+
+
+async def publish(
+        broker,
+        queue: str,
+        body: bytes,
+        timeout: float,
+        retries_count: int,
+        retries_sleep: float):
+    # Публикация с таймаутом и повторами (настройки RABBITMQ_*)
+    for attempt in attempts(retries_count):
+        try:
+            return await asyncio.wait_for(broker.publish(queue, body), timeout)
+        except Exception:
+            if attempt == retries_count:
+                raise
+
+        await asyncio.sleep(retries_sleep)
@@ -67,6 +67,12 @@ class GetOrderStatusRequest(BaseModel):
     their_status_id: int | None = Field(None, ge=-2 ** 63, lt=2 ** 63)
 
 
+class GetOrderStatusBatchRequest(BaseModel):
+    '''Модель запроса получения статусов списка заказов.'''
+
+    orders: list[GetOrderStatusRequest] = Field(min_length=1, max_length=10000)
+
+
 class CancelOrderRequest(BaseModel):
     '''Модель запроса отмены заказа.'''
 
@@ -59,6 +59,13 @@ class SendOrderResponseSuccess(BaseModel):
     items: list[OrderItem]
 
 
+class SendOrderResponseAccepted(BaseModel):
+    '''Модель ответа о принятии заказа к асинхронной отправке.'''
+
+    result: Literal['accepted'] = 'accepted'
+    order_id: int
+
+
 class GetOrderStatusItem(BaseModel):
     '''Модель товаров при получении статуса заказа.'''
 
@@ -0,0 +1,125 @@
+'''Модели ответов API партнера.'''
+from typing import Annotated, Any
+
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, model_validator
+from typing_extensions import TypedDict
+
+from .. import jsoncodec
+
+
+class PartnerResponseError(Exception):
+    '''Ответ партнера не соответствует контракту.'''
+
+
+# Ид заказа партнера возвращается в ответах API (their_order_id), его размер ограничен
+TheirOrderId = (
+    Annotated[int, Field(ge=-2 ** 63, le=2 ** 63 - 1)]
+    | Annotated[str, Field(min_length=1, max_length=256)]
+)
+
+
+class FindOrdersData(BaseModel):
+    '''Модель найденных заказов.'''
+
+    ids: list[TheirOrderId]                             # ид заказов партнера
+
+
+class FindOrdersResponse(BaseModel):
+    '''Модель ответа поиска заказов по нашему ид (/find-orders).'''
+
+    data: FindOrdersData
+
+
+class CreateOrderResponse(BaseModel):
+    '''Модель ответа создания заказа (/create).'''
+
+    status: str                                         # ok или error
+    order_id: TheirOrderId | None = None                # ид созданного заказа
+    errors: dict[str, Any] | list | str | None = None   # описание ошибок
+
+    @model_validator(mode='after')
+    def check_order_id(self):
+        # Без ид созданный заказ нельзя ни вернуть, ни запомнить в индексе
+        if self.status == 'ok' and self.order_id is None:
+            raise ValueError('order_id is required when status is ok')
+
+        return self
+
+    def get_item_errors(self) -> dict[str, list[str]]:
+        '''Ошибки по товарам, исключение - ошибка не по товарам.'''
+        if not isinstance(self.errors, dict) or 'items' not in self.errors:
+            raise PartnerResponseError(f'No items errors in partner response: {self.errors}')
+
+        try:
+            return item_errors_adapter.validate_python(self.errors['items'])
+        except ValidationError as e:
+            raise PartnerResponseError(f'Invalid items errors in partner response: {e}') from e
+
+
+class OrderData(TypedDict):
+    '''Модель данных заказа партнера.'''
+
+    # Словарь проверяется быстрее модели, остальные поля заказа отбрасываются
+    status: str                                         # статус заказа у партнера
+
+
+class OrdersDataResponse(BaseModel):
+    '''Модель ответа с данными заказов (/orders-data).'''
+
+    status: str                                         # ok или error
+    # Словарь проверяется первым, без попытки разобрать его как список.
+    # Заказы проверяются по одному при получении: ошибка в одном не влияет на остальные
+    data: dict[str, Any] | list = Field({}, union_mode='left_to_right')
+    errors: Any = None                                  # описание ошибок
+
+    def get_order(self, their_order_id: str) -> OrderData:
+        '''Данные заказа, KeyError - заказа нет в ответе.'''
+        # Пустые данные партнер отдает списком
+        if not isinstance(self.data, dict):
+            raise KeyError(their_order_id)
+
+        order = self.data[their_order_id]
+
+        # Данные заказа проверяются на месте, модель нужна только для описания ошибки
+        if type(order) is dict and type(order.get('status')) is str:
+            return {'status': order['status']}
+
+        try:
+            return order_data_adapter.validate_python(order)
+        except ValidationError as e:
+            raise PartnerResponseError(
+                f'Invalid partner response for order {their_order_id}: {e}'
+            ) from e
+
+
+class CancelOrderResponse(BaseModel):
+    '''Модель ответа отмены заказа (/cancel).'''
+
+    status: str | None = None                           # ok или error
+    errors: list | str | None = None                    # описание ошибок
+
+
+# Схемы проверки строятся один раз при импорте
+find_orders_adapter = TypeAdapter(FindOrdersResponse)
+create_order_adapter = TypeAdapter(CreateOrderResponse)
+orders_data_adapter = TypeAdapter(OrdersDataResponse)
+order_data_adapter = TypeAdapter(OrderData)
+cancel_order_adapter = TypeAdapter(CancelOrderResponse)
+item_errors_adapter = TypeAdapter(dict[str, list[str]])
+
+
+def decode(adapter: TypeAdapter, body: bytes):
+    '''Разбор и проверка ответа партнера сразу из байтов тела.'''
+    try:
+        return adapter.validate_json(body)
+    except ValidationError as e:
+        raise PartnerResponseError(f'Invalid partner response: {e}') from e
+
+
+def decode_orders_data(body: bytes) -> OrdersDataResponse:
+    '''Разбор ответа /orders-data: конверт проверяется сразу, заказы - при получении.'''
+    # Данные заказов без схемы разбираются кодеком быстрее, чем проверкой из JSON
+    try:
+        return orders_data_adapter.validate_python(jsoncodec.loads(body))
+    except (ValueError, ValidationError) as e:
+        raise PartnerResponseError(f'Invalid partner response: {e}') from e
@@ -0,0 +1,170 @@
+'''Автоматический выключатель (circuit breaker) для ендпоинтов партнера.'''
+import asyncio
+import collections
+import time
+
+import aiohttp
+
+from ..logs import logs
+from . import metrics
+from .errors import DeadlineTimeoutError, RequestRejectedError
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+
+# Значения метрики состояния
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(RequestRejectedError):
+    pass
+
+
+def is_failure(exception):
+    # Ошибки клиента (кроме 429) говорят о запросе, а не о состоянии партнера
+    if isinstance(exception, aiohttp.ClientResponseError):
+        return exception.status >= 500 or exception.status == 429
+
+    return True
+
+
+class CircuitBreaker:
+    def __init__(
+            self,
+            client: str,
+            endpoint: str,
+            failure_rate_threshold: float = 0.5,
+            slow_call_duration: float | None = None,
+            window_size: int = 20,
+            minimum_calls: int = 10,
+            open_duration: float = 30,
+            half_open_probes: int = 1):
+        self.client = client
+        self.endpoint = endpoint
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_duration = slow_call_duration or None
+        self.minimum_calls = minimum_calls
+        self.open_duration = open_duration
+        self.half_open_probes = half_open_probes
+
+        self.state = CLOSED
+        self.opened_at = 0
+        # Скользящее окно результатов последних вызовов, True - неудача
+        self.results = collections.deque(maxlen=window_size)
+        self.failures = 0
+        self.probes = 0
+        self.probe_successes = 0
+
+        self.state_gauge = metrics.circuit_breaker_state_gauge.labels(client, endpoint)
+        self.rejected_counter = metrics.circuit_breaker_rejected_counter.labels(client, endpoint)
+        self.state_gauge.set(STATE_VALUES[CLOSED])
+
+    def available(self):
+        if self.state == CLOSED:
+            return True
+
+        if self.state == OPEN:
+            return time.monotonic() - self.opened_at >= self.open_duration
+
+        return self.probes < self.half_open_probes
+
+    def check(self):
+        if not self.available():
+            self.rejected_counter.inc()
+            raise CircuitOpenError(f'Circuit breaker is open for {self.endpoint}')
+
+    def acquire(self):
+        self.check()
+
+        if self.state == OPEN:
+            self._transition(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            self.probes += 1
+
+    def release(self):
+        # Попытка отменена и не говорит ничего о состоянии партнера
+        if self.state == HALF_OPEN:
+            self.probes = max(0, self.probes - 1)
+
+    def record(self, duration, exception=None):
+        failed = exception is not None and is_failure(exception)
+
+        if self.slow_call_duration is not None and duration >= self.slow_call_duration:
+            failed = True
+
+        if self.state == HALF_OPEN:
+            self.probes = max(0, self.probes - 1)
+
+            if failed:
+                self._transition(OPEN)
+            elif exception is None:
+                # Ошибка клиента не доказывает, что партнер восстановился:
+                # выключатель замыкается только успешными ответами
+                self.probe_successes += 1
+
+                if self.probe_successes >= self.half_open_probes:
+                    self._transition(CLOSED)
+
+            return
+
+        # Запоздавшие ответы в открытом состоянии не учитываются
+        if self.state == OPEN:
+            return
+
+        if len(self.results) == self.results.maxlen:
+            self.failures -= self.results[0]
+
+        self.results.append(failed)
+        self.failures += failed
+
+        if (
+            len(self.results) >= self.minimum_calls
+            and self.failures / len(self.results) >= self.failure_rate_threshold
+        ):
+            self._transition(OPEN)
+
+    def _transition(self, state):
+        logs.warning(
+            'Circuit breaker state changed',
+            client=self.client,
+            endpoint=self.endpoint,
+            previous_state=self.state,
+            state=state
+        )
+
+        self.state = state
+        self.probes = 0
+        self.probe_successes = 0
+
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        elif state == CLOSED:
+            self.results.clear()
+            self.failures = 0
+
+        self.state_gauge.set(STATE_VALUES[state])
+        metrics.circuit_breaker_transitions_counter.labels(
+            self.client, self.endpoint, state
+        ).inc()
+
+
+async def guard(breaker, attempt):
+    # Выполнение попытки с учетом и записью результата в выключатель
+    breaker.acquire()
+    started = time.monotonic()
+
+    try:
+        result = await attempt()
+    except (asyncio.CancelledError, DeadlineTimeoutError):
+        # Попытка не говорит ничего о состоянии партнера
+        breaker.release()
+        raise
+    except BaseException as exception:
+        breaker.record(time.monotonic() - started, exception)
+        raise
+
+    breaker.record(time.monotonic() - started)
+
+    return result
@@ -0,0 +1,42 @@
+'''Крайний срок выполнения запроса, общий для всех обращений к партнеру в его рамках.'''
+import contextlib
+import contextvars
+import time
+
+from .errors import RequestRejectedError
+
+_deadline = contextvars.ContextVar('deadline', default=None)
+
+
+class DeadlineExceededError(RequestRejectedError):
+    pass
+
+
+@contextlib.contextmanager
+def deadline(timeout: float | None):
+    # Вложенный срок не может быть позже внешнего
+    if not timeout:
+        yield
+        return
+
+    at = time.monotonic() + timeout
+    current = _deadline.get()
+
+    if current is not None:
+        at = min(at, current)
+
+    token = _deadline.set(at)
+
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    at = _deadline.get()
+
+    if at is None:
+        return None
+
+    return at - time.monotonic()
@@ -0,0 +1,12 @@
+'''Исключения HTTP-клиента.'''
+
+
+class RequestRejectedError(Exception):
+    # Запрос отклонен клиентом без обращения к партнеру
+    pass
+
+
+class DeadlineTimeoutError(TimeoutError):
+    # Таймаут попытки, сокращенный до крайнего срока вызывающего: говорит о сроке
+    # вызывающего, а не о состоянии партнера
+    pass
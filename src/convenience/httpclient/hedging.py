@@ -0,0 +1,103 @@
+'''Дублирующие (hedged) запросы для идемпотентных ендпоинтов.'''
+import asyncio
+import collections
+import time
+
+from . import metrics
+
+
+class Hedging:
+    def __init__(
+            self,
+            client: str,
+            endpoint: str,
+            delay: float | None = None,
+            percentile: float = 0.95,
+            maximum_ratio: float = 0.1,
+            window_size: int = 100,
+            minimum_samples: int = 20):
+        # delay - фиксированная задержка перед дублем, иначе берется перцентиль задержек
+        self.delay = delay or None
+        self.percentile = percentile
+        self.maximum_ratio = maximum_ratio
+        self.minimum_samples = minimum_samples
+
+        self.latencies = collections.deque(maxlen=window_size)
+        self.observed_delay = None
+        # Отметки о дублировании последних запросов для ограничения доли дублей
+        self.hedged = collections.deque(maxlen=window_size)
+        self.hedged_count = 0
+
+        self.fired_counter = metrics.hedges_fired_counter.labels(client, endpoint)
+        self.won_counter = metrics.hedges_won_counter.labels(client, endpoint)
+
+    def get_delay(self):
+        return self.delay or self.observed_delay
+
+    def observe(self, latency):
+        self.latencies.append(latency)
+
+        # Перцентиль пересчитывается раз в minimum_samples запросов, а не на каждом
+        if len(self.latencies) >= self.minimum_samples and (
+            self.observed_delay is None or len(self.latencies) % self.minimum_samples == 0
+        ):
+            latencies = sorted(self.latencies)
+            self.observed_delay = latencies[int(self.percentile * (len(latencies) - 1))]
+
+    def _mark(self, hedged):
+        if len(self.hedged) == self.hedged.maxlen:
+            self.hedged_count -= self.hedged[0]
+
+        self.hedged.append(hedged)
+        self.hedged_count += hedged
+
+    def allow(self):
+        return self.hedged_count < self.maximum_ratio * max(len(self.hedged), 1)
+
+    async def run(self, attempt):
+        delay = self.get_delay()
+        started = time.monotonic()
+        primary = asyncio.ensure_future(attempt())
+
+        if delay is not None:
+            try:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+            except asyncio.CancelledError:
+                primary.cancel()
+                raise
+
+        if delay is None or done or not self.allow():
+            self._mark(False)
+            result = await primary
+            self.observe(time.monotonic() - started)
+
+            return result
+
+        self._mark(True)
+        self.fired_counter.inc()
+
+        hedge = asyncio.ensure_future(attempt())
+        pending = {primary, hedge}
+        exception = None
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.won_counter.inc()
+
+                        self.observe(time.monotonic() - started)
+
+                        return task.result()
+
+                    # Ждем второй запрос, ошибку первого отдадим, если оба неудачны
+                    exception = exception or task.exception()
+
+            raise exception
+        finally:
+            # Проигравший запрос отменяется, соединение возвращается в пул
+            for task in pending:
+                task.cancel()
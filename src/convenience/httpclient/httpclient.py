@@ -1,14 +1,49 @@
-from typing import Mapping, Self
+import asyncio
+import random
+import time
+from typing import Mapping
 
 import aiohttp
 from ..logs import logs
-from the_retry import retry
+import yarl
+
+from . import deadline, metrics, timing
+from .breaker import CircuitBreaker, CircuitOpenError, guard  # noqa: F401
+from .deadline import DeadlineExceededError
+from .errors import DeadlineTimeoutError, RequestRejectedError
+from .hedging import Hedging
+from .limiter import AdaptiveLimiter, ConcurrencyLimitError  # noqa: F401
+from .ratelimit import RateLimitError, RateLimits  # noqa: F401
+from .retries import RetryBudget, RetryPolicy
+from .singleflight import SingleFlight
 
 
 class ResponseError(Exception):
     pass
 
 
+async def read_body(content, maximum_body_size, logging_blocks=False):
+    # Блоки накапливаются в списке и склеиваются один раз,
+    # чтобы не копировать всё тело на каждом прочитанном блоке
+    blocks = []
+    size = 0
+
+    while True:
+        block = await content.read(maximum_body_size - size)
+        blocks.append(block)
+        size += len(block)
+        if logging_blocks:
+            logs.debug('Received response block', block=block)
+
+        if content.at_eof():
+            break
+
+        if size == maximum_body_size:
+            raise ResponseError('Response too big')
+
+    return b''.join(blocks)
+
+
 class HTTP():
     def __init__(
             self,
@@ -18,17 +53,242 @@ class HTTP():
             maximum_body_size: int = 2 ** 24,
             retry_status_error: bool = True,
             logging_responsed_blocks: bool = True,
-            expected_exception: BaseException | tuple[BaseException, ...] = BaseException,
+            expected_exception: BaseException | tuple[BaseException, ...] = Exception,
+            name: str = 'http',
+            limit: int = 100,
+            limit_per_host: int = 0,
+            keepalive_timeout: float | None = 15,
+            dns_cache_ttl: int | None = 10,
+            force_close: bool = False,
+            circuit_breaker: Mapping | None = None,
+            retry_policy: RetryPolicy | None = None,
+            retry_budget: RetryBudget | None = None,
+            backoff_multiplier: float = 2,
+            maximum_backoff: float | None = None,
+            maximum_retry_after: float | None = None,
+            idempotency: Mapping[tuple[str, str], bool] | None = None,
+            hedging: Mapping | None = None,
+            single_flight: bool = False,
+            concurrency_limit: Mapping | None = None,
+            rate_limits: Mapping[str, tuple[float, int]] | None = None,
+            rate_limit_maximum_wait: float | None = None,
+            logging_sample_rates: Mapping[str, float] | None = None,
             **kwargs: Mapping):
         self.retries_count = retries_count
         self.retries_sleep = retries_sleep
         self.timeout = aiohttp.ClientTimeout(total=timeout)
         self.maximum_body_size = maximum_body_size
         self.retry_status_error = retry_status_error
-        self.session = aiohttp.ClientSession(timeout=self.timeout, **kwargs)
+        self.name = name
+        # Настройки выключателей, None - выключатели не используются
+        self.circuit_breaker = circuit_breaker
+        self.breakers = {}
+        # Настройки дублирующих запросов, None - запросы не дублируются
+        self.hedging = hedging
+        self.hedgers = {}
+        # Одинаковые одновременные GET-запросы выполняются один раз
+        self.single_flight = SingleFlight() if single_flight else None
+        # Адаптивный лимит одновременных запросов, None - без ограничения
+        self.limiter = None
+
+        if concurrency_limit is not None:
+            self.limiter = AdaptiveLimiter(name, **concurrency_limit)
+
+        # Ограничения частоты запросов по ендпоинтам, None - без ограничений
+        self.rate_limits = None
+
+        if rate_limits:
+            self.rate_limits = RateLimits(name, rate_limits, rate_limit_maximum_wait)
+
+        # Доли логируемых запросов по ендпоинтам вида {'GET /orders-data': 0.01},
+        # путь сравнивается по окончанию, остальные запросы логируются все
+        self.logging_sample_rates = [
+            (*endpoint.split(' ', 1), rate)
+            for endpoint, rate in (logging_sample_rates or {}).items()
+        ]
+        self.logging_rates = {}
+        self.endpoint_metrics = {}
+
+        if 'connector' not in kwargs:
+            # При принудительном закрытии соединений keep-alive не имеет смысла
+            kwargs['connector'] = aiohttp.TCPConnector(
+                limit=limit,
+                limit_per_host=limit_per_host,
+                keepalive_timeout=None if force_close else keepalive_timeout,
+                force_close=force_close,
+                use_dns_cache=dns_cache_ttl != 0,
+                ttl_dns_cache=dns_cache_ttl
+            )
+
+        self.connector = kwargs['connector']
+        self.session = aiohttp.ClientSession(
+            timeout=self.timeout,
+            trace_configs=[*kwargs.pop('trace_configs', []), self._create_trace_config()],
+            **kwargs
+        )
         self.expected_exception = expected_exception
         self.logging_responsed_blocks = logging_responsed_blocks
 
+        if retry_policy is None:
+            retry_policy = RetryPolicy(
+                retries_count,
+                retries_sleep,
+                multiplier=backoff_multiplier,
+                maximum_backoff=maximum_backoff,
+                maximum_retry_after=maximum_retry_after,
+                expected_exception=expected_exception,
+                ignored_exception=(RequestRejectedError, ResponseError),
+                idempotency=idempotency,
+                budget=retry_budget
+            )
+
+        self.retry_policy = retry_policy
+
+        self._bind_pool_metrics()
+
+    def _bind_pool_metrics(self):
+        # Значения состояния пула вычисляются в момент снятия метрик
+        connector = self.connector
+
+        metrics.pool_limit_gauge.labels(self.name).set_function(lambda: connector.limit)
+        metrics.pool_limit_per_host_gauge.labels(self.name).set_function(
+            lambda: connector.limit_per_host
+        )
+        metrics.pool_connections_gauge.labels(self.name, 'active').set_function(
+            lambda: len(getattr(connector, '_acquired', ()))
+        )
+        metrics.pool_connections_gauge.labels(self.name, 'idle').set_function(
+            lambda: sum(len(conns) for conns in getattr(connector, '_conns', {}).values())
+        )
+
+    def _create_trace_config(self):
+        acquire_histogram = metrics.connection_acquire_histogram.labels(self.name)
+        phase_histograms = {
+            phase: metrics.phase_histogram.labels(self.name, phase)
+            for phase in ('dns', 'connect', 'ttfb')
+        }
+
+        def observe(phase, duration):
+            phase_histograms[phase].observe(duration)
+            timing.add(phase, duration)
+
+        # Ожидание соединения в пуле пишется в отдельную метрику
+        def observe_pool_wait(duration):
+            acquire_histogram.observe(duration)
+            timing.add('pool_wait', duration)
+
+        async def on_request_start(session, context, params):
+            context.queued_at = None
+            context.acquire_observed = False
+            context.dns_started_at = None
+            context.dns_duration = 0
+            context.created_at = None
+            context.sent_at = None
+
+        async def on_connection_queued_start(session, context, params):
+            context.queued_at = time.monotonic()
+
+        async def on_connection_queued_end(session, context, params):
+            observe_pool_wait(time.monotonic() - context.queued_at)
+            context.acquire_observed = True
+
+        async def on_connection_acquired(session, context, params):
+            # Соединение получено без ожидания в очереди пула
+            if not context.acquire_observed:
+                observe_pool_wait(0)
+                context.acquire_observed = True
+
+        async def on_dns_resolvehost_start(session, context, params):
+            context.dns_started_at = time.monotonic()
+
+        async def on_dns_resolvehost_end(session, context, params):
+            context.dns_duration = time.monotonic() - context.dns_started_at
+            observe('dns', context.dns_duration)
+
+        async def on_connection_create_start(session, context, params):
+            context.created_at = time.monotonic()
+
+        async def on_connection_create_end(session, context, params):
+            # Разрешение имени выполняется внутри создания соединения,
+            # отдельных событий для TLS в aiohttp нет - рукопожатие входит в connect
+            observe('connect', time.monotonic() - context.created_at - context.dns_duration)
+
+        async def on_request_headers_sent(session, context, params):
+            context.sent_at = time.monotonic()
+
+        async def on_request_end(session, context, params):
+            # Вызывается после получения заголовков ответа, до чтения тела
+            if context.sent_at is not None:
+                observe('ttfb', time.monotonic() - context.sent_at)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_queued_start.append(on_connection_queued_start)
+        trace_config.on_connection_queued_end.append(on_connection_queued_end)
+        trace_config.on_connection_reuseconn.append(on_connection_acquired)
+        trace_config.on_connection_create_start.append(on_connection_acquired)
+        trace_config.on_connection_create_start.append(on_connection_create_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+        trace_config.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+        trace_config.on_request_headers_sent.append(on_request_headers_sent)
+        trace_config.on_request_end.append(on_request_end)
+
+        return trace_config
+
+    def _get_breaker(self, method, path):
+        if self.circuit_breaker is None:
+            return None
+
+        endpoint = f'{method} {path}'
+        breaker = self.breakers.get(endpoint)
+
+        if breaker is None:
+            breaker = self.breakers[endpoint] = CircuitBreaker(
+                self.name, endpoint, **self.circuit_breaker
+            )
+
+        return breaker
+
+    def _get_endpoint_metrics(self, method, path):
+        endpoint = f'{method} {path}'
+        endpoint_metrics = self.endpoint_metrics.get(endpoint)
+
+        if endpoint_metrics is None:
+            endpoint_metrics = self.endpoint_metrics[endpoint] = metrics.EndpointMetrics(
+                self.name, endpoint
+            )
+
+        return endpoint_metrics
+
+    def _is_logged(self, method, path):
+        endpoint = f'{method} {path}'
+        rate = self.logging_rates.get(endpoint)
+
+        if rate is None:
+            rate = self.logging_rates[endpoint] = next(
+                (
+                    rule_rate
+                    for rule_method, rule_path, rule_rate in self.logging_sample_rates
+                    if rule_method == method and path.endswith(rule_path)
+                ),
+                1
+            )
+
+        return rate >= 1 or random.random() < rate
+
+    def _get_hedger(self, method, path):
+        if self.hedging is None or not self.retry_policy.is_idempotent(method, path):
+            return None
+
+        endpoint = f'{method} {path}'
+        hedger = self.hedgers.get(endpoint)
+
+        if hedger is None:
+            hedger = self.hedgers[endpoint] = Hedging(self.name, endpoint, **self.hedging)
+
+        return hedger
+
     async def __aenter__(self):
         await self.session.__aenter__()
 
@@ -38,34 +298,185 @@ class HTTP():
         await self.session.__aexit__(exception_type, exception, traceback)
 
     async def request(self, method, URL, **kwargs):
-        @retry(
-            expected_exception=self.expected_exception,
-            attempts=self.retries_count,
-            backoff=self.retries_sleep
-        )
-        async def _request(self: Self, method, URL, **kwargs):
-            body = None
+        # Объединяются только запросы без тела и дополнительных параметров
+        if self.single_flight is None or method != 'GET' or kwargs:
+            return await self._request_with_retries(method, URL, **kwargs)
 
-            logs.debug('Sending HTTP request', method=method, URL=URL, kwargs=kwargs)
+        left = deadline.remaining()
 
-            async with self.session.request(method, URL, **kwargs, verify_ssl=False) as response:
-                body = b''
+        try:
+            result, coalesced = await self.single_flight.do(
+                (method, URL),
+                lambda: self._request_with_retries(method, URL),
+                None if left is None else max(left, 0)
+            )
+        except TimeoutError as e:
+            # Таймаут самого общего запроса передается как есть
+            left = deadline.remaining()
+
+            if left is not None and left <= 0:
+                raise self._deadline_exceeded(method, yarl.URL(URL).path) from e
+
+            raise
+
+        if coalesced:
+            metrics.coalesced_requests_counter.labels(
+                self.name, f'{method} {yarl.URL(URL).path}'
+            ).inc()
+
+        return result
+
+    async def _request_with_retries(self, method, URL, **kwargs):
+        path = yarl.URL(URL).path
+        breaker = self._get_breaker(method, path)
+        hedger = self._get_hedger(method, path)
+        bucket = None if self.rate_limits is None else self.rate_limits.get(method, path)
+        # Решение о логировании принимается на весь запрос, включая повторы
+        logged = self._is_logged(method, path)
+        endpoint_metrics = self._get_endpoint_metrics(method, path)
+        attempt = 0
+
+        def check_deadline():
+            # Оставшееся до крайнего срока время, None - срок не задан
+            left = deadline.remaining()
+
+            if left is not None and left <= 0:
+                raise self._deadline_exceeded(method, path)
+
+            return left
+
+        async def perform():
+            left = check_deadline()
+            clipped = left is not None and left < self.timeout.total
+            options = kwargs
+
+            # Таймаут попытки не выходит за крайний срок
+            if clipped:
+                options = {**kwargs, 'timeout': aiohttp.ClientTimeout(total=left)}
+
+            async def attempt():
+                try:
+                    return await self._request(
+                        method, URL, endpoint_metrics, logged, **options
+                    )
+                except TimeoutError as e:
+                    # Не учитывается выключателем и адаптивным лимитом
+                    if clipped:
+                        raise DeadlineTimeoutError(
+                            f'Attempt timed out at deadline for {method} {path}'
+                        ) from e
+
+                    raise
+
+            if breaker is None:
+                return await attempt()
+
+            return await guard(breaker, attempt)
 
-                while True:
-                    block = await response.content.read(self.maximum_body_size - len(body))
-                    body += block
-                    if self.logging_responsed_blocks:
-                        logs.debug('Received response block', block=block)
+        async def send():
+            # Разомкнутый выключатель отклоняет запрос, не расходуя лимиты
+            if breaker is not None:
+                breaker.check()
 
-                    if response.content.at_eof():
-                        break
+            if bucket is not None:
+                await bucket.acquire(check_deadline())
 
-                    if len(body) == self.maximum_body_size:
-                        raise ResponseError('Response too big')
+            if self.limiter is None:
+                return await perform()
+
+            return await self.limiter.run(perform, check_deadline())
+
+        self.retry_policy.start()
+        started_at = time.monotonic()
+        outcome = 'error'
+
+        try:
+            while True:
+                attempt += 1
+
+                try:
+                    if hedger is None:
+                        result = await send()
+                    else:
+                        result = await hedger.run(send)
+
+                    outcome = 'success'
+
+                    return result
+                except Exception as exception:
+                    left = deadline.remaining()
+
+                    # Попытка прервана по истечении крайнего срока
+                    if isinstance(exception, DeadlineTimeoutError) or (
+                        left is not None and left <= 0
+                        and not isinstance(exception, RequestRejectedError)
+                    ):
+                        raise self._deadline_exceeded(method, path) from exception
+
+                    if not self.retry_policy.should_retry(attempt, method, path, exception):
+                        raise
+
+                    if not self.retry_policy.withdraw():
+                        logs.warning('Retry budget exhausted', method=method, URL=URL)
+                        metrics.retry_budget_exhausted_counter.labels(self.name).inc()
+                        raise
+
+                    if breaker is not None:
+                        # Не ждем следующей попытки, если партнер признан недоступным
+                        breaker.check()
+
+                    delay = self.retry_policy.delay(attempt, exception)
+
+                    # Следующая попытка не успеет начаться до крайнего срока
+                    if left is not None and delay >= left:
+                        raise self._deadline_exceeded(method, path) from exception
+
+                    logs.warning(
+                        'Retrying HTTP request',
+                        method=method,
+                        URL=URL,
+                        attempt=attempt,
+                        delay=delay,
+                        error=repr(exception)
+                    )
+                    endpoint_metrics.retries.inc()
+
+                    await asyncio.sleep(delay)
+        finally:
+            endpoint_metrics.call_durations[outcome].observe(time.monotonic() - started_at)
+            endpoint_metrics.attempts.observe(attempt)
+
+    def _deadline_exceeded(self, method, path):
+        metrics.deadline_exceeded_counter.labels(self.name, f'{method} {path}').inc()
+
+        return DeadlineExceededError(f'Deadline exceeded for {method} {path}')
+
+    async def _request(self, method, URL, endpoint_metrics, logged=True, **kwargs):
+        if logged:
+            logs.debug('Sending HTTP request', method=method, URL=URL, kwargs=kwargs)
+
+        started_at = time.monotonic()
+        duration = endpoint_metrics.error_duration
+
+        try:
+            async with self.session.request(method, URL, **kwargs, verify_ssl=False) as response:
+                duration = endpoint_metrics.durations.get(
+                    response.status // 100, endpoint_metrics.error_duration
+                )
+                body = await read_body(
+                    response.content,
+                    self.maximum_body_size,
+                    self.logging_responsed_blocks and logged
+                )
+                endpoint_metrics.response_size.observe(len(body))
 
                 if self.retry_status_error:
                     response.raise_for_status()
 
                 return response, body
-
-        return await _request(self, method, URL, **kwargs)
+        except asyncio.CancelledError:
+            # Например, проигравший дублирующий запрос
+            duration = endpoint_metrics.cancelled_duration
+            raise
+        finally:
+            duration.observe(time.monotonic() - started_at)
@@ -0,0 +1,141 @@
+'''Адаптивное ограничение количества одновременных запросов к партнеру.'''
+import asyncio
+import collections
+import time
+
+import aiohttp
+
+from . import metrics
+from .errors import DeadlineTimeoutError, RequestRejectedError
+
+# Статусы ответа, говорящие о перегрузке партнера
+OVERLOAD_STATUSES = frozenset((429, 503, 504))
+
+
+class ConcurrencyLimitError(RequestRejectedError):
+    pass
+
+
+def is_overload(exception):
+    if isinstance(exception, asyncio.TimeoutError):
+        return True
+
+    if isinstance(exception, aiohttp.ClientResponseError):
+        return exception.status in OVERLOAD_STATUSES
+
+    return False
+
+
+class AdaptiveLimiter:
+    # Лимит подбирается по алгоритму AIMD: растет на единицу за "окно" успешных запросов
+    # и уменьшается в backoff_ratio раз при признаках перегрузки партнера
+    def __init__(
+            self,
+            client: str,
+            initial_limit: int = 20,
+            minimum_limit: int = 1,
+            maximum_limit: int = 100,
+            latency_threshold: float | None = None,
+            backoff_ratio: float = 0.9,
+            maximum_queue: int = 100,
+            queue_timeout: float = 5):
+        self.limit = float(initial_limit)
+        self.minimum_limit = minimum_limit
+        self.maximum_limit = maximum_limit
+        self.latency_threshold = latency_threshold or None
+        self.backoff_ratio = backoff_ratio
+        self.maximum_queue = maximum_queue
+        self.queue_timeout = queue_timeout
+
+        self.in_flight = 0
+        self.queue = collections.deque()
+
+        self.limit_gauge = metrics.concurrency_limit_gauge.labels(client)
+        self.in_flight_gauge = metrics.concurrency_in_flight_gauge.labels(client)
+        self.queue_histogram = metrics.concurrency_queue_histogram.labels(client)
+        self.rejected_counter = metrics.concurrency_rejected_counter.labels(client)
+        self.limit_gauge.set(self.limit)
+
+    def _take(self):
+        self.in_flight += 1
+        self.in_flight_gauge.set(self.in_flight)
+
+    def _wake(self):
+        while self.queue and self.in_flight < int(self.limit):
+            future = self.queue.popleft()
+
+            if not future.done():
+                self._take()
+                future.set_result(None)
+
+    async def acquire(self, timeout: float | None = None):
+        if not self.queue and self.in_flight < int(self.limit):
+            self._take()
+            self.queue_histogram.observe(0)
+            return
+
+        if len(self.queue) >= self.maximum_queue:
+            self.rejected_counter.inc()
+            raise ConcurrencyLimitError('Too many concurrent requests to partner')
+
+        if timeout is None:
+            timeout = self.queue_timeout
+        else:
+            timeout = min(timeout, self.queue_timeout)
+
+        future = asyncio.get_running_loop().create_future()
+        self.queue.append(future)
+        started = time.monotonic()
+
+        try:
+            await asyncio.wait_for(future, timeout)
+        except BaseException as exception:
+            # Место могло быть выдано одновременно с отменой ожидания
+            if future.done() and not future.cancelled():
+                self.release()
+            elif future in self.queue:
+                self.queue.remove(future)
+
+            if isinstance(exception, asyncio.TimeoutError):
+                self.rejected_counter.inc()
+                raise ConcurrencyLimitError('Timed out waiting for a request slot') from None
+
+            raise
+        finally:
+            self.queue_histogram.observe(time.monotonic() - started)
+
+    def release(self):
+        self.in_flight -= 1
+        self.in_flight_gauge.set(self.in_flight)
+        self._wake()
+
+    def record(self, latency, exception=None):
+        if isinstance(exception, RequestRejectedError | DeadlineTimeoutError):
+            return
+
+        if is_overload(exception) or (
+            self.latency_threshold is not None and latency > self.latency_threshold
+        ):
+            self.limit = max(self.minimum_limit, self.limit * self.backoff_ratio)
+        else:
+            self.limit = min(self.maximum_limit, self.limit + 1 / self.limit)
+
+        self.limit_gauge.set(self.limit)
+
+    async def run(self, attempt, timeout: float | None = None):
+        await self.acquire(timeout)
+        started = time.monotonic()
+
+        try:
+            result = await attempt()
+        except asyncio.CancelledError:
+            raise
+        except BaseException as exception:
+            self.record(time.monotonic() - started, exception)
+            raise
+        else:
+            self.record(time.monotonic() - started)
+        finally:
+            self.release()
+
+        return result
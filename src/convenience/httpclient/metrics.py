@@ -0,0 +1,176 @@
+'''Метрики HTTP-клиента.'''
+import prometheus_client
+
+pool_limit_gauge = prometheus_client.Gauge(
+    'http_client_pool_limit',
+    'Maximum number of simultaneous connections in the pool (0 is unlimited)',
+    ['client']
+)
+
+pool_limit_per_host_gauge = prometheus_client.Gauge(
+    'http_client_pool_limit_per_host',
+    'Maximum number of simultaneous connections to one host (0 is unlimited)',
+    ['client']
+)
+
+pool_connections_gauge = prometheus_client.Gauge(
+    'http_client_pool_connections',
+    'How many connections are in the pool by state',
+    ['client', 'state']
+)
+
+connection_acquire_histogram = prometheus_client.Histogram(
+    'http_client_connection_acquire_seconds',
+    'How long request waited for a free connection in the pool',
+    ['client'],
+    buckets=(0, .001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+)
+
+phase_histogram = prometheus_client.Histogram(
+    'http_client_phase_seconds',
+    'How long request spent in a phase: dns, connect (including TLS), ttfb',
+    ['client', 'phase'],
+    buckets=(0, .001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+)
+
+circuit_breaker_state_gauge = prometheus_client.Gauge(
+    'http_client_circuit_breaker_state',
+    'State of circuit breaker: 0 - closed, 1 - half-open, 2 - open',
+    ['client', 'endpoint']
+)
+
+circuit_breaker_transitions_counter = prometheus_client.Counter(
+    'http_client_circuit_breaker_transitions',
+    'How many times circuit breaker changed its state',
+    ['client', 'endpoint', 'state']
+)
+
+circuit_breaker_rejected_counter = prometheus_client.Counter(
+    'http_client_circuit_breaker_rejected',
+    'How many requests was rejected by open circuit breaker',
+    ['client', 'endpoint']
+)
+
+request_duration_histogram = prometheus_client.Histogram(
+    'http_client_request_duration_seconds',
+    'How long one attempt of request took by response status class',
+    ['client', 'endpoint', 'status'],
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+)
+
+call_duration_histogram = prometheus_client.Histogram(
+    'http_client_call_duration_seconds',
+    'How long request took including all retries',
+    ['client', 'endpoint', 'outcome'],
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+
+call_attempts_histogram = prometheus_client.Histogram(
+    'http_client_call_attempts',
+    'How many attempts request took',
+    ['client', 'endpoint'],
+    buckets=(1, 2, 3, 4, 5, 7, 10)
+)
+
+response_size_histogram = prometheus_client.Histogram(
+    'http_client_response_size_bytes',
+    'Size of response body',
+    ['client', 'endpoint'],
+    buckets=(2 ** 8, 2 ** 10, 2 ** 12, 2 ** 14, 2 ** 16, 2 ** 18, 2 ** 20, 2 ** 22, 2 ** 24)
+)
+
+retries_counter = prometheus_client.Counter(
+    'http_client_retries',
+    'How many times request was retried',
+    ['client', 'endpoint']
+)
+
+retry_budget_exhausted_counter = prometheus_client.Counter(
+    'http_client_retry_budget_exhausted',
+    'How many retries was skipped because retry budget is exhausted',
+    ['client']
+)
+
+hedges_fired_counter = prometheus_client.Counter(
+    'http_client_hedges_fired',
+    'How many hedged requests was sent',
+    ['client', 'endpoint']
+)
+
+hedges_won_counter = prometheus_client.Counter(
+    'http_client_hedges_won',
+    'How many hedged requests returned before the original one',
+    ['client', 'endpoint']
+)
+
+coalesced_requests_counter = prometheus_client.Counter(
+    'http_client_coalesced_requests',
+    'How many requests was served by an identical request already in flight',
+    ['client', 'endpoint']
+)
+
+concurrency_limit_gauge = prometheus_client.Gauge(
+    'http_client_concurrency_limit',
+    'Current adaptive limit of concurrent requests',
+    ['client']
+)
+
+concurrency_in_flight_gauge = prometheus_client.Gauge(
+    'http_client_concurrency_in_flight',
+    'How many requests are in flight',
+    ['client']
+)
+
+concurrency_queue_histogram = prometheus_client.Histogram(
+    'http_client_concurrency_queue_seconds',
+    'How long request waited for a slot under the concurrency limit',
+    ['client'],
+    buckets=(0, .001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+)
+
+concurrency_rejected_counter = prometheus_client.Counter(
+    'http_client_concurrency_rejected',
+    'How many requests was rejected by the concurrency limiter',
+    ['client']
+)
+
+rate_limit_wait_histogram = prometheus_client.Histogram(
+    'http_client_rate_limit_wait_seconds',
+    'How long request was throttled by the endpoint rate limit',
+    ['client', 'endpoint'],
+    buckets=(0, .001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+)
+
+rate_limit_rejected_counter = prometheus_client.Counter(
+    'http_client_rate_limit_rejected',
+    'How many requests was rejected because rate limit wait exceeds the deadline',
+    ['client', 'endpoint']
+)
+
+deadline_exceeded_counter = prometheus_client.Counter(
+    'http_client_deadline_exceeded',
+    'How many requests was aborted because the request deadline was exhausted',
+    ['client', 'endpoint']
+)
+
+
+class EndpointMetrics:
+    # Метрики ендпоинта привязываются к меткам один раз,
+    # на каждый запрос остаются только observe и inc
+    def __init__(self, client, endpoint):
+        # По классу статуса ответа: 2 - 2xx, ..., 5 - 5xx
+        self.durations = {
+            status_class: request_duration_histogram.labels(client, endpoint, f'{status_class}xx')
+            for status_class in range(2, 6)
+        }
+        # Попытка завершилась без ответа (ошибка соединения, таймаут) или была отменена
+        self.error_duration = request_duration_histogram.labels(client, endpoint, 'error')
+        self.cancelled_duration = request_duration_histogram.labels(client, endpoint, 'cancelled')
+        self.response_size = response_size_histogram.labels(client, endpoint)
+
+        self.call_durations = {
+            outcome: call_duration_histogram.labels(client, endpoint, outcome)
+            for outcome in ('success', 'error')
+        }
+        self.attempts = call_attempts_histogram.labels(client, endpoint)
+        self.retries = retries_counter.labels(client, endpoint)
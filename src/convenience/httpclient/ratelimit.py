@@ -0,0 +1,87 @@
+'''Ограничение частоты запросов к ендпоинтам партнера (token bucket).'''
+import asyncio
+import time
+
+from . import metrics
+from .errors import RequestRejectedError
+
+
+class RateLimitError(RequestRejectedError):
+    pass
+
+
+class TokenBucket:
+    def __init__(
+            self,
+            client: str,
+            endpoint: str,
+            rate: float,
+            burst: int,
+            maximum_wait: float | None = None):
+        # rate - запросов в секунду, burst - допустимый всплеск запросов
+        self.endpoint = endpoint
+        self.rate = rate
+        self.burst = burst
+        self.maximum_wait = maximum_wait
+
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+
+        self.wait_histogram = metrics.rate_limit_wait_histogram.labels(client, endpoint)
+        self.rejected_counter = metrics.rate_limit_rejected_counter.labels(client, endpoint)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, maximum_wait: float | None = None):
+        self._refill()
+
+        # Токен резервируется сразу, ожидание - время до его появления
+        wait = max(0.0, (1 - self.tokens) / self.rate)
+
+        if maximum_wait is None:
+            maximum_wait = self.maximum_wait
+        elif self.maximum_wait is not None:
+            maximum_wait = min(maximum_wait, self.maximum_wait)
+
+        if maximum_wait is not None and wait > maximum_wait:
+            self.rejected_counter.inc()
+            raise RateLimitError(f'Rate limit exceeded for {self.endpoint}')
+
+        self.tokens -= 1
+        self.wait_histogram.observe(wait)
+
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.tokens += 1
+                raise
+
+
+class RateLimits:
+    # Правила вида {'POST /create': (rate, burst)}, путь сравнивается по окончанию
+    def __init__(self, client: str, rules: dict, maximum_wait: float | None = None):
+        self.client = client
+        self.rules = [
+            (*endpoint.split(' ', 1), rate, burst) for endpoint, (rate, burst) in rules.items()
+        ]
+        self.maximum_wait = maximum_wait
+        self.buckets = {}
+
+    def get(self, method, path):
+        endpoint = f'{method} {path}'
+
+        if endpoint not in self.buckets:
+            self.buckets[endpoint] = None
+
+            for rule_method, rule_path, rate, burst in self.rules:
+                if rule_method == method and path.endswith(rule_path):
+                    self.buckets[endpoint] = TokenBucket(
+                        self.client, endpoint, rate, burst, self.maximum_wait
+                    )
+                    break
+
+        return self.buckets[endpoint]
@@ -0,0 +1,175 @@
+'''Политика повторных попыток HTTP-запросов.'''
+import random
+import time
+from collections.abc import Mapping
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+
+import aiohttp
+
+from .errors import RequestRejectedError
+
+IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'))
+
+# Статусы ответа, при которых повтор запроса имеет смысл
+RETRY_STATUSES = frozenset((408, 429, 500, 502, 503, 504))
+
+# Ошибки, при которых запрос гарантированно не дошел до партнера
+CONNECT_ERRORS = (aiohttp.ClientConnectorError, aiohttp.ConnectionTimeoutError)
+
+
+def get_retry_after(exception):
+    headers = getattr(exception, 'headers', None)
+    value = headers.get('Retry-After') if headers else None
+
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=UTC)
+
+    return max(0.0, (date - datetime.now(UTC)).total_seconds())
+
+
+class RetryBudget:
+    # Общий на все клиенты бюджет повторов: каждый запрос пополняет его на ratio,
+    # каждый повтор расходует единицу, плюс минимальное пополнение во времени
+    def __init__(self, ratio: float = 0.2, minimum_per_second: float = 1, maximum: float = 100):
+        self.ratio = ratio
+        self.minimum_per_second = minimum_per_second
+        self.maximum = maximum
+        self.balance = maximum
+        self.updated_at = time.monotonic()
+
+    def _refill(self, amount):
+        now = time.monotonic()
+        amount += (now - self.updated_at) * self.minimum_per_second
+        self.updated_at = now
+        self.balance = min(self.maximum, self.balance + amount)
+
+    def deposit(self):
+        self._refill(self.ratio)
+
+    def withdraw(self):
+        self._refill(0)
+
+        if self.balance < 1:
+            return False
+
+        self.balance -= 1
+
+        return True
+
+
+class RetryPolicy:
+    def __init__(
+            self,
+            attempts: int,
+            backoff: float,
+            multiplier: float = 2,
+            maximum_backoff: float | None = None,
+            jitter: bool = True,
+            maximum_retry_after: float | None = None,
+            expected_exception: BaseException | tuple[BaseException, ...] = Exception,
+            ignored_exception: BaseException | tuple[BaseException, ...] = RequestRejectedError,
+            idempotent_methods: frozenset[str] = IDEMPOTENT_METHODS,
+            idempotency: Mapping[tuple[str, str], bool] | None = None,
+            retry_statuses: frozenset[int] = RETRY_STATUSES,
+            budget: RetryBudget | None = None):
+        # attempts - общее количество попыток, -1 для бесконечного количества
+        self.attempts = attempts
+        self.backoff = backoff
+        self.multiplier = multiplier
+        self.maximum_backoff = maximum_backoff
+        self.jitter = jitter
+        self.maximum_retry_after = maximum_retry_after
+        self.expected_exception = expected_exception
+        # Ошибки, которые не повторяются никогда (например, отказ без обращения к партнеру)
+        self.ignored_exception = ignored_exception
+        self.idempotent_methods = idempotent_methods
+        # Переопределение идемпотентности по (метод, окончание пути)
+        self.idempotency = idempotency or {}
+        self.retry_statuses = retry_statuses
+        self.budget = budget
+
+    def is_idempotent(self, method, path):
+        for (rule_method, rule_path), idempotent in self.idempotency.items():
+            if rule_method == method and path.endswith(rule_path):
+                return idempotent
+
+        return method in self.idempotent_methods
+
+    def is_retryable(self, method, path, exception):
+        # CancelledError не наследуется от Exception и никогда не повторяется
+        if not isinstance(exception, Exception):
+            return False
+
+        if not isinstance(exception, self.expected_exception):
+            return False
+
+        if isinstance(exception, self.ignored_exception):
+            return False
+
+        # Соединение не установлено, повтор безопасен для любого метода
+        if isinstance(exception, CONNECT_ERRORS):
+            return True
+
+        if isinstance(exception, aiohttp.ClientResponseError):
+            if exception.status not in self.retry_statuses:
+                return False
+
+            # Партнер явно просит повторить позже, запрос не обработан
+            if exception.status == 429:
+                return True
+
+        # Таймауты, обрывы соединения и ошибки сервера - только для идемпотентных запросов
+        return self.is_idempotent(method, path)
+
+    def start(self):
+        if self.budget is not None:
+            self.budget.deposit()
+
+    def withdraw(self):
+        return self.budget is None or self.budget.withdraw()
+
+    def should_retry(self, attempt, method, path, exception):
+        if self.attempts != -1 and attempt >= self.attempts:
+            return False
+
+        if not self.is_retryable(method, path, exception):
+            return False
+
+        retry_after = get_retry_after(exception)
+
+        # Партнер не просит ждать дольше допустимого
+        return (
+            retry_after is None
+            or self.maximum_retry_after is None
+            or retry_after <= self.maximum_retry_after
+        )
+
+    def delay(self, attempt, exception):
+        retry_after = get_retry_after(exception)
+
+        if retry_after is not None:
+            return retry_after
+
+        delay = self.backoff * self.multiplier ** (attempt - 1)
+
+        if self.maximum_backoff is not None:
+            delay = min(delay, self.maximum_backoff)
+
+        if self.jitter:
+            delay = random.uniform(delay / 2, delay)
+
+        return delay
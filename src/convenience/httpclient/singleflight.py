@@ -0,0 +1,35 @@
+'''Объединение одинаковых одновременных запросов в один.'''
+import asyncio
+import contextvars
+
+
+def _retrieve(task):
+    # Ошибка забирается, даже если все ожидающие были отменены
+    if not task.cancelled():
+        task.exception()
+
+
+class SingleFlight:
+    def __init__(self):
+        self.calls = {}
+
+    def __len__(self):
+        return len(self.calls)
+
+    async def do(self, key, function, timeout=None):
+        # Возвращает результат и признак того, что запрос был объединен с уже выполняющимся.
+        # timeout ограничивает ожидание вызывающего, а не сам общий запрос
+        task = self.calls.get(key)
+        coalesced = task is not None
+
+        if task is None:
+            # Общий запрос выполняется в чистом контексте: крайний срок и сбор
+            # времени фаз первого вызывающего не должны влиять на остальных
+            task = self.calls[key] = asyncio.get_running_loop().create_task(
+                function(), context=contextvars.Context()
+            )
+            task.add_done_callback(_retrieve)
+            task.add_done_callback(lambda _: self.calls.pop(key, None))
+
+        # Отмена одного из ожидающих не отменяет общий запрос для остальных
+        return await asyncio.wait_for(asyncio.shield(task), timeout), coalesced
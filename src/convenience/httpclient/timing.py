@@ -0,0 +1,35 @@
+'''Время фаз запросов к партнеру в рамках обработки одного запроса к сервису.'''
+import contextlib
+import contextvars
+
+_phases = contextvars.ContextVar('phases', default=None)
+
+
+@contextlib.contextmanager
+def collect():
+    # Время фаз суммируется по всем запросам к партнеру внутри блока, включая повторы
+    # и дублирующие запросы: фаза - [сумма длительностей, число запросов]
+    phases = {}
+    token = _phases.set(phases)
+
+    try:
+        yield phases
+    finally:
+        _phases.reset(token)
+
+
+def add(phase: str, duration: float):
+    phases = _phases.get()
+
+    if phases is not None:
+        total = phases.setdefault(phase, [0, 0])
+        total[0] += duration
+        total[1] += 1
+
+
+def server_timing(phases: dict, prefix: str = 'partner') -> str:
+    # Значение заголовка Server-Timing, суммы длительностей в миллисекундах
+    return ', '.join(
+        f'{prefix}_{phase};desc="sum of {count}";dur={duration * 1000:.1f}'
+        for phase, (duration, count) in phases.items()
+    )
@@ -0,0 +1,94 @@
+'''Кодек JSON: orjson, если установлен, иначе стандартный модуль json.'''
+import functools
+import inspect
+import json
+from decimal import Decimal
+from typing import Any
+
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    # Типы, которые не сериализуются кодеком напрямую
+    if isinstance(value, Decimal):
+        return str(value)
+
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    NAME = 'orjson'
+
+    def loads(data: bytes | str) -> Any:
+        return orjson.loads(data)
+
+    def dumps(value: Any) -> bytes:
+        return orjson.dumps(value, default=_default)
+
+else:
+    NAME = 'json'
+
+    loads = json.loads
+
+    def dumps(value: Any) -> bytes:
+        return json.dumps(
+            value, default=_default, ensure_ascii=False, separators=(',', ':')
+        ).encode()
+
+
+class CodecJSONResponse(JSONResponse):
+    '''Ответ FastAPI, сериализуемый кодеком.'''
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# Сериализация по фактическому типу значения, в том числе списков моделей
+_any_adapter = TypeAdapter(Any)
+
+
+def dumps_model(value: BaseModel | list[BaseModel]) -> bytes:
+    return _any_adapter.dump_json(value, by_alias=True)
+
+
+def _serialize_models(endpoint):
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        result = await endpoint(*args, **kwargs)
+
+        if isinstance(result, BaseModel) or (
+            isinstance(result, list) and all(isinstance(item, BaseModel) for item in result)
+        ):
+            return Response(dumps_model(result), media_type='application/json')
+
+        return result
+
+    return wrapper
+
+
+class ModelJSONRoute(APIRoute):
+    '''
+    Маршрут, сериализующий возвращаемые модели сразу в JSON.
+
+    Без response_model FastAPI преобразует модель в словарь и обходит его
+    рекурсивно (jsonable_encoder), на больших заказах это дороже самой обработки.
+    Маршруты с response_model обрабатываются FastAPI как обычно.
+    '''
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        response_model = kwargs.get('response_model')
+
+        if (
+            isinstance(response_model, DefaultPlaceholder) or response_model is None
+        ) and inspect.signature(endpoint).return_annotation is inspect.Signature.empty:
+            endpoint = _serialize_models(endpoint)
+
+        super().__init__(path, endpoint, **kwargs)
@@ -1,56 +1,455 @@
 import asyncio
+import atexit
 from datetime import datetime as dt
+from decimal import Decimal
 import logging
 import multiprocessing
 import os
+import queue
 import sys
 import textwrap
 import threading
+import time
 from traceback import format_exception
 import json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 SERVICE = os.environ.get('CONVENIENCE_LOGS_SERVICE')
 VERSION = os.environ.get('CONVENIENCE_LOGS_VERSION')
 BUILD_NUMBER = os.environ.get('CONVENIENCE_LOGS_BUILD_NUMBER')
 
+# Уровни совпадают с уровнями модуля logging
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR}
+
+# Минимальный уровень записей, записи ниже отбрасываются до сбора данных о вызове
+LEVEL = LEVELS[os.environ.get('CONVENIENCE_LOGS_LEVEL', 'debug').lower()]
+
+# Размер очереди записей, 0 - запись в stderr в потоке вызова
+QUEUE_SIZE = int(os.environ.get('CONVENIENCE_LOGS_QUEUE_SIZE', '10000'))
+# Максимум записей, записываемых в stderr за один раз
+BATCH_SIZE = int(os.environ.get('CONVENIENCE_LOGS_BATCH_SIZE', '500'))
+# При переполнении очереди: drop - отбросить запись, block - ждать места в очереди
+OVERFLOW = os.environ.get('CONVENIENCE_LOGS_OVERFLOW', 'drop')
+
+# Максимальная длина строк и байтов в аргументах записи, 0 - без ограничения
+MAXIMUM_ARGUMENT_SIZE = int(os.environ.get('CONVENIENCE_LOGS_MAXIMUM_ARGUMENT_SIZE', '4096'))
+# Максимум записей одного сообщения в секунду, 0 - без ограничения
+RATE_LIMIT = int(os.environ.get('CONVENIENCE_LOGS_RATE_LIMIT', '0'))
+
 
 stderr_lock = threading.RLock()
 
 if int(os.environ.get('CONVENIENCE_LOGS_DEVELOPMENT', '0')) != 0:
-    def write_line(line):
-        with stderr_lock:
-            sys.stderr.write(f'''{line['timestamp']} {line['level']}\n''')
-            sys.stderr.write(
-                f'''    service: {line['service']} {line['version']} {line['build_number']}\n'''
-            )
-            sys.stderr.write(f'''    module: {line['module']}\n''')
-            sys.stderr.write(f'''    line: {line['line']}\n''')
-            sys.stderr.write(f'''    process: {line['process_ID']} {line['process_name']}\n'''),
-            sys.stderr.write(f'''    thread: {line['thread_ID']} {line['thread_name']}\n'''),
-            sys.stderr.write(f'''    task: {line['task_ID']} {line['task_name']}\n'''),
-            sys.stderr.write(f'''    message: {line['message']}\n''')
-            sys.stderr.write(f'''    arguments: {line['arguments']}\n''')
-
-            if 'exception' in line:
-                sys.stderr.write(f'''    exception: {line['exception']}\n''')
-
-                if 'traceback' in line:
-                    sys.stderr.write('\n')
-                    sys.stderr.write(textwrap.indent(line['traceback'], '    '))
-
-            sys.stderr.write('\n')
-            sys.stderr.flush()
+    def format_line(line):
+        text = (
+            f'''{line['timestamp']} {line['level']}\n'''
+            f'''    service: {SERVICE} {VERSION} {BUILD_NUMBER}\n'''
+            f'''    module: {line['module']}\n'''
+            f'''    line: {line['line']}\n'''
+            f'''    process: {line['process_ID']} {line['process_name']}\n'''
+            f'''    thread: {line['thread_ID']} {line['thread_name']}\n'''
+            f'''    task: {line['task_ID']} {line['task_name']}\n'''
+            f'''    message: {line['message']}\n'''
+            f'''    arguments: {line['arguments']}\n'''
+        )
+
+        if 'suppressed' in line:
+            text += f'''    suppressed: {line['suppressed']}\n'''
+
+        if 'exception' in line:
+            text += f'''    exception: {line['exception']}\n'''
+
+            if 'traceback' in line:
+                text += '\n' + textwrap.indent(line['traceback'], '    ')
+
+        return text + '\n'
+
+    def format_lines(lines):
+        return ''.join(format_line(line) for line in lines)
 else:
+    # Неизменные поля кодируются один раз при импорте, запись начинается с них
+    PREFIX = json.dumps(
+        {'service': SERVICE, 'version': VERSION, 'build_number': BUILD_NUMBER},
+        ensure_ascii=False,
+        separators=(',', ':')
+    )[:-1].encode() + b','
+
+    def encode_default(value):
+        # Байты декодируются, а не выводятся repr, чтобы размер записи был предсказуем
+        if isinstance(value, bytes | bytearray | memoryview):
+            return bytes(value).decode('utf-8', 'replace')
+
+        if isinstance(value, Decimal):
+            return str(value)
+
+        # Исключения и прочие объекты, не сериализуемые кодеком
+        return safe_repr(value)
+
+    def safe_repr(value):
+        try:
+            return repr(value)
+        except Exception:  # noqa: BLE001
+            return f'<{type(value).__name__} object>'
+
+    def encode_stdlib(line):
+        try:
+            return json.dumps(
+                line, default=encode_default, ensure_ascii=False, separators=(',', ':')
+            ).encode() + b'\n'
+        except (TypeError, ValueError):
+            # Ключи словаря, не приводимые к строке, циклические ссылки:
+            # аргументы записываются строкой, остальные поля записи - простые типы
+            return json.dumps(
+                {**line, 'arguments': safe_repr(line.get('arguments'))},
+                default=safe_repr,
+                ensure_ascii=False,
+                separators=(',', ':')
+            ).encode() + b'\n'
+
+    if orjson is not None:
+        def encode_line(line):
+            try:
+                return orjson.dumps(
+                    line,
+                    default=encode_default,
+                    option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+                )
+            except (TypeError, ValueError):
+                # Например, целые числа больше 64 бит
+                return encode_stdlib(line)
+    else:
+        encode_line = encode_stdlib
+
+    # Запись в формате JSON lines: объект JSON на строку
+    def format_line(line):
+        return (PREFIX + encode_line(line)[1:]).decode()
+
+    def format_lines(lines):
+        return b''.join(PREFIX + encode_line(line)[1:] for line in lines).decode()
+
+
+def write_texts(texts):
+    text = ''.join(texts)
+
+    with stderr_lock:
+        sys.stderr.write(text)
+        sys.stderr.flush()
+
+
+# Данные процесса и потока не меняются между записями и запоминаются
+process_metadata = None
+thread_local = threading.local()
+
+
+def get_process_metadata():
+    global process_metadata
+
+    if process_metadata is None:
+        process = multiprocessing.current_process()
+        process_metadata = (process.pid, process.name)
+
+    return process_metadata
+
+
+def get_thread_metadata():
+    try:
+        return thread_local.metadata
+    except AttributeError:
+        thread = threading.current_thread()
+        thread_local.metadata = (thread.native_id, thread.name)
+
+        return thread_local.metadata
+
+
+def reset_metadata():
+    global process_metadata, thread_local
+
+    process_metadata = None
+    thread_local = threading.local()
+
+
+os.register_at_fork(after_in_child=reset_metadata)
+
+
+def dropped_line(count, total):
+    process_ID, process_name = get_process_metadata()
+    thread_ID, thread_name = get_thread_metadata()
+
+    return {
+        'timestamp': str(dt.now()),
+        'module': __name__,
+        'line': None,
+        'level': 'warning',
+        'process_ID': process_ID,
+        'process_name': process_name,
+        'thread_ID': thread_ID,
+        'thread_name': thread_name,
+        'task_ID': None,
+        'task_name': None,
+        'message': 'Log lines dropped',
+        'arguments': {'count': count, 'total': total}
+    }
+
+
+STOP = object()
+
+
+# Запись в stderr в отдельном потоке: вызов логирования только кладёт запись в очередь,
+# поток забирает накопившиеся записи пачкой, форматирует и пишет их с одним flush.
+# Аргументы записи копируются при вызове, поэтому изменения после вызова в лог не попадают.
+# Записи, которые не удалось отформатировать, считаются отброшенными
+class Writer:
+    def __init__(
+        self, queue_size, batch_size, overflow='drop', write=write_texts, format=format_line
+    ):
+        if overflow not in ('drop', 'block'):
+            raise ValueError(f'Unknown overflow policy: {overflow}')
+
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.block = overflow == 'block'
+        self.write = write
+        self.format = format
+        self.queue = None
+        self.thread = None
+        self.pid = None
+        self.closed = False
+        self.start_lock = threading.Lock()
+        # Отброшенные записи: всего и ещё не попавшие в сообщение об отброшенных
+        self.dropped = 0
+        self.unreported = 0
+        self.dropped_lock = threading.Lock()
+
+    def put(self, line):
+        # Поток запускается при первой записи и заново в процессе, созданном fork
+        if self.pid != os.getpid() and not self.start():
+            self.write_batch([line])
+            return
+
+        if self.block:
+            self.queue.put(line)
+            return
+
+        try:
+            self.queue.put_nowait(line)
+        except queue.Full:
+            with self.dropped_lock:
+                self.dropped += 1
+                self.unreported += 1
+
+    def start(self):
+        with self.start_lock:
+            if self.closed:
+                return False
+
+            if self.pid != os.getpid():
+                self.queue = queue.Queue(self.queue_size)
+                self.thread = threading.Thread(
+                    target=self.run,
+                    name='convenience.logs',
+                    daemon=True
+                )
+                self.thread.start()
+                self.pid = os.getpid()
+
+            return True
+
+    def run(self):
+        stop = False
+
+        while not stop:
+            batch = [self.queue.get()]
+
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = STOP in batch
+            self.write_batch([line for line in batch if line is not STOP])
+
+            for _ in batch:
+                self.queue.task_done()
+
+    def write_batch(self, lines):
+        texts = []
+        failed = 0
+
+        # Ошибка форматирования одной записи не мешает записи остальных
+        for line in lines:
+            try:
+                texts.append(self.format(line))
+            except Exception:  # noqa: BLE001
+                failed += 1
+
+        with self.dropped_lock:
+            self.dropped += failed
+            unreported = self.unreported + failed
+            self.unreported = 0
+            total = self.dropped
+
+        try:
+            if unreported:
+                texts.append(self.format(dropped_line(unreported, total)))
+
+            if texts:
+                self.write(texts)
+        except Exception as e:  # noqa: BLE001
+            # Поток записи не должен останавливаться из-за ошибки записи
+            with stderr_lock:
+                sys.stderr.write(f'Failed to write {len(texts)} log lines: {e!r}\n')
+                sys.stderr.flush()
+
+    def flush(self):
+        if self.pid == os.getpid():
+            self.queue.join()
+
+    def close(self, timeout=5):
+        with self.start_lock:
+            if self.closed:
+                return
+
+            self.closed = True
+
+            if self.pid != os.getpid():
+                return
+
+        self.queue.put(STOP)
+        self.thread.join(timeout)
+        # Последующие записи пишутся в потоке вызова
+        self.pid = None
+
+
+if QUEUE_SIZE > 0:
+    writer = Writer(QUEUE_SIZE, BATCH_SIZE, OVERFLOW)
+    write_line = writer.put
+    atexit.register(writer.close)
+else:
+    writer = None
+
     def write_line(line):
-        with stderr_lock:
-            sys.stderr.write(str(line) + '\n')
-            sys.stderr.flush()
+        write_texts([format_line(line)])
+
+
+def flush():
+    if writer is not None:
+        writer.flush()
+
+
+def set_level(level):
+    global LEVEL
+
+    LEVEL = LEVELS[level]
+    logging.root.setLevel(LEVEL)
+
+
+def is_enabled(level):
+    return LEVELS[level] >= LEVEL
+
+
+# Аргумент, вычисляемый только для записываемых записей:
+# logs.debug('Response', body=logs.Lazy(body.decode, 'utf-8'))
+class Lazy:
+    __slots__ = ('args', 'function')
+
+    def __init__(self, function, *args):
+        self.function = function
+        self.args = args
+
+    def __call__(self):
+        return self.function(*self.args)
+
+
+# Строки и байты длиннее MAXIMUM_ARGUMENT_SIZE обрезаются, в том числе внутри
+# словарей, списков и кортежей (например, тело запроса в kwargs HTTP-клиента)
+def truncate(value, depth=0):
+    value_type = type(value)
+
+    if value_type is str:
+        if MAXIMUM_ARGUMENT_SIZE and len(value) > MAXIMUM_ARGUMENT_SIZE:
+            return f'{value[:MAXIMUM_ARGUMENT_SIZE]}... [{len(value)} total]'
+    elif value_type is bytes or value_type is bytearray:
+        if MAXIMUM_ARGUMENT_SIZE and len(value) > MAXIMUM_ARGUMENT_SIZE:
+            return bytes(value[:MAXIMUM_ARGUMENT_SIZE]) + b'... [%d total]' % len(value)
+
+        if value_type is bytearray:
+            return bytes(value)
+    elif depth < 4:
+        if value_type is dict:
+            return {key: truncate(item, depth + 1) for key, item in value.items()}
+
+        if value_type is list or value_type is tuple:
+            return value_type(truncate(item, depth + 1) for item in value)
+
+    return value
+
+
+# Ограничение частоты записей одного сообщения: в каждом окне в секунду пишется
+# не больше rate записей, число подавленных записей попадает в поле suppressed
+# следующей записи этого сообщения
+class MessageRateLimiter:
+    def __init__(self, rate, maximum_messages=10000):
+        self.rate = rate
+        self.maximum_messages = maximum_messages
+        # Сообщение - [начало окна, записей в окне, подавлено]
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    # Число подавленных записей сообщения до этой, None - запись подавляется
+    def acquire(self, message):
+        now = time.monotonic()
+
+        with self.lock:
+            window = self.windows.get(message)
+
+            if window is None or now - window[0] >= 1:
+                if window is None and len(self.windows) >= self.maximum_messages:
+                    self.windows.clear()
+
+                self.windows[message] = [now, 1, 0]
+
+                return 0 if window is None else window[2]
+
+            if window[1] < self.rate:
+                window[1] += 1
+
+                return 0
+
+            window[2] += 1
+
+            return None
+
+
+limiter = MessageRateLimiter(RATE_LIMIT) if RATE_LIMIT > 0 else None
 
 
 def log(level, frame, message, *, exception=None, traceback=None, **kwargs):
-    process = multiprocessing.current_process()
-    thread = threading.current_thread()
+    suppressed = 0
+
+    if limiter is not None:
+        suppressed = limiter.acquire(message)
+
+        if suppressed is None:
+            return
+
+    arguments = {
+        name: value() if type(value) is Lazy else value for name, value in kwargs.items()
+    }
+
+    # Копия аргументов: запись форматируется позже, в потоке записи
+    arguments = truncate(arguments)
+
+    process_ID, process_name = get_process_metadata()
+    thread_ID, thread_name = get_thread_metadata()
 
     try:
         task = asyncio.current_task()
@@ -65,23 +464,23 @@ def log(level, frame, message, *, exception=None, traceback=None, **kwargs):
         task_name = task.get_name()
 
     line = {
-        'service': SERVICE,
-        'version': VERSION,
-        'build_number': BUILD_NUMBER,
         'timestamp': str(dt.now()),
         'module': frame.f_globals['__name__'],
         'line': frame.f_lineno,
         'level': level,
-        'process_ID': process.pid,
-        'process_name': process.name,
-        'thread_ID': thread.native_id,
-        'thread_name': thread.name,
+        'process_ID': process_ID,
+        'process_name': process_name,
+        'thread_ID': thread_ID,
+        'thread_name': thread_name,
         'task_ID': task_ID,
         'task_name': task_name,
         'message': message,
-        'arguments': kwargs
+        'arguments': arguments
     }
 
+    if suppressed:
+        line['suppressed'] = suppressed
+
     if exception is not None:
         line['exception'] = repr(exception)
         line['traceback'] = ''.join(format_exception(None, exception, traceback))
@@ -90,26 +489,33 @@ def log(level, frame, message, *, exception=None, traceback=None, **kwargs):
 
 
 def debug(message, **kwargs):
-    log('debug', sys._getframe().f_back, message, **kwargs)
+    if LEVEL <= DEBUG:
+        log('debug', sys._getframe(1), message, **kwargs)
 
 
 def info(message, **kwargs):
-    log('info', sys._getframe().f_back, message, **kwargs)
+    if LEVEL <= INFO:
+        log('info', sys._getframe(1), message, **kwargs)
 
 
 def warning(message, **kwargs):
-    log('warning', sys._getframe().f_back, message, **kwargs)
+    if LEVEL <= WARNING:
+        log('warning', sys._getframe(1), message, **kwargs)
 
 
 def error(message, **kwargs):
-    log('error', sys._getframe().f_back, message, **kwargs)
+    if LEVEL <= ERROR:
+        log('error', sys._getframe(1), message, **kwargs)
 
 
 def exception_caught(message, **kwargs):
+    if LEVEL > ERROR:
+        return
+
     exception_type, exception, traceback = sys.exc_info()
     log(
         'error',
-        sys._getframe().f_back,
+        sys._getframe(1),
         message,
         exception=exception,
         traceback=traceback,
@@ -120,7 +526,7 @@ def exception_caught(message, **kwargs):
 # Для поддержки логирования в библиотеках типа Uvicorn
 class Handler(logging.Handler):
     def handle(self, record):
-        if record.levelno < logging.DEBUG:
+        if record.levelno < LEVEL:
             return
 
         if record.levelno < logging.INFO:
@@ -132,6 +538,15 @@ class Handler(logging.Handler):
         else:
             level = 'error'
 
+        suppressed = 0
+
+        # Сообщения библиотек различаются по шаблону, а не по подставленным значениям
+        if limiter is not None:
+            suppressed = limiter.acquire(str(record.msg))
+
+            if suppressed is None:
+                return
+
         frame = sys._getframe()
         module = 'logging'
         previous_module = None
@@ -145,8 +560,8 @@ class Handler(logging.Handler):
             frame = frame.f_back
             previous_module = module
 
-        process = multiprocessing.current_process()
-        thread = threading.current_thread()
+        process_ID, process_name = get_process_metadata()
+        thread_ID, thread_name = get_thread_metadata()
 
         try:
             task = asyncio.current_task()
@@ -161,17 +576,14 @@ class Handler(logging.Handler):
             task_name = task.get_name()
 
         line = {
-            'service': SERVICE,
-            'version': VERSION,
-            'build_number': BUILD_NUMBER,
             'timestamp': str(dt.fromtimestamp(record.created)),
             'module': module,
             'line': record.lineno,
             'level': level,
-            'process_ID': process.pid,
-            'process_name': process.name,
-            'thread_ID': thread.native_id,
-            'thread_name': thread.name,
+            'process_ID': process_ID,
+            'process_name': process_name,
+            'thread_ID': thread_ID,
+            'thread_name': thread_name,
             'task_ID': task_ID,
             'task_name': task_name,
             # Uvicorn иногда передаёт не строки в качестве сообщения
@@ -179,6 +591,12 @@ class Handler(logging.Handler):
             'arguments': {}
         }
 
+        if MAXIMUM_ARGUMENT_SIZE:
+            line['message'] = truncate(line['message'])
+
+        if suppressed:
+            line['suppressed'] = suppressed
+
         if isinstance(record.exc_info, tuple | list):
             if record.exc_info[1] is not None:
                 line['exception'] = repr(record.exc_info[1])
@@ -195,5 +613,5 @@ class Handler(logging.Handler):
         write_line(line)
 
 
-logging.root.setLevel('DEBUG')
+logging.root.setLevel(LEVEL)
 logging.basicConfig(handlers=[Handler()])
@@ -24,3 +24,35 @@ order_status_mapping_error = prometheus_client.Counter(
     'How many errors raised while mapping order status',
     ['service']
 )
+
+order_status_batch_size = prometheus_client.Histogram(
+    'order_status_batch_size',
+    'How many orders was requested from partner in one status request',
+    ['service'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200)
+)
+
+order_index_lookups_counter = prometheus_client.Counter(
+    'order_index_lookups',
+    'How many times created order was looked up in local index',
+    ['service', 'result']
+)
+
+order_outbox_pending = prometheus_client.Gauge(
+    'order_outbox_pending',
+    'How many accepted orders are waiting to be sent to partner',
+    ['service']
+)
+
+consumer_batch_size = prometheus_client.Histogram(
+    'consumer_batch_size',
+    'How many commands was read from queue in one batch',
+    ['service'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+
+consumer_commands_counter = prometheus_client.Counter(
+    'consumer_commands',
+    'How many commands was read from queue',
+    ['service', 'command']
+)
@@ -0,0 +1,158 @@
+'''Модуль группировки запросов статусов заказов в один запрос к партнеру.'''
+import asyncio
+import contextvars
+import weakref
+
+import aiohttp
+import yarl
+
+from .. import config, metrics
+from ..convenience.contracts import partner
+from ..convenience.httpclient import deadline
+from ..convenience.logs import logs
+
+
+class OrderStatusBatcher:
+    '''
+    Накопитель запросов статусов заказов.
+
+    Запросы статусов, поступившие в течение window секунд (или пока не набрано
+    maximum_size заказов), отправляются партнеру одним запросом /orders-data
+    со списком идентификаторов. Каждый ожидающий получает общий ответ партнера.
+    Если партнер отклонил весь список, он делится пополам и запрашивается повторно,
+    чтобы ошибка по одному заказу не завершала запросы остальных.
+    '''
+
+    def __init__(self, http, window: float, maximum_size: int):
+        self.http = http
+        self.window = window
+        self.maximum_size = maximum_size
+        self.pending = {}
+        self.timer = None
+        self.tasks = set()
+
+    async def fetch(self, their_order_ids: list[str]) -> partner.OrdersDataResponse:
+        '''Запрос статусов списка заказов у партнера.'''
+        metrics.order_status_batch_size.labels(config.PROJECT_NAME).observe(len(their_order_ids))
+
+        # Идентификаторы кодируются, запятая остается разделителем списка
+        URL = yarl.URL(config.URL + '/orders-data').with_query(
+            order_ids=','.join(their_order_ids)
+        )
+        _, body = await self.http.request('GET', str(URL))
+
+        return partner.decode_orders_data(body)
+
+    async def fetch_split(
+            self,
+            their_order_ids: list[str]) -> dict[str, partner.OrdersDataResponse | Exception]:
+        '''
+        Запрос статусов списка заказов с делением списка при ошибке партнера.
+
+        Возвращаемый результат:
+            ответ партнера или исключение для каждого заказа
+        '''
+        try:
+            result = await self.fetch(their_order_ids)
+        except Exception as e:  # noqa: BLE001
+            logs.exception_caught(
+                'Error while getting orders statuses', count=len(their_order_ids)
+            )
+            result = e
+
+        if len(their_order_ids) == 1 or not _rejected_list(result):
+            return dict.fromkeys(their_order_ids, result)
+
+        # Недоступность партнера не зависит от списка, повторяется только отказ по списку
+        logs.warning('Orders statuses list rejected, splitting', count=len(their_order_ids))
+        middle = len(their_order_ids) // 2
+        head, tail = await asyncio.gather(
+            self.fetch_split(their_order_ids[:middle]),
+            self.fetch_split(their_order_ids[middle:])
+        )
+
+        return head | tail
+
+    async def get(self, their_order_id: str):
+        '''Получение ответа партнера, содержащего статус заказа.'''
+        future = asyncio.get_running_loop().create_future()
+        self.pending.setdefault(their_order_id, []).append(future)
+
+        if len(self.pending) >= self.maximum_size:
+            self._flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+        left = deadline.remaining()
+
+        if left is None:
+            return await future
+
+        # Крайний срок ограничивает ожидание только этого запроса, общий запрос продолжается
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), max(left, 0))
+        except TimeoutError as e:
+            # Таймаут самого общего запроса передается как есть
+            if deadline.remaining() > 0:
+                raise
+
+            raise deadline.DeadlineExceededError(
+                f'Deadline exceeded for order status {their_order_id}'
+            ) from e
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        pending, self.pending = self.pending, {}
+
+        # Общий запрос не наследует контекст (крайний срок) вызвавшего отправку
+        task = asyncio.get_running_loop().create_task(
+            self._send(pending), context=contextvars.Context()
+        )
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _send(self, pending):
+        results = await self.fetch_split(list(pending))
+
+        for their_order_id, futures in pending.items():
+            result = results[their_order_id]
+
+            for future in futures:
+                if future.done():
+                    continue
+
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+def _rejected_list(result) -> bool:
+    # Ответ с ошибкой, нарушение контракта или ошибка клиента (4xx, кроме 429)
+    if isinstance(result, partner.OrdersDataResponse):
+        return result.status != 'ok'
+
+    if isinstance(result, aiohttp.ClientResponseError):
+        return 400 <= result.status < 500 and result.status != 429
+
+    return isinstance(result, partner.PartnerResponseError)
+
+
+_batchers = weakref.WeakKeyDictionary()
+
+
+def get_batcher(http) -> OrderStatusBatcher:
+    '''Накопитель запросов статусов для HTTP-клиента.'''
+    batcher = _batchers.get(http)
+
+    if batcher is None:
+        batcher = _batchers[http] = OrderStatusBatcher(
+            http,
+            config.ORDER_STATUS_BATCH_WINDOW,
+            config.ORDER_STATUS_BATCH_MAXIMUM_SIZE
+        )
+
+    return batcher
@@ -0,0 +1,77 @@
+'''Модуль классификации сообщений партнера об ошибках по товарам.'''
+import functools
+import re
+from decimal import Decimal, InvalidOperation
+
+# Виды ошибок по товару
+ITEM_NOT_FOUND = 'item_not_found'
+WRONG_QUANTITY = 'wrong_quantity'
+WRONG_PRICE = 'wrong_price'
+
+# Цены в сообщении, например 'Wrong price: current price is 455.23 or NONE'
+PRICES_PATTERN = re.compile(r'NONE|[0-9]*[.,]?[0-9]+')
+
+
+class ErrorClassifier:
+    '''
+    Табличный классификатор сообщений об ошибках.
+
+    Сначала сообщение ищется в словаре точных совпадений, затем проверяется
+    одним проходом по объединенному регулярному выражению из шаблонов
+    (побеждает совпадение, начинающееся раньше, при равенстве - шаблон,
+    указанный раньше; шаблоны не должны содержать групп захвата).
+    Результаты запоминаются: партнер повторяет одни и те же сообщения
+    для многих товаров. Новое сообщение партнера добавляется строкой в таблицу.
+    '''
+
+    def __init__(self, exact: dict[str, str], patterns: list[tuple[str, str]], cache_size=1024):
+        self.exact = dict(exact)
+        self.kinds = [kind for _, kind in patterns]
+        self.pattern = None
+
+        if patterns:
+            self.pattern = re.compile('|'.join(
+                f'(?P<_{number}>{pattern})' for number, (pattern, _) in enumerate(patterns)
+            ))
+
+        self.classify = functools.lru_cache(maxsize=cache_size)(self._classify)
+
+    def _classify(self, message: str) -> str | None:
+        '''Вид ошибки, None - сообщение не распознано.'''
+        kind = self.exact.get(message)
+
+        if kind is not None or self.pattern is None:
+            return kind
+
+        match = self.pattern.search(message)
+
+        if match is None:
+            return None
+
+        return self.kinds[int(match.lastgroup[1:])]
+
+
+ITEM_ERRORS = ErrorClassifier(
+    exact={
+        'Item not found': ITEM_NOT_FOUND,
+        'Wrong quantity': WRONG_QUANTITY
+    },
+    patterns=[
+        ('Wrong price', WRONG_PRICE)
+    ]
+)
+
+
+@functools.lru_cache(maxsize=1024)
+def get_available_price(message: str, reserve: bool) -> Decimal:
+    '''
+    Доступная цена из сообщения о неверной цене, 0 - цены нет.
+
+    Для бронирования берется первая цена, для предзаказа - вторая.
+    '''
+    prices = PRICES_PATTERN.findall(message)
+
+    try:
+        return Decimal(prices[0 if reserve else 1])
+    except (IndexError, InvalidOperation):
+        return Decimal(0)
@@ -0,0 +1,141 @@
+'''Модуль локального индекса созданных у партнера заказов.'''
+import asyncio
+import collections
+import sqlite3
+import threading
+
+from .. import config, metrics
+from ..convenience.logs import logs
+
+
+class OrderIndex:
+    '''
+    Соответствие нашего номера заказа номеру заказа партнера.
+
+    Индекс хранится в SQLite (режим WAL) и переживает перезапуск сервиса.
+    Последние maximum_size записей держатся в памяти, при старте они
+    загружаются из файла. Найденный в индексе заказ не ищется у партнера.
+    Методы вызываются из потоков пула, доступ к файлу и памяти - под блокировкой.
+    '''
+
+    def __init__(self, path: str, maximum_size: int = 100000):
+        self.maximum_size = maximum_size
+        self.cache = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        # В режиме WAL запись без fsync на каждую транзакцию не нарушает целостность файла
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS orders ('
+            'order_id TEXT PRIMARY KEY, their_order_id TEXT NOT NULL'
+            ')'
+        )
+
+    def warm_up(self):
+        '''Загрузка в память последних добавленных заказов.'''
+        # INSERT OR REPLACE выдает перезаписанной строке новый rowid
+        rows = self.connection.execute(
+            'SELECT order_id, their_order_id FROM orders ORDER BY rowid DESC LIMIT ?',
+            (self.maximum_size,)
+        ).fetchall()
+
+        for order_id, their_order_id in reversed(rows):
+            self._remember(order_id, their_order_id)
+
+        logs.info('Order index loaded', count=len(self.cache))
+
+    def _remember(self, order_id: str, their_order_id: str):
+        self.cache[order_id] = their_order_id
+        self.cache.move_to_end(order_id)
+
+        if len(self.cache) > self.maximum_size:
+            self.cache.popitem(last=False)
+
+    def get(self, order_id) -> str | None:
+        '''Номер заказа партнера или None, если заказ не создавался.'''
+        order_id = str(order_id)
+
+        with self.lock:
+            their_order_id = self.cache.get(order_id)
+
+            if their_order_id is None:
+                row = self.connection.execute(
+                    'SELECT their_order_id FROM orders WHERE order_id = ?', (order_id,)
+                ).fetchone()
+
+                if row is not None:
+                    their_order_id = row[0]
+                    self._remember(order_id, their_order_id)
+
+        result = 'miss' if their_order_id is None else 'hit'
+        metrics.order_index_lookups_counter.labels(config.PROJECT_NAME, result).inc()
+
+        return their_order_id
+
+    def put(self, order_id, their_order_id):
+        '''Сохранение номера заказа партнера.'''
+        order_id, their_order_id = str(order_id), str(their_order_id)
+
+        with self.lock:
+            if self.cache.get(order_id) == their_order_id:
+                return
+
+            self.connection.execute(
+                'INSERT OR REPLACE INTO orders VALUES (?, ?)', (order_id, their_order_id)
+            )
+
+            self._remember(order_id, their_order_id)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+_index: OrderIndex | None = None
+
+
+def open_index(path: str, maximum_size: int) -> OrderIndex:
+    '''Открытие индекса заказов и загрузка его в память.'''
+    global _index
+
+    _index = OrderIndex(path, maximum_size)
+    _index.warm_up()
+
+    return _index
+
+
+def close_index():
+    '''Закрытие индекса заказов.'''
+    global _index
+
+    if _index is not None:
+        _index.close()
+        _index = None
+
+
+# Запросы к SQLite выполняются в потоке пула, чтобы не останавливать цикл событий
+async def lookup(order_id) -> str | None:
+    '''Номер заказа партнера из индекса, None - нет в индексе или индекс выключен.'''
+    if _index is None:
+        return None
+
+    try:
+        return await asyncio.to_thread(_index.get, order_id)
+    except sqlite3.Error:
+        # Заказ будет найден у партнера
+        logs.exception_caught('Error while looking up order in index', order_ID=order_id)
+        return None
+
+
+async def remember(order_id, their_order_id):
+    '''Сохранение номера заказа партнера в индекс, если он включен.'''
+    if _index is None:
+        return
+
+    try:
+        await asyncio.to_thread(_index.put, order_id, their_order_id)
+    except sqlite3.Error:
+        # Индекс лишь ускоряет создание заказа, заказ у партнера уже создан
+        logs.exception_caught('Error while saving order to index', order_ID=order_id)
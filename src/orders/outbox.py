@@ -0,0 +1,237 @@
+'''Модуль асинхронной отправки заказов партнеру через outbox.'''
+import asyncio
+import sqlite3
+import threading
+
+from .. import config, metrics
+from ..convenience import broker as brokers
+from ..convenience import jsoncodec
+from ..convenience.contracts.loaders.input import Order
+from ..convenience.contracts.loaders.output import (
+    DataError,
+    SendOrderResponseAccepted,
+    SendOrderResponseError,
+)
+from ..convenience.logs import logs
+from . import v2
+
+# Состояния заказа в outbox
+PENDING = 'pending'        # принят, партнеру не отправлен
+SENT = 'sent'              # отправлен партнеру, результат не опубликован
+PUBLISHED = 'published'    # результат опубликован в очередь
+
+
+class Outbox:
+    '''
+    Хранилище принятых к отправке заказов (SQLite, режим WAL).
+
+    Заказ записывается до ответа клиенту и не теряется при перезапуске
+    сервиса: неотправленные заказы и неопубликованные результаты
+    обрабатываются повторно при старте.
+    Методы вызываются из потоков пула, доступ к файлу - под блокировкой.
+    '''
+
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        # Принятый клиентом заказ не должен теряться и при отключении питания
+        self.connection.execute('PRAGMA synchronous=FULL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS outbox ('
+            'order_id INTEGER PRIMARY KEY, state TEXT NOT NULL, '
+            'payload TEXT NOT NULL, result TEXT'
+            ')'
+        )
+
+    def add(self, order: Order) -> bool:
+        '''Сохранение заказа, False - заказ уже был принят.'''
+        payload = order.model_dump_json()
+
+        with self.lock:
+            cursor = self.connection.execute(
+                'INSERT OR IGNORE INTO outbox (order_id, state, payload) VALUES (?, ?, ?)',
+                (order.order_id, PENDING, payload)
+            )
+
+        return cursor.rowcount == 1
+
+    def get(self, order_id: int) -> tuple[str, Order, str | None]:
+        with self.lock:
+            state, payload, result = self.connection.execute(
+                'SELECT state, payload, result FROM outbox WHERE order_id = ?', (order_id,)
+            ).fetchone()
+
+        return state, Order.model_validate_json(payload), result
+
+    def get_result(self, order_id: int) -> tuple[str, str | None] | None:
+        '''Состояние заказа и результат его создания, None - заказ не принимался.'''
+        with self.lock:
+            return self.connection.execute(
+                'SELECT state, result FROM outbox WHERE order_id = ?', (order_id,)
+            ).fetchone()
+
+    def unfinished(self) -> list[int]:
+        '''Заказы, обработка которых не была завершена.'''
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT order_id FROM outbox WHERE state != ? ORDER BY rowid', (PUBLISHED,)
+            ).fetchall()
+
+        return [order_id for order_id, in rows]
+
+    def set_state(self, order_id: int, state: str, result: str | None = None):
+        with self.lock:
+            self.connection.execute(
+                'UPDATE outbox SET state = ?, result = COALESCE(?, result) WHERE order_id = ?',
+                (state, result, order_id)
+            )
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class OrderSubmitter:
+    '''
+    Асинхронная отправка заказов партнеру.
+
+    Принятый заказ сохраняется в outbox, клиент сразу получает ответ.
+    Пул обработчиков отправляет заказы партнеру с повторами при ошибках
+    и публикует результат создания заказа в очередь results_queue.
+    Заказ, обработка которого завершилась ошибкой, ставится в очередь повторно
+    с экспоненциально растущей паузой.
+    '''
+
+    def __init__(
+            self,
+            outbox: Outbox,
+            broker,
+            create_order_http,
+            http,
+            workers: int,
+            results_queue: str):
+        self.outbox = outbox
+        self.broker = broker
+        self.create_order_http = create_order_http
+        self.http = http
+        self.workers = workers
+        self.results_queue = results_queue
+        self.queue = asyncio.Queue()
+        # Количество неудачных попыток обработки заказа подряд
+        self.failures = {}
+
+    def _update_pending(self):
+        metrics.order_outbox_pending.labels(config.PROJECT_NAME).set(self.queue.qsize())
+
+    async def submit(self, order: Order) -> SendOrderResponseAccepted:
+        '''Прием заказа к отправке.'''
+        if await asyncio.to_thread(self.outbox.add, order):
+            self.queue.put_nowait(order.order_id)
+            self._update_pending()
+        else:
+            logs.info('Order is already accepted', order_ID=order.order_id)
+
+        return SendOrderResponseAccepted(order_id=order.order_id)
+
+    async def get_result(self, order_id: int) -> dict | SendOrderResponseAccepted | None:
+        '''
+        Результат создания заказа, сохраненный в outbox.
+
+        Возвращаемый результат:
+            ответ синхронного метода создания заказа, SendOrderResponseAccepted -
+            заказ еще не отправлен партнеру, None - заказ не принимался
+        '''
+        row = await asyncio.to_thread(self.outbox.get_result, order_id)
+
+        if row is None:
+            return None
+
+        _, result = row
+
+        if result is None:
+            return SendOrderResponseAccepted(order_id=order_id)
+
+        return jsoncodec.loads(result)
+
+    async def _create_order(self, order: Order):
+        # Повторы при ошибках отправки, ошибки по товарам окончательны
+        for attempt in brokers.attempts(config.RABBITMQ_RETRIES_COUNT):
+            try:
+                return await v2.create_order(self.create_order_http, self.http, order)
+            except Exception as e:  # noqa: BLE001
+                logs.exception_caught(
+                    'Error while creating order',
+                    order_ID=order.order_id,
+                    attempt=attempt,
+                    error=str(e)
+                )
+
+            if attempt != config.RABBITMQ_RETRIES_COUNT:
+                await asyncio.sleep(config.RABBITMQ_RETRIES_SLEEP)
+
+        return SendOrderResponseError(data=DataError(partner_error=True))
+
+    async def process(self, order_id: int):
+        '''Отправка заказа партнеру и публикация результата.'''
+        state, order, result = await asyncio.to_thread(self.outbox.get, order_id)
+
+        if state == PENDING:
+            response = await self._create_order(order)
+            result = response.model_dump_json()
+            await asyncio.to_thread(self.outbox.set_state, order_id, SENT, result)
+
+            if response.result == 'success':
+                metrics.orders_created_counter.labels(config.PROJECT_NAME).inc()
+            else:
+                metrics.orders_creating_errors_counter.labels(config.PROJECT_NAME).inc()
+
+        body = jsoncodec.dumps({'order_id': order_id, 'response': jsoncodec.loads(result)})
+        await brokers.publish(
+            self.broker,
+            self.results_queue,
+            body,
+            config.RABBITMQ_TIMEOUT,
+            config.RABBITMQ_RETRIES_COUNT,
+            config.RABBITMQ_RETRIES_SLEEP
+        )
+        await asyncio.to_thread(self.outbox.set_state, order_id, PUBLISHED)
+
+    async def _work(self):
+        while True:
+            order_id = await self.queue.get()
+            self._update_pending()
+
+            try:
+                await self.process(order_id)
+            except Exception:  # noqa: BLE001
+                logs.exception_caught('Error while processing order', order_ID=order_id)
+                self._retry_later(order_id)
+            else:
+                self.failures.pop(order_id, None)
+            finally:
+                self.queue.task_done()
+
+    def _retry_later(self, order_id: int):
+        # Пауза удваивается после каждой неудачи, но не превышает ORDER_OUTBOX_RETRIES_SLEEP_MAX
+        failures = self.failures[order_id] = self.failures.get(order_id, 0) + 1
+        delay = min(
+            config.RABBITMQ_RETRIES_SLEEP * 2 ** (failures - 1),
+            config.ORDER_OUTBOX_RETRIES_SLEEP_MAX
+        )
+        asyncio.get_running_loop().call_later(delay, self._requeue, order_id)
+
+    def _requeue(self, order_id: int):
+        self.queue.put_nowait(order_id)
+        self._update_pending()
+
+    async def run(self):
+        '''Запуск обработчиков с дообработкой заказов, принятых до перезапуска.'''
+        for order_id in await asyncio.to_thread(self.outbox.unfinished):
+            self.queue.put_nowait(order_id)
+
+        self._update_pending()
+
+        async with asyncio.TaskGroup() as task_group:
+            for number in range(self.workers):
+                task_group.create_task(self._work(), name=f'order submitter {number}')
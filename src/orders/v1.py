@@ -1,13 +1,12 @@
 '''Модуль обработки заказов 1 версия.'''
-import json
-
-import aiohttp
 from ..convenience.contracts.loader import (
     CancelOrderResponseRejected, CancelOrderResponseSuccess, TransientErrorResponse
 )
-from ..convenience.httpclient.httpclient import HTTP
+from ..convenience.contracts import partner
+from ..convenience.httpclient.httpclient import HTTP, RequestRejectedError
 from ..convenience.logs import logs
 from .. import common, config, metrics
+from . import batching, forms, index
 
 MAPPING_DICT = {
     'created': 0,
@@ -25,43 +24,49 @@ class RejectedOrderException(Exception):
 
 async def create_order(create_order_http, http, our_order: common.Order):
     '''Создание заказа.'''
+    # Заказ уже создавался этим сервисом
+    their_order_id = await index.lookup(our_order.OrderId)
+    if their_order_id is not None:
+        return their_order_id
+
     _, body = await http.request(
         'GET',
         config.URL + f'/find-orders?external_id={our_order.OrderId}'
     )
-    result = json.loads(body)
-    ids = result['data']['ids']
+    ids = partner.decode(partner.find_orders_adapter, body).data.ids
     if len(ids) != 0:
+        await index.remember(our_order.OrderId, min(ids))
         return str(min(ids))
     else:
-        form = aiohttp.FormData([
-            ('shop_id', our_order.TheirPharmacyId),
-            ('phone', our_order.Client.Phone),
-            ('first_name', our_order.Client.FIO),
-            ('email', our_order.Client.EMail),
-            ('external_id', our_order.OrderId)
-        ])
-        for item in our_order.Items:
-            form.add_field('ids[]', item.TheirId)
-            form.add_field('quantity[]', item.Count)
-            form.add_field('prices[]', item.Price)
+        form = forms.encode_create_order(
+            [
+                ('shop_id', our_order.TheirPharmacyId),
+                ('phone', our_order.Client.Phone),
+                ('first_name', our_order.Client.FIO),
+                ('email', our_order.Client.EMail),
+                ('external_id', our_order.OrderId)
+            ],
+            [(item.TheirId, item.Count, item.Price) for item in our_order.Items]
+        )
 
         logs.debug('Sending order to Partner', order_ID=our_order.OrderId)
         _, body = await create_order_http.request(
             'POST',
             config.URL + '/create',
-            data=form
+            data=form,
+            headers=forms.CREATE_ORDER_HEADERS
         )
-        result_dict = json.loads(body)
-        if result_dict['status'] == 'ok':
+        result = partner.decode(partner.create_order_adapter, body)
+        if result.status == 'ok':
             logs.debug(
                 'Order is created SUCCESSFUL',
                 order_ID=our_order.OrderId,
-                their_order_ID=result_dict['order_id']
+                their_order_ID=result.order_id
             )
-            return str(result_dict['order_id'])
-        elif result_dict['status'] == 'error':
-            errors = result_dict.get('errors')
+            await index.remember(our_order.OrderId, result.order_id)
+            return str(result.order_id)
+        elif result.status == 'error':
+            errors = result.errors
             logs.error('Remote API rejected order', result=errors)
             raise RejectedOrderException(errors)
         else:
@@ -72,22 +77,18 @@ async def create_order(create_order_http, http, our_order: common.Order):
 async def get_order(http, order_status: common.StatusRequestModel):
     '''Получение статуса заказа.'''
     logs.debug('Getting order info from Partner', order_ID=order_status.OrderId)
-    _, body = await http.request(
-        'GET',
-        config.URL + f'/orders-data?order_ids={order_status.TheirOrderId}'
-    )
-    result_dict = json.loads(body)
-    errors = result_dict.get('errors')
-    if result_dict['status'] == 'ok':
+    # Запрос объединяется с одновременными запросами статусов других заказов
+    result = await batching.get_batcher(http).get(order_status.TheirOrderId)
+    if result.status == 'ok':
         logs.debug('Getting order info: Succesful', order_ID=order_status.OrderId)
-        their_order_status = result_dict['data'][order_status.TheirOrderId]['status']
+        their_order_status = result.get_order(order_status.TheirOrderId)['status']
         our_order_status = MAPPING_DICT.get(their_order_status, -1)
         if our_order_status == -1:
             logs.error('Order status mapping error', their_status=their_order_status)
             metrics.order_status_mapping_error.labels(config.PROJECT_NAME).inc()
-        return True, result_dict['status'], our_order_status, our_order_status
+        return True, result.status, our_order_status, our_order_status
     else:
-        return False, str(errors), None, None
+        return False, str(result.errors), None, None
 
 
 async def cancel_order(http: HTTP, order_ID: int, their_order_ID: str):
@@ -102,10 +103,10 @@ async def cancel_order(http: HTTP, order_ID: int, their_order_ID: str):
             data=payload
         )
 
-        result_dict = json.loads(body)
+        result = partner.decode(partner.cancel_order_adapter, body)
 
         # Корректный ответ (статус 'ok')
-        if result_dict.get('status') == 'ok':
+        if result.status == 'ok':
             logs.info(
                 'Order cancelled',
                 their_order_ID=their_order_ID,
@@ -113,14 +114,19 @@ async def cancel_order(http: HTTP, order_ID: int, their_order_ID: str):
             )
             return CancelOrderResponseSuccess()
 
-        errors = result_dict.get('errors')
+        errors = result.errors
         # Некорректная бизнес-логика
-        if errors[0] == 'cancellation not allowed':
+        if errors and errors[0] == 'cancellation not allowed':
             return CancelOrderResponseRejected(Message=str(errors))
 
         # Ошибка временная
         return TransientErrorResponse(Message=str(errors))
 
+    except RequestRejectedError as ex:
+        # Партнер недоступен или перегружен, запрос не отправлялся
+        logs.warning('Request to partner rejected', order_ID=order_ID, error=str(ex))
+        return TransientErrorResponse(Message=str(ex))
+
     except Exception as ex:
         logs.exception_caught(
             'HTTP response error',
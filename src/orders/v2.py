@@ -1,19 +1,19 @@
 '''Модуль обработки заказов 2 версия.'''
+import asyncio
 from decimal import Decimal
-import json
-import re
 
-import aiohttp
-from ..convenience.contracts.loaders.input import Order
+from ..convenience.contracts.loaders.input import GetOrderStatusRequest, Order
 from ..convenience.contracts.loaders.output import (
     CancelOrderResponseRejected, CancelOrderResponseSuccess, DataError,
     GetOrderStatusResponseError, GetOrderStatusResponseSuccess,
     ListItemsPriceError, ListItemsQuantityError, PriceErrorItem, QuantityErrorItem,
     SendOrderResponseError, SendOrderResponseSuccess, TransientErrorResponse
 )
-from ..convenience.httpclient.httpclient import HTTP
+from ..convenience.contracts import partner
+from ..convenience.httpclient.httpclient import HTTP, RequestRejectedError
 from ..convenience.logs import logs
 from .. import config, metrics
+from . import batching, classifier, forms, index
 
 MAPPING_DICT = {
     'created': 0,
@@ -34,73 +34,54 @@ def _get_detail_from_errors(errors_items: dict, order: Order):
     list_items_quantity_error = None
     list_items_price_error = None
 
-    ordered_items = {}
-    # Формирование структуры данных с данными о товарах в заказе
-    for item in order.items:
-        ordered_items[item.their_id] = {'price': item.price, 'count': item.count}
+    # Товары заказа по ид партнера. Количество и цена проверены при разборе запроса,
+    # доступная цена положительна, модели ошибок создаются без повторной проверки
+    ordered_items = {item.their_id: item for item in order.items}
+    # Для бронирования доступна цена бронирования (1 цена), иначе предзаказа (2 цена)
+    reserve = order.order_type == 2
 
     # По каждому товару обрабатываем текст об ошибке
     for item_id, mssg_error in errors_items.items():
-        # Товар не найден у партнера
-        if mssg_error[0] == 'Item not found':
-            # Устанавливаем доступное кол-во в 0
+        kind = classifier.ITEM_ERRORS.classify(mssg_error[0])
+
+        if kind is None:
+            continue
+
+        ordered_item = ordered_items[item_id]
+
+        # Товар не найден у партнера - доступное кол-во 0,
+        # запрошено недоступное кол-во - available не устанавливаем
+        if kind != classifier.WRONG_PRICE:
             quantity_errors_items.append(
-                QuantityErrorItem(
+                QuantityErrorItem.model_construct(
                     their_id=str(item_id),
-                    ordered=int(ordered_items[item_id]['count']),
-                    available=0
+                    ordered=int(ordered_item.count),
+                    available=0 if kind == classifier.ITEM_NOT_FOUND else None
                 )
             )
-        # Запрошено недоступное кол-во
-        elif mssg_error[0] == 'Wrong quantity':
-            # Зафиксируем id товара, но available не будем устанавливать
+            continue
+
+        # Некорректная цена
+        available_price = classifier.get_available_price(mssg_error[0], reserve)
+
+        if available_price == 0:
+            # Устанавливаем доступное кол-во в 0
             quantity_errors_items.append(
-                QuantityErrorItem(
+                QuantityErrorItem.model_construct(
                     their_id=str(item_id),
-                    ordered=int(ordered_items[item_id]['count']),
-                    available=None
+                    ordered=int(ordered_item.count),
+                    available=0
                 )
             )
-
-        # Некорректная цена
-        elif 'Wrong price' in mssg_error[0]:
-
-            # Пример mssg_error[0] = 'Wrong price: current price is 455.23 or NONE'
-            all_prices = re.findall(r'NONE|[0-9]*[.,]?[0-9]+', mssg_error[0])
-            available_price = 0
-
-            # Проверяем тип заказа
-            if order.order_type == 2:
-                # Берем цену бронирования (1 цена)
-                try:
-                    available_price = Decimal(all_prices[0])
-                except Exception:
-                    pass
-            else:
-                # Берем цену предзаказа (2 цена)
-                try:
-                    available_price = Decimal(all_prices[1])
-                except Exception:
-                    pass
-
-            if available_price == 0:
-                # Устанавливаем доступное кол-во в 0
-                quantity_errors_items.append(
-                    QuantityErrorItem(
-                        their_id=str(item_id),
-                        ordered=int(ordered_items[item_id]['count']),
-                        available=0
-                    )
-                )
-            else:
-                # Фиксируем информацию об ошибке по цене
-                price_errors_items.append(
-                    PriceErrorItem(
-                        their_id=str(item_id),
-                        ordered=Decimal(ordered_items[item_id]['price']),
-                        available=available_price
-                    )
+        else:
+            # Фиксируем информацию об ошибке по цене
+            price_errors_items.append(
+                PriceErrorItem.model_construct(
+                    their_id=str(item_id),
+                    ordered=Decimal(ordered_item.price),
+                    available=available_price
                 )
+            )
 
     # Формирование модели ошибки для ответа
     if len(quantity_errors_items) > 0:
@@ -123,33 +104,41 @@ def _get_detail_from_errors(errors_items: dict, order: Order):
 
 async def create_order(create_order_http, http, our_order: Order):
     '''Метод отправки заказа партнеру.'''
+    # Заказ уже создавался этим сервисом
+    their_order_id = await index.lookup(our_order.order_id)
+    if their_order_id is not None:
+        # Товары заказа уже проверены при разборе запроса, ответ создается без проверки
+        return SendOrderResponseSuccess.model_construct(
+            their_order_id=their_order_id,
+            items=our_order.items
+        )
+
     # Проверяем не создан ли уже заказ с таким id
     _, body = await http.request(
         'GET',
         config.URL + f'/find-orders?external_id={our_order.order_id}'
     )
-    result = json.loads(body)
-    ids = result['data']['ids']
+    ids = partner.decode(partner.find_orders_adapter, body).data.ids
     if len(ids) != 0:
+        await index.remember(our_order.order_id, min(ids))
 
         # Возвращаем ранее созданный заказ
-        return SendOrderResponseSuccess(
+        return SendOrderResponseSuccess.model_construct(
             their_order_id=str(min(ids)),
             items=our_order.items
         )
 
     # Формирование тела запроса на создание заказа
-    form = aiohttp.FormData([
-        ('shop_id', our_order.their_pharmacy_id),
-        ('phone', our_order.client.phone),
-        ('first_name', our_order.client.name),
-        ('email', our_order.client.email),
-        ('external_id', our_order.order_id)
-    ])
-    for item in our_order.items:
-        form.add_field('ids[]', item.their_id)
-        form.add_field('quantity[]', item.count)
-        form.add_field('prices[]', item.price)
+    form = forms.encode_create_order(
+        [
+            ('shop_id', our_order.their_pharmacy_id),
+            ('phone', our_order.client.phone),
+            ('first_name', our_order.client.name),
+            ('email', our_order.client.email),
+            ('external_id', our_order.order_id)
+        ],
+        [(item.their_id, item.count, item.price) for item in our_order.items]
+    )
 
     logs.debug('Sending order to Partner', order_ID=our_order.order_id)
 
@@ -157,28 +146,30 @@ async def create_order(create_order_http, http, our_order: Order):
     _, body = await create_order_http.request(
         'POST',
         config.URL + '/create',
-        data=form
+        data=form,
+        headers=forms.CREATE_ORDER_HEADERS
     )
-    result_dict = json.loads(body)
+    result = partner.decode(partner.create_order_adapter, body)
 
     # Заказ успешно создан
-    if result_dict['status'] == 'ok':
+    if result.status == 'ok':
         logs.debug(
             'Order is created SUCCESSFUL',
             order_ID=our_order.order_id,
-            their_order_ID=result_dict['order_id']
+            their_order_ID=result.order_id
         )
-        return SendOrderResponseSuccess(
-            their_order_id=str(result_dict['order_id']),
+        await index.remember(our_order.order_id, result.order_id)
+        return SendOrderResponseSuccess.model_construct(
+            their_order_id=str(result.order_id),
             items=our_order.items
         )
 
     # Заказ не создан - ошибка
-    elif result_dict['status'] == 'error':
+    elif result.status == 'error':
 
         # Обработка ошибок по товарам,
         # если таких нет - исключение выдаст партнерскую ошибку
-        errors_items = result_dict['errors']['items']
+        errors_items = result.get_item_errors()
 
         # Детализируем информацию об остатках каждого товара
         quantity_errors_items, price_errors_items = _get_detail_from_errors(
@@ -201,32 +192,41 @@ async def create_order(create_order_http, http, our_order: Order):
     raise Exception('Invalid answer from remote API')
 
 
+def _parse_order_status(
+    result: partner.OrdersDataResponse,
+    order_id: int,
+    their_order_id: str
+):
+    '''Метод разбора ответа партнера со статусом заказа.'''
+    if result.status != 'ok':
+        raise Exception(result.errors)
+
+    logs.debug('Getting order info: Succesful', order_ID=order_id)
+    their_order_status = result.get_order(their_order_id)['status']
+    our_order_status = MAPPING_DICT.get(their_order_status, -1)
+    if our_order_status == -1:
+        logs.error('Order status mapping error', their_status=their_order_status)
+        metrics.order_status_mapping_error.labels(config.PROJECT_NAME).inc()
+
+    return GetOrderStatusResponseSuccess(
+        status_id=our_order_status,
+        their_status_id=our_order_status
+    )
+
+
 async def get_order_status(http: HTTP, order_id: int, their_order_id: str):
     '''Метод получения статуса заказа от партнера.'''
     try:
         logs.debug('Getting order info from Partner', order_ID=order_id)
-        _, body = await http.request(
-            'GET',
-            config.URL + f'/orders-data?order_ids={their_order_id}'
-        )
-        result_dict = json.loads(body)
-
-        if result_dict['status'] == 'ok':
-            logs.debug('Getting order info: Succesful', order_ID=order_id)
-            their_order_status = result_dict['data'][their_order_id]['status']
-            our_order_status = MAPPING_DICT.get(their_order_status, -1)
-            if our_order_status == -1:
-                logs.error('Order status mapping error', their_status=their_order_status)
-                metrics.order_status_mapping_error.labels(config.PROJECT_NAME).inc()
-
-            return GetOrderStatusResponseSuccess(
-                status_id=our_order_status,
-                their_status_id=our_order_status
-            )
+        # Запрос объединяется с одновременными запросами статусов других заказов
+        result = await batching.get_batcher(http).get(their_order_id)
 
-        else:
-            errors = result_dict.get('errors')
-            raise Exception(errors)
+        return _parse_order_status(result, order_id, their_order_id)
+
+    except RequestRejectedError as e:
+        # Партнер недоступен или перегружен, запрос не отправлялся
+        logs.warning('Request to partner rejected', order_ID=order_id, error=str(e))
+        return TransientErrorResponse(message=str(e))
 
     except Exception as e:
         logs.exception_caught(
@@ -239,6 +239,48 @@ async def get_order_status(http: HTTP, order_id: int, their_order_id: str):
         )
 
 
+async def get_orders_statuses(http: HTTP, orders: list[GetOrderStatusRequest]):
+    '''Метод получения статусов списка заказов от партнера.'''
+    batcher = batching.get_batcher(http)
+    semaphore = asyncio.Semaphore(config.ORDER_STATUS_BATCH_CONCURRENCY)
+
+    # Заказы разбиваются на части, каждая запрашивается у партнера одним запросом
+    their_order_ids = list(dict.fromkeys(order.their_order_id for order in orders))
+    size = config.ORDER_STATUS_BATCH_MAXIMUM_SIZE
+    chunks = [their_order_ids[i:i + size] for i in range(0, len(their_order_ids), size)]
+    results = {}
+
+    async def fetch(chunk):
+        async with semaphore:
+            results.update(await batcher.fetch_split(chunk))
+
+    await asyncio.gather(*(fetch(chunk) for chunk in chunks))
+
+    # Ошибка по одному заказу не влияет на ответы по остальным
+    responses = []
+    for order in orders:
+        result = results[order.their_order_id]
+
+        if isinstance(result, RequestRejectedError):
+            responses.append(TransientErrorResponse(message=str(result)))
+        elif isinstance(result, Exception):
+            responses.append(GetOrderStatusResponseError(message=str(result)))
+        else:
+            try:
+                responses.append(
+                    _parse_order_status(result, order.order_id, order.their_order_id)
+                )
+            except Exception as e:
+                logs.error(
+                    'Error while getting order status',
+                    order_ID=order.order_id,
+                    error=repr(e)
+                )
+                responses.append(GetOrderStatusResponseError(message=repr(e)))
+
+    return responses
+
+
 async def cancel_order(http: HTTP, order_ID: int, their_order_ID: str):
     '''Метод отмены заказа у партнера.'''
     try:
@@ -251,10 +293,10 @@ async def cancel_order(http: HTTP, order_ID: int, their_order_ID: str):
             data=payload
         )
 
-        result_dict = json.loads(body)
+        result = partner.decode(partner.cancel_order_adapter, body)
 
         # Корректный ответ (статус 'ok')
-        if result_dict.get('status') == 'ok':
+        if result.status == 'ok':
             logs.info(
                 'Order cancelled',
                 their_order_ID=their_order_ID,
@@ -262,14 +304,19 @@ async def cancel_order(http: HTTP, order_ID: int, their_order_ID: str):
             )
             return CancelOrderResponseSuccess()
 
-        errors = result_dict.get('errors')
+        errors = result.errors
         # Некорректная бизнес-логика
-        if errors[0] == 'cancellation not allowed':
+        if errors and errors[0] == 'cancellation not allowed':
             return CancelOrderResponseRejected(message=str(errors))
 
         # Ошибка временная
         return TransientErrorResponse(message=str(errors))
 
+    except RequestRejectedError as ex:
+        # Партнер недоступен или перегружен, запрос не отправлялся
+        logs.warning('Request to partner rejected', order_ID=order_ID, error=str(ex))
+        return TransientErrorResponse(message=str(ex))
+
     except Exception as ex:
         logs.exception_caught(
             'HTTP response error',
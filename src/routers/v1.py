@@ -1,14 +1,17 @@
 '''Ендпоинты методов 1 версии.'''
 from ..convenience.contracts.loader import (
     CancelOrderRequest, GetOrderStatusResponseError, GetOrderStatusResponseSuccess,
-    OrderRejectedErrorResponse, SendOrderResponseSuccess, TransientErrorResponse
+    OrderRejectedErrorResponse, SendOrderItemsResponse, SendOrderResponseSuccess,
+    TransientErrorResponse
 )
 from fastapi import APIRouter, Request
+from ..convenience.httpclient.httpclient import RequestRejectedError
+from ..convenience.jsoncodec import ModelJSONRoute
 from ..convenience.logs import logs
 from .. import common, config, metrics
 from ..orders import v1 as orders
 
-router = APIRouter()
+router = APIRouter(route_class=ModelJSONRoute)
 
 
 @router.post('/SendOrder')
@@ -23,31 +26,46 @@ async def send_order(request: Request, order: common.Order):
         metrics.orders_creating_errors_counter.labels(config.PROJECT_NAME).inc()
         return OrderRejectedErrorResponse(Message=str(e))
 
+    except RequestRejectedError as e:
+        # Партнер недоступен или перегружен, запрос не отправлялся
+        logs.warning('Request to partner rejected', order_ID=order.OrderId, error=str(e))
+        metrics.orders_creating_errors_counter.labels(config.PROJECT_NAME).inc()
+        return TransientErrorResponse(Message=str(e))
+
     except Exception:
         logs.exception_caught('Error while define existing of order')
         metrics.orders_creating_errors_counter.labels(config.PROJECT_NAME).inc()
         return TransientErrorResponse(Message='HTTP response error')
 
-    items = []
-
-    for item in order.Items:
-        items.append({
-            'TheirId': item.TheirId,
-            'Price': str(item.Price),
-            'Count': item.Count
-        })
+    # Товары уже проверены при разборе запроса, модели ответа создаются без проверки
+    items = [
+        SendOrderItemsResponse.model_construct(
+            TheirId=item.TheirId,
+            Price=str(item.Price),
+            Count=item.Count
+        )
+        for item in order.Items
+    ]
 
     metrics.orders_created_counter.labels(config.PROJECT_NAME).inc()
-    return SendOrderResponseSuccess(TheirOrderId=their_order_id, Items=items)
+    return SendOrderResponseSuccess.model_construct(TheirOrderId=their_order_id, Items=items)
 
 
 @router.post('/GetOrderStatus')
 async def get_order_status(request: Request, order_status: common.StatusRequestModel):
     '''Получение статуса заказа.'''
-    result, message, their_order_status, our_order_status = await orders.get_order(
-        request.app.http,
-        order_status
-    )
+    try:
+        result, message, their_order_status, our_order_status = await orders.get_order(
+            request.app.http,
+            order_status
+        )
+    except RequestRejectedError as e:
+        # Партнер недоступен или перегружен, запрос не отправлялся
+        logs.warning(
+            'Request to partner rejected', order_ID=order_status.OrderId, error=str(e)
+        )
+        return TransientErrorResponse(Message=str(e))
+
     if result:
         if order_status.TheirStatusId != their_order_status:
             metrics.order_changing_status_counter.labels(config.PROJECT_NAME).inc()
@@ -1,11 +1,18 @@
 '''Ендпоинты методов 2 версии.'''
-from ..convenience.contracts.loaders.input import CancelOrderRequest, Order
-from ..convenience.contracts.loaders.output import DataError, SendOrderResponseError
-from fastapi import APIRouter, Request
+from ..convenience.contracts.loaders.input import (
+    CancelOrderRequest, GetOrderStatusBatchRequest, Order
+)
+from ..convenience.contracts.loaders.output import (
+    DataError, SendOrderResponseError, TransientErrorResponse
+)
+from fastapi import APIRouter, HTTPException, Request
+from ..convenience.httpclient.httpclient import RequestRejectedError
+from ..convenience.jsoncodec import ModelJSONRoute
 from ..convenience.logs import logs
+from .. import config
 from ..orders import v2 as orders
 
-router = APIRouter()
+router = APIRouter(route_class=ModelJSONRoute)
 
 
 @router.post('/')
@@ -20,12 +27,23 @@ async def create_order(
         order (Order): объект для создания заказа
 
     Возвращаемый результат:
-        (SendOrderResponseSuccess | SendOrderResponseError):
+        (SendOrderResponseSuccess | SendOrderResponseError | SendOrderResponseAccepted):
         SendOrderResponseSuccess при успешном создании заказа
         SendOrderResponseError, если создание заказа не удалось выполнить
+        SendOrderResponseAccepted, если включена асинхронная отправка заказов,
+        результат публикуется в очередь ORDER_RESULTS_QUEUE
+        TransientErrorResponse, если партнер недоступен или перегружен
     '''
     try:
+        if config.ORDER_OUTBOX_PATH:
+            return await request.app.order_submitter.submit(order)
+
         return await orders.create_order(request.app.order_http, request.app.http, order)
+    except RequestRejectedError as e:
+        # Партнер недоступен или перегружен, запрос не отправлялся
+        logs.warning('Request to partner rejected', order_ID=order.order_id, error=str(e))
+        return TransientErrorResponse(message=str(e))
+
     except Exception as e:
         logs.exception_caught('Error while creating order', error=str(e))
         return SendOrderResponseError(
@@ -33,6 +51,36 @@ async def create_order(
         )
 
 
+@router.get('/result')
+async def get_order_result(
+    request: Request,
+    order_id: int
+):
+    '''
+    Результат асинхронного создания заказа.
+
+    GET-параметры:
+        order_id (int): id заказа в нашей системе
+
+    Возвращаемый результат:
+        (SendOrderResponseSuccess | SendOrderResponseError | SendOrderResponseAccepted):
+        ответ, который вернул бы синхронный метод создания заказа,
+        SendOrderResponseAccepted, если заказ еще не отправлен партнеру
+
+    Исключения:
+        HTTPException 404: заказ не принимался или асинхронная отправка выключена.
+    '''
+    result = None
+
+    if config.ORDER_OUTBOX_PATH:
+        result = await request.app.order_submitter.get_result(order_id)
+
+    if result is None:
+        raise HTTPException(status_code=404, detail='Order is not found')
+
+    return result
+
+
 @router.get('/')
 async def get_order_status(
     request: Request,
@@ -54,6 +102,24 @@ async def get_order_status(
     return await orders.get_order_status(request.app.http, order_id, their_order_id)
 
 
+@router.post('/status:batch')
+async def get_orders_statuses(
+    request: Request,
+    orders_data: GetOrderStatusBatchRequest
+):
+    '''
+    Получение статусов списка заказов.
+
+    Аргументы:
+        orders_data (GetOrderStatusBatchRequest): список заказов (order_id, their_order_id)
+
+    Возвращаемый результат:
+        list[GetOrderStatusResponseSuccess | GetOrderStatusResponseError | TransientErrorResponse]:
+        результаты в порядке заказов в запросе, ошибка по заказу не влияет на остальные
+    '''
+    return await orders.get_orders_statuses(request.app.http, orders_data.orders)
+
+
 @router.delete('/')
 async def cancel_order(
     request: Request,
@@ -45,3 +45,12 @@ PARTNERAPI_FIND_ORDERS_RAW_RESPONSE = json.dumps({
         'ids': [PARTNERAPI_ALREADY_EXISTS_ORDER_ID]
     }
 }).encode('utf-8')
+
+
+@pytest.fixture
+def order_index(tmp_path):
+    '''Локальный индекс заказов во временном файле.'''
+    from src.orders import index
+
+    yield index.open_index(str(tmp_path / 'orders.sqlite'), 10)
+    index.close_index()
@@ -0,0 +1 @@
+'''Модуль для тестирования HTTP-клиента.'''
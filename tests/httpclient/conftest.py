@@ -0,0 +1,52 @@
+'''Конфигурация для тестов HTTP-клиента.'''
+import asyncio
+from collections import Counter
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+# Количество обращений к ендпоинтам партнера
+CALLS = web.AppKey('calls', Counter)
+
+
+@pytest.fixture
+async def partner_app():
+    '''Приложение, имитирующее API партнера.'''
+    app = web.Application()
+    app[CALLS] = Counter()
+
+    async def find_orders(request):
+        app[CALLS]['find-orders'] += 1
+        return web.json_response({'data': {'ids': []}})
+
+    async def orders_data(request):
+        app[CALLS]['orders-data'] += 1
+        size = int(request.query.get('size', 0))
+        return web.Response(body=b'x' * size)
+
+    async def fail(request):
+        app[CALLS]['fail'] += 1
+        return web.Response(status=503)
+
+    async def slow(request):
+        # Отвечает медленно только на первый запрос
+        app[CALLS]['slow'] += 1
+        if app[CALLS]['slow'] == 1:
+            await asyncio.sleep(1)
+        return web.Response(body=str(app[CALLS]['slow']).encode())
+
+    app.router.add_get('/find-orders', find_orders)
+    app.router.add_get('/slow', slow)
+    app.router.add_get('/fail', fail)
+    app.router.add_post('/fail', fail)
+    app.router.add_get('/orders-data', orders_data)
+
+    return app
+
+
+@pytest.fixture
+async def partner_server(partner_app):
+    '''Запущенный сервер API партнера.'''
+    async with TestServer(partner_app) as server:
+        yield server
@@ -0,0 +1,530 @@
+'''Тесты HTTP-клиента.'''
+import asyncio
+from unittest.mock import MagicMock
+
+import aiohttp
+import pytest
+from fastapi import Response
+from prometheus_client import REGISTRY
+from yarl import URL as make_url
+
+from src import api
+from src.config import idempotency, rate_limits, sample_rates
+from src.convenience.httpclient import deadline, timing
+from src.convenience.httpclient.breaker import CircuitBreaker
+from src.convenience.httpclient.httpclient import (
+    HTTP,
+    CircuitOpenError,
+    DeadlineExceededError,
+    ResponseError,
+)
+from src.convenience.httpclient.limiter import AdaptiveLimiter, ConcurrencyLimitError
+from src.convenience.httpclient.ratelimit import RateLimitError, RateLimits
+from src.convenience.httpclient.retries import RetryBudget, RetryPolicy
+from src.convenience.logs import logs
+
+from .conftest import CALLS
+
+
+@pytest.mark.asyncio
+class TestHTTP:
+    '''Класс тестирования HTTP-клиента.'''
+
+    async def test_pool_configuration(self, partner_server):
+        '''Тест передачи настроек пула в коннектор.'''
+        async with HTTP(
+            1, 0, 5,
+            name='test_pool',
+            limit=7,
+            limit_per_host=3,
+            keepalive_timeout=5,
+            dns_cache_ttl=60
+        ) as http:
+            assert http.connector.limit == 7
+            assert http.connector.limit_per_host == 3
+
+            _, body = await http.request('GET', str(partner_server.make_url('/find-orders')))
+            assert body == b'{"data": {"ids": []}}'
+
+            # Соединение вернулось в пул
+            assert REGISTRY.get_sample_value(
+                'http_client_pool_connections', {'client': 'test_pool', 'state': 'idle'}
+            ) == 1
+            assert REGISTRY.get_sample_value(
+                'http_client_pool_limit', {'client': 'test_pool'}
+            ) == 7
+            assert REGISTRY.get_sample_value(
+                'http_client_connection_acquire_seconds_count', {'client': 'test_pool'}
+            ) == 1
+
+    async def test_force_close(self, partner_server):
+        '''Тест отключения переиспользования соединений.'''
+        async with HTTP(1, 0, 5, name='test_force_close', force_close=True) as http:
+            await http.request('GET', str(partner_server.make_url('/find-orders')))
+
+            assert http.connector.force_close
+            assert REGISTRY.get_sample_value(
+                'http_client_pool_connections', {'client': 'test_force_close', 'state': 'idle'}
+            ) == 0
+
+    async def test_read_large_body(self, partner_server):
+        '''Тест чтения тела ответа из множества блоков.'''
+        async with HTTP(1, 0, 5, logging_responsed_blocks=False) as http:
+            _, body = await http.request(
+                'GET', str(partner_server.make_url('/orders-data?size=3000000'))
+            )
+
+            assert body == b'x' * 3000000
+
+    async def test_logging_sample_rates(self, partner_server, monkeypatch):
+        '''Тест логирования части запросов к ендпоинту.'''
+        lines = []
+        monkeypatch.setattr(logs, 'write_line', lines.append)
+
+        async with HTTP(1, 0, 5, logging_sample_rates={'GET /orders-data': 0}) as http:
+            await http.request('GET', str(partner_server.make_url('/orders-data?size=10')))
+            assert lines == []
+
+            await http.request('GET', str(partner_server.make_url('/find-orders')))
+            assert [line['message'] for line in lines] == [
+                'Sending HTTP request', 'Received response block'
+            ]
+
+    async def test_logging_sample_rates_config(self):
+        '''Тест разбора и проверки долей логируемых запросов из переменной среды.'''
+        assert sample_rates('GET /orders-data=0.01, POST /create=1') == {
+            'GET /orders-data': 0.01,
+            'POST /create': 1
+        }
+
+        for value in ('/orders-data=0.1', 'GET orders-data=0.1', 'GET /orders-data=2'):
+            with pytest.raises(ValueError):
+                sample_rates(value)
+
+    async def test_response_too_big(self, partner_server):
+        '''Тест ограничения размера тела ответа.'''
+        async with HTTP(1, 0, 5, maximum_body_size=2 ** 20) as http:
+            with pytest.raises(ResponseError, match='Response too big'):
+                await http.request(
+                    'GET', str(partner_server.make_url('/orders-data?size=2000000'))
+                )
+
+    async def test_circuit_breaker(self, partner_server, partner_app, mocker):
+        '''Тест размыкания выключателя при отказах партнера.'''
+        circuit_breaker = {'window_size': 4, 'minimum_calls': 2, 'open_duration': 10}
+        monotonic = mocker.patch(
+            'src.convenience.httpclient.breaker.time.monotonic', return_value=100
+        )
+
+        async with HTTP(1, 0, 5, name='test_breaker', circuit_breaker=circuit_breaker) as http:
+            URL = str(partner_server.make_url('/fail'))
+
+            for _ in range(2):
+                with pytest.raises(aiohttp.ClientResponseError):
+                    await http.request('GET', URL)
+
+            # Выключатель разомкнут, запрос к партнеру не отправляется
+            with pytest.raises(CircuitOpenError):
+                await http.request('GET', URL)
+
+            assert partner_app[CALLS]['fail'] == 2
+            assert REGISTRY.get_sample_value(
+                'http_client_circuit_breaker_state',
+                {'client': 'test_breaker', 'endpoint': 'GET /fail'}
+            ) == 2
+
+            # После паузы пропускается пробный запрос, его неудача снова размыкает выключатель
+            monotonic.return_value = 111
+
+            with pytest.raises(aiohttp.ClientResponseError):
+                await http.request('GET', URL)
+
+            with pytest.raises(CircuitOpenError):
+                await http.request('GET', URL)
+
+            assert partner_app[CALLS]['fail'] == 3
+
+            # Другие ендпоинты не затронуты
+            await http.request('GET', str(partner_server.make_url('/find-orders')))
+
+    @pytest.mark.parametrize('method, calls', [('GET', 3), ('POST', 1)])
+    async def test_retry_idempotent_only(self, partner_server, partner_app, method, calls):
+        '''Тест повтора только идемпотентных запросов при ошибке сервера.'''
+        async with HTTP(3, 0, 5) as http:
+            with pytest.raises(aiohttp.ClientResponseError):
+                await http.request(method, str(partner_server.make_url('/fail')))
+
+            assert partner_app[CALLS]['fail'] == calls
+
+    async def test_endpoint_metrics(self, partner_server):
+        '''Тест метрик времени, попыток, повторов и размера ответов по ендпоинтам.'''
+        async with HTTP(2, 0, 5, name='test_metrics') as http:
+            await http.request('GET', str(partner_server.make_url('/orders-data?size=1000')))
+
+            with pytest.raises(aiohttp.ClientResponseError):
+                await http.request('GET', str(partner_server.make_url('/fail')))
+
+        def sample(name, **labels):
+            return REGISTRY.get_sample_value(name, {'client': 'test_metrics', **labels})
+
+        assert sample(
+            'http_client_request_duration_seconds_count',
+            endpoint='GET /orders-data', status='2xx'
+        ) == 1
+        assert sample(
+            'http_client_request_duration_seconds_count', endpoint='GET /fail', status='5xx'
+        ) == 2
+        assert sample(
+            'http_client_call_duration_seconds_count', endpoint='GET /fail', outcome='error'
+        ) == 1
+        assert sample('http_client_call_attempts_sum', endpoint='GET /orders-data') == 1
+        assert sample('http_client_call_attempts_sum', endpoint='GET /fail') == 2
+        assert sample('http_client_retries_total', endpoint='GET /fail') == 1
+        assert sample('http_client_response_size_bytes_sum', endpoint='GET /orders-data') == 1000
+
+    async def test_request_timeout_header(self, monkeypatch):
+        '''Тест крайнего срока из заголовка, ограниченного сроком по умолчанию.'''
+        monkeypatch.setattr(api, 'REQUEST_TIMEOUT', 10)
+
+        async def call_next(request):
+            return deadline.remaining()
+
+        async def remaining(value):
+            request = MagicMock(headers={} if value is None else {api.TIMEOUT_HEADER: value})
+            return await api.propagate_deadline(request, call_next)
+
+        assert 4 < await remaining('5') <= 5
+        for value in (None, '60', 'nan', 'inf', '0', '-1', 'x'):
+            assert 9 < await remaining(value) <= 10
+
+    async def test_phase_timing(self, partner_server):
+        '''Тест времени фаз запроса в метриках и заголовке Server-Timing.'''
+        async with HTTP(1, 0, 5, name='test_phases') as http:
+            async def call_next(request):
+                await http.request('GET', str(partner_server.make_url('/find-orders')))
+                await http.request('GET', str(partner_server.make_url('/find-orders')))
+                return Response()
+
+            response = await api.add_server_timing(None, call_next)
+
+        def count(phase):
+            return REGISTRY.get_sample_value(
+                'http_client_phase_seconds_count', {'client': 'test_phases', 'phase': phase}
+            )
+
+        # Второй запрос использует соединение из пула
+        assert REGISTRY.get_sample_value(
+            'http_client_connection_acquire_seconds_count', {'client': 'test_phases'}
+        ) == 2
+        assert count('pool_wait') is None
+        assert count('connect') == 1
+        assert count('ttfb') == 2
+
+        phases = [item.split(';')[:2] for item in response.headers['Server-Timing'].split(', ')]
+        assert phases == [
+            ['partner_pool_wait', 'desc="sum of 2"'],
+            ['partner_connect', 'desc="sum of 1"'],
+            ['partner_ttfb', 'desc="sum of 2"']
+        ]
+
+        with timing.collect() as phases:
+            timing.add('dns', 0.001)
+            timing.add('dns', 0.002)
+        assert timing.server_timing(phases) == 'partner_dns;desc="sum of 2";dur=3.0'
+
+    async def test_retry_budget(self, partner_server, partner_app):
+        '''Тест ограничения повторов бюджетом.'''
+        budget = RetryBudget(ratio=0, minimum_per_second=0, maximum=1)
+
+        async with HTTP(3, 0, 5, retry_budget=budget) as http:
+            for _ in range(2):
+                with pytest.raises(aiohttp.ClientResponseError):
+                    await http.request('GET', str(partner_server.make_url('/fail')))
+
+            # Первый запрос израсходовал единственный повтор, второй не повторялся
+            assert partner_app[CALLS]['fail'] == 3
+
+    async def test_deadline_timeout(self, partner_server, partner_app):
+        '''Тест ограничения таймаута попытки оставшимся до крайнего срока временем.'''
+        async with HTTP(1, 0, 5, name='test_deadline') as http:
+            with (
+                deadline.deadline(0.1),
+                pytest.raises(DeadlineExceededError)
+            ):
+                await http.request('GET', str(partner_server.make_url('/slow')))
+
+            assert REGISTRY.get_sample_value(
+                'http_client_deadline_exceeded_total',
+                {'client': 'test_deadline', 'endpoint': 'GET /slow'}
+            ) == 1
+
+    async def test_deadline_timeout_not_failure(self, partner_server, partner_app):
+        '''Тест таймаута по крайнему сроку, не учитываемого выключателем и лимитом.'''
+        async with HTTP(
+            1, 0, 5,
+            name='test_deadline_breaker',
+            circuit_breaker={'minimum_calls': 1},
+            concurrency_limit={'initial_limit': 20}
+        ) as http:
+            with deadline.deadline(0.1), pytest.raises(DeadlineExceededError):
+                await http.request('GET', str(partner_server.make_url('/slow')))
+
+            breaker = http.breakers['GET /slow']
+            assert breaker.state == 'closed'
+            assert len(breaker.results) == 0
+            assert http.limiter.limit == 20
+
+    async def test_deadline_retries(self, partner_server, partner_app):
+        '''Тест отказа от повтора, не успевающего до крайнего срока.'''
+        async with HTTP(3, 1, 5) as http:
+            with (
+                deadline.deadline(0.5),
+                pytest.raises(DeadlineExceededError)
+            ):
+                await http.request('GET', str(partner_server.make_url('/fail')))
+
+            assert partner_app[CALLS]['fail'] == 1
+
+    async def test_nested_deadline(self):
+        '''Тест невозможности продлить внешний крайний срок.'''
+        assert deadline.remaining() is None
+
+        with deadline.deadline(1):
+            with deadline.deadline(10):
+                assert deadline.remaining() <= 1
+
+            with deadline.deadline(0):
+                assert deadline.remaining() <= 1
+
+        assert deadline.remaining() is None
+
+    async def test_hedging(self, partner_server, partner_app):
+        '''Тест дублирования медленного запроса.'''
+        async with HTTP(1, 0, 5, name='test_hedging', hedging={'delay': 0.05}) as http:
+            _, body = await http.request('GET', str(partner_server.make_url('/slow')))
+
+            # Ответ получен от дублирующего запроса
+            assert body == b'2'
+            assert REGISTRY.get_sample_value(
+                'http_client_hedges_won_total',
+                {'client': 'test_hedging', 'endpoint': 'GET /slow'}
+            ) == 1
+
+    async def test_no_hedging_for_post(self, partner_server, partner_app):
+        '''Тест отсутствия дублирования неидемпотентных запросов.'''
+        async with HTTP(1, 0, 5, hedging={'delay': 0.01}) as http:
+            assert http._get_hedger('POST', '/create') is None
+
+    async def test_single_flight(self, partner_server, partner_app):
+        '''Тест объединения одинаковых одновременных запросов.'''
+        async with HTTP(1, 0, 5, name='test_single_flight', single_flight=True) as http:
+            URL = str(partner_server.make_url('/slow'))
+
+            results = await asyncio.gather(*(http.request('GET', URL) for _ in range(3)))
+
+            assert [body for _, body in results] == [b'1'] * 3
+            assert partner_app[CALLS]['slow'] == 1
+            assert len(http.single_flight) == 0
+            assert REGISTRY.get_sample_value(
+                'http_client_coalesced_requests_total',
+                {'client': 'test_single_flight', 'endpoint': 'GET /slow'}
+            ) == 2
+
+    async def test_single_flight_deadline(self, partner_server, partner_app):
+        '''Тест крайнего срока первого вызывающего, не влияющего на объединенные запросы.'''
+        async with HTTP(1, 0, 5, single_flight=True) as http:
+            URL = str(partner_server.make_url('/slow'))
+
+            async def short():
+                with deadline.deadline(0.1):
+                    return await http.request('GET', URL)
+
+            results = await asyncio.gather(
+                short(), http.request('GET', URL), return_exceptions=True
+            )
+
+            assert isinstance(results[0], DeadlineExceededError)
+            assert results[1][1] == b'1'
+            assert partner_app[CALLS]['slow'] == 1
+
+
+    async def test_single_flight_partner_timeout(self, partner_server, partner_app):
+        '''Тест таймаута общего запроса, не считающегося истечением крайнего срока.'''
+        name = 'test_single_flight_timeout'
+
+        async with HTTP(1, 0, 0.2, name=name, single_flight=True) as http:
+            with deadline.deadline(5), pytest.raises(TimeoutError) as error:
+                await http.request('GET', str(partner_server.make_url('/slow')))
+
+        assert not isinstance(error.value, DeadlineExceededError)
+        assert REGISTRY.get_sample_value(
+            'http_client_deadline_exceeded_total', {'client': name, 'endpoint': 'GET /slow'}
+        ) is None
+
+
+class TestRetryPolicy:
+    '''Класс тестирования политики повторов.'''
+
+    @staticmethod
+    def response_error(status, headers=None):
+        return aiohttp.ClientResponseError(
+            aiohttp.RequestInfo(make_url('http://url.ru/create'), 'POST', {}),
+            (),
+            status=status,
+            headers=headers
+        )
+
+    @pytest.mark.parametrize('method, path, status, retryable', [
+        ('GET', '/find-orders', 503, True),
+        ('GET', '/find-orders', 404, False),
+        ('POST', '/create', 503, False),
+        ('POST', '/create', 429, True),
+        ('POST', '/cancel', 503, True)
+    ])
+    def test_is_retryable(self, method, path, status, retryable):
+        '''Тест классификации ошибок ответа.'''
+        policy = RetryPolicy(3, 1, idempotency={('POST', '/cancel'): True})
+
+        assert policy.is_retryable(method, path, self.response_error(status)) == retryable
+
+    def test_idempotency_config(self):
+        '''Тест переопределения идемпотентности из конфигурации.'''
+        rules = idempotency('POST /cancel=true, GET /orders-data=0')
+        policy = RetryPolicy(3, 1, idempotency=rules)
+
+        assert rules == {('POST', '/cancel'): True, ('GET', '/orders-data'): False}
+        assert policy.is_idempotent('POST', '/api/cancel')
+        assert not policy.is_idempotent('GET', '/orders-data')
+
+        with pytest.raises(ValueError):
+            idempotency('/cancel=true')
+
+    def test_never_retry_cancelled(self):
+        '''Тест отказа от повтора отмененного запроса.'''
+        assert not RetryPolicy(3, 1).is_retryable('GET', '/', asyncio.CancelledError())
+
+    def test_delay(self):
+        '''Тест экспоненциального ожидания и заголовка Retry-After.'''
+        policy = RetryPolicy(5, 1, maximum_backoff=3, jitter=False)
+        error = self.response_error(503)
+
+        assert [policy.delay(attempt, error) for attempt in range(1, 5)] == [1, 2, 3, 3]
+        assert policy.delay(1, self.response_error(503, {'Retry-After': '7'})) == 7
+
+
+class TestCircuitBreaker:
+    '''Класс тестирования выключателя.'''
+
+    def test_half_open_client_error(self, mocker):
+        '''Тест пробного запроса с ошибкой клиента, не замыкающего выключатель.'''
+        monotonic = mocker.patch(
+            'src.convenience.httpclient.breaker.time.monotonic', return_value=100
+        )
+        breaker = CircuitBreaker('test_half_open', 'GET /find-orders', minimum_calls=1)
+        breaker.record(0, TestRetryPolicy.response_error(503))
+        assert breaker.state == 'open'
+
+        monotonic.return_value = 200
+        breaker.acquire()
+        breaker.record(0, TestRetryPolicy.response_error(404))
+        assert breaker.state == 'half_open'
+
+        breaker.acquire()
+        breaker.record(0)
+        assert breaker.state == 'closed'
+
+
+class TestAdaptiveLimiter:
+    '''Класс тестирования адаптивного лимита одновременных запросов.'''
+
+    async def test_queue(self):
+        '''Тест ожидания в очереди и отказа при ее переполнении.'''
+        limiter = AdaptiveLimiter('test_limiter', initial_limit=1, maximum_queue=1)
+        release = asyncio.Event()
+
+        async def attempt():
+            await release.wait()
+            return True
+
+        first = asyncio.ensure_future(limiter.run(attempt))
+        second = asyncio.ensure_future(limiter.run(attempt))
+        await asyncio.sleep(0)
+
+        assert limiter.in_flight == 1
+        assert len(limiter.queue) == 1
+
+        # Очередь заполнена, запрос отклоняется сразу
+        with pytest.raises(ConcurrencyLimitError):
+            await limiter.run(attempt)
+
+        release.set()
+        assert await asyncio.gather(first, second) == [True, True]
+        assert limiter.in_flight == 0
+
+    async def test_queue_timeout(self):
+        '''Тест отказа по истечении времени ожидания в очереди.'''
+        limiter = AdaptiveLimiter('test_limiter', initial_limit=1, queue_timeout=0.01)
+        await limiter.acquire()
+
+        with pytest.raises(ConcurrencyLimitError):
+            await limiter.acquire()
+
+        assert not limiter.queue
+        assert limiter.in_flight == 1
+
+    def test_aimd(self):
+        '''Тест роста лимита при успехах и снижения при перегрузке.'''
+        limiter = AdaptiveLimiter('test_limiter', initial_limit=10, backoff_ratio=0.5)
+
+        for _ in range(10):
+            limiter.record(0.1)
+
+        assert 10.9 < limiter.limit < 11
+
+        limiter.record(0.1, TimeoutError())
+        assert 5.4 < limiter.limit < 5.5
+
+
+class TestRateLimits:
+    '''Класс тестирования ограничения частоты запросов.'''
+
+    async def test_token_bucket(self, mocker):
+        '''Тест всплеска, ожидания токена и отказа при долгом ожидании.'''
+        monotonic = mocker.patch(
+            'src.convenience.httpclient.ratelimit.time.monotonic', return_value=0
+        )
+        sleep = mocker.patch('src.convenience.httpclient.ratelimit.asyncio.sleep')
+
+        rate_limits = RateLimits('test_rate_limit', {'POST /create': (2, 2)}, maximum_wait=0.75)
+        bucket = rate_limits.get('POST', '/api/create')
+
+        assert rate_limits.get('GET', '/api/create') is None
+
+        # Всплеск проходит без ожидания
+        await bucket.acquire()
+        await bucket.acquire()
+        sleep.assert_not_called()
+
+        # Следующий токен появится через 1 / rate секунд
+        await bucket.acquire()
+        sleep.assert_awaited_once_with(0.5)
+
+        # Ожидание дольше допустимого - отказ без расхода токена
+        with pytest.raises(RateLimitError):
+            await bucket.acquire()
+
+        monotonic.return_value = 10
+        await bucket.acquire()
+        assert bucket.tokens == 1
+
+    def test_config(self):
+        '''Тест разбора правил из переменной среды.'''
+        assert rate_limits('POST /create=10:20, GET /orders-data=5') == {
+            'POST /create': (10, 20),
+            'GET /orders-data': (5, 5)
+        }
+        assert rate_limits('') == {}
+
+        for value in ('POST /create=0', 'POST /create=-1:5', 'POST /create=1:0'):
+            with pytest.raises(ValueError):
+                rate_limits(value)
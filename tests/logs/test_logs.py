@@ -0,0 +1,230 @@
+'''Тесты логирования.'''
+import json
+import threading
+from decimal import Decimal
+
+from src.convenience.logs import logs
+
+
+class BlockingWrite:
+    '''Запись пачек, ожидающая разрешения.'''
+
+    def __init__(self):
+        self.batches = []
+        self.started = threading.Event()
+        self.released = threading.Event()
+
+    def __call__(self, lines):
+        self.batches.append(lines)
+        self.started.set()
+        self.released.wait(5)
+
+
+def identity(line):
+    return line
+
+
+class TestWriter:
+    '''Класс тестирования записи логов в отдельном потоке.'''
+
+    def test_batches_and_drops(self):
+        '''Тест записи пачкой и отбрасывания записей при переполнении очереди.'''
+        write = BlockingWrite()
+        writer = logs.Writer(2, 10, 'drop', write=write, format=identity)
+
+        writer.put('first')
+        assert write.started.wait(5)
+
+        # Поток записи занят, очередь заполняется, последняя запись отбрасывается
+        writer.put('second')
+        writer.put('third')
+        writer.put('fourth')
+        write.released.set()
+        writer.flush()
+        writer.close()
+
+        assert writer.dropped == 1
+        assert write.batches[0] == ['first']
+        assert write.batches[1][:2] == ['second', 'third']
+        assert write.batches[1][2]['message'] == 'Log lines dropped'
+        assert write.batches[1][2]['arguments'] == {'count': 1, 'total': 1}
+
+    def test_block(self):
+        '''Тест ожидания места в очереди при переполнении.'''
+        write = BlockingWrite()
+        writer = logs.Writer(1, 10, 'block', write=write, format=identity)
+
+        writer.put('first')
+        assert write.started.wait(5)
+        writer.put('second')
+
+        producer = threading.Thread(target=writer.put, args=('third',))
+        producer.start()
+        producer.join(0.1)
+        assert producer.is_alive()
+
+        write.released.set()
+        producer.join(5)
+        writer.close()
+
+        assert writer.dropped == 0
+        assert [line for batch in write.batches for line in batch] == [
+            'first', 'second', 'third'
+        ]
+
+    def test_closed_writes_synchronously(self):
+        '''Тест записи в потоке вызова после остановки.'''
+        batches = []
+        writer = logs.Writer(10, 10, write=batches.append, format=identity)
+        writer.put('first')
+        writer.close()
+        writer.put('second')
+
+        assert batches == [['first'], ['second']]
+
+    def test_format_error(self):
+        '''Тест записи пачки без записей, которые не удалось отформатировать.'''
+        batches = []
+
+        def format(line):
+            if line == 'bad':
+                raise ValueError(line)
+
+            return line
+
+        writer = logs.Writer(10, 10, write=batches.append, format=format)
+        writer.write_batch(['first', 'bad', 'last'])
+        writer.close()
+
+        assert writer.dropped == 1
+        assert batches[0][:2] == ['first', 'last']
+        assert batches[0][2]['arguments'] == {'count': 1, 'total': 1}
+
+
+class TestArguments:
+    '''Класс тестирования копирования аргументов записи.'''
+
+    def test_snapshot(self, monkeypatch):
+        '''Тест записи аргументов в состоянии на момент вызова.'''
+        lines = []
+        monkeypatch.setattr(logs, 'write_line', lines.append)
+        monkeypatch.setattr(logs, 'MAXIMUM_ARGUMENT_SIZE', 0)
+        data = {'items': [1]}
+
+        logs.info('Snapshot', data=data)
+        data['items'].append(2)
+
+        assert lines[0]['arguments'] == {'data': {'items': [1]}}
+
+
+class TestLevel:
+    '''Класс тестирования отбора записей по уровню.'''
+
+    def test_level_gating(self, monkeypatch):
+        '''Тест отбрасывания записей ниже уровня без вычисления аргументов.'''
+        lines = []
+        calls = []
+        monkeypatch.setattr(logs, 'write_line', lines.append)
+
+        def expensive(value):
+            calls.append(value)
+            return value * 2
+
+        try:
+            logs.set_level('info')
+            logs.debug('Skipped', value=logs.Lazy(expensive, 1))
+            logs.info('Written', value=logs.Lazy(expensive, 2))
+
+            assert not logs.is_enabled('debug')
+            assert calls == [2]
+            assert [line['message'] for line in lines] == ['Written']
+            assert lines[0]['arguments'] == {'value': 4}
+            assert lines[0]['module'] == __name__
+        finally:
+            logs.set_level('debug')
+
+
+class TestEncoder:
+    '''Класс тестирования кодирования записей в JSON lines.'''
+
+    def test_json_lines(self):
+        '''Тест кодирования байтов, Decimal, исключений и больших чисел.'''
+        lines = [
+            {'message': 'first', 'arguments': {
+                'block': b'{"status": "ok"}\xff',
+                'price': Decimal('455.23'),
+                'error': ValueError('wrong'),
+                'items': {21737: 2},
+                'big': 2 ** 70
+            }},
+            {'message': 'second', 'arguments': {}}
+        ]
+
+        text = logs.format_lines(lines)
+        decoded = [json.loads(line) for line in text.splitlines()]
+
+        assert text.endswith('\n')
+        assert decoded[0] == {
+            'service': logs.SERVICE,
+            'version': logs.VERSION,
+            'build_number': logs.BUILD_NUMBER,
+            'message': 'first',
+            'arguments': {
+                'block': '{"status": "ok"}\ufffd',
+                'price': '455.23',
+                'error': "ValueError('wrong')",
+                'items': {'21737': 2},
+                'big': 2 ** 70
+            }
+        }
+        assert decoded[1]['message'] == 'second'
+
+    def test_unencodable_arguments(self):
+        '''Тест записи аргументов строкой, если их нельзя закодировать в JSON.'''
+        circular = {}
+        circular['self'] = circular
+        lines = [
+            {'message': 'first', 'arguments': {}},
+            {'message': 'tuple key', 'arguments': {'data': {(1, 2): 'x'}}},
+            {'message': 'circular', 'arguments': {'data': circular}},
+            {'message': 'last', 'arguments': {}}
+        ]
+
+        decoded = [json.loads(line) for line in logs.format_lines(lines).splitlines()]
+
+        assert [line['message'] for line in decoded] == [
+            'first', 'tuple key', 'circular', 'last'
+        ]
+        assert decoded[1]['arguments'] == "{'data': {(1, 2): 'x'}}"
+        assert decoded[2]['arguments'] == "{'data': {'self': {...}}}"
+
+
+class TestVolume:
+    '''Класс тестирования ограничения объема логов.'''
+
+    def test_truncate(self, monkeypatch):
+        '''Тест обрезки длинных строк и байтов в аргументах записи.'''
+        monkeypatch.setattr(logs, 'MAXIMUM_ARGUMENT_SIZE', 4)
+
+        assert logs.truncate({
+            'kwargs': {'data': b'0123456789', 'params': [('id', 'abcdefgh')]},
+            'short': 'abc',
+            'count': 10
+        }) == {
+            'kwargs': {'data': b'0123... [10 total]', 'params': [('id', 'abcd... [8 total]')]},
+            'short': 'abc',
+            'count': 10
+        }
+
+    def test_message_rate_limiter(self, monkeypatch):
+        '''Тест подавления частых записей и подсчета подавленных.'''
+        now = [100.0]
+        monkeypatch.setattr(logs.time, 'monotonic', lambda: now[0])
+        limiter = logs.MessageRateLimiter(2)
+
+        assert [limiter.acquire('block') for _ in range(5)] == [0, 0, None, None, None]
+        assert limiter.acquire('other') == 0
+
+        now[0] += 1
+        assert limiter.acquire('block') == 3
+        assert limiter.acquire('block') == 0
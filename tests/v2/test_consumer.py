@@ -0,0 +1,144 @@
+'''Тесты обработки команд из очереди.'''
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src import config
+from src.consumer import CommandConsumer
+from src.convenience import broker as brokers
+from src.convenience.amqp import AMQPBroker
+from src.convenience.broker import InMemoryBroker
+
+from ..conftest import (
+    PARTNERAPI_FIND_ORDERS_EMPTY_RAW_RESPONSE,
+    PARTNERAPI_ORDER_ID,
+    PARTNERAPI_ORDER_RAW_RESPONSE,
+)
+from .conftest import ORDER_SEND_REQUEST_TYPE_ORDER
+
+
+async def partner_request(method, URL, **kwargs):
+    if '/find-orders' in URL:
+        return None, PARTNERAPI_FIND_ORDERS_EMPTY_RAW_RESPONSE
+
+    if '/orders-data' in URL:
+        return None, json.dumps({
+            'status': 'ok',
+            'data': {'1': {'status': 'done'}, '2': {'status': 'created'}}
+        }).encode()
+
+    if '/cancel' in URL:
+        return None, b'{"status": "ok"}'
+
+    return None, PARTNERAPI_ORDER_RAW_RESPONSE
+
+
+@pytest.mark.asyncio
+class TestConsumer:
+    '''Класс тестирования обработчика команд.'''
+
+    async def test_process_batch(self):
+        '''Тест обработки пачки команд разных типов с подтверждением пачки.'''
+        broker = InMemoryBroker()
+        http = AsyncMock()
+        http.request.side_effect = partner_request
+        order_http = AsyncMock()
+        order_http.request.side_effect = partner_request
+
+        consumer = CommandConsumer(broker, order_http, http, 'commands', 'results', 10, 2)
+
+        commands = [
+            {
+                'command': 'create',
+                'data': json.loads(ORDER_SEND_REQUEST_TYPE_ORDER.model_dump_json()),
+                'correlation_id': 'a'
+            },
+            {'command': 'status', 'data': {'order_id': 1, 'their_order_id': '1'}},
+            {'command': 'status', 'data': {'order_id': 2, 'their_order_id': '2'}},
+            {'command': 'cancel', 'data': {'order_id': 1, 'their_order_id': '1'}},
+            {'command': 'unknown', 'data': {}}
+        ]
+        for command in commands:
+            await broker.publish('commands', json.dumps(command).encode())
+
+        messages = await consumer.receive()
+        assert len(messages) == len(commands)
+
+        await consumer.process(messages)
+        assert not broker.unacked
+
+        results = [
+            json.loads(broker.get_nowait('results').body) for _ in range(len(commands))
+        ]
+        assert results[0]['correlation_id'] == 'a'
+        assert results[0]['response']['their_order_id'] == PARTNERAPI_ORDER_ID
+        assert [result['response']['status_id'] for result in results[1:3]] == [2, 0]
+        assert results[3]['response'] == {'result': 'success'}
+        assert results[4]['response']['result'] == 'invalid_command'
+
+        # Статусы обоих заказов запрошены у партнера одним запросом
+        status_calls = [
+            call for call in http.request.call_args_list if '/orders-data' in call.args[1]
+        ]
+        assert len(status_calls) == 1
+
+    async def test_process_failure_requeues_batch(self, mocker):
+        '''Тест возврата пачки в очередь при ошибке публикации ответов.'''
+        mocker.patch.object(config, 'RABBITMQ_RETRIES_SLEEP', 0)
+        broker = InMemoryBroker()
+        consumer = CommandConsumer(broker, AsyncMock(), AsyncMock(), 'commands', 'results', 10, 2)
+
+        await broker.publish('commands', b'{}')
+        await broker.publish('commands', b'{}')
+        messages = await consumer.receive()
+
+        mocker.patch.object(broker, 'publish', side_effect=ConnectionError)
+        with pytest.raises(ConnectionError):
+            await consumer.process(messages)
+
+        assert not broker.unacked
+        assert broker.queues['commands'].qsize() == 2
+
+    async def test_amqp_broker(self):
+        '''Тест чтения, публикации и подтверждения сообщений RabbitMQ.'''
+        broker = AMQPBroker('amqp://localhost/')
+        broker.channel = MagicMock()
+        broker.channel.declare_queue = AsyncMock()
+        broker.channel.default_exchange.publish = AsyncMock()
+
+        incoming = [AsyncMock(body=b'%d' % tag, delivery_tag=tag) for tag in (1, 2, 3)]
+        broker.buffers['commands'] = asyncio.Queue()
+        for message in incoming:
+            broker.buffers['commands'].put_nowait(message)
+
+        consumer = CommandConsumer(broker, AsyncMock(), AsyncMock(), 'commands', 'results', 2, 1)
+        messages = await consumer.receive()
+        assert [message.body for message in messages] == [b'1', b'2']
+
+        # Пачка подтверждается одним ack по последнему сообщению
+        await broker.ack(messages[-1].delivery_tag, multiple=True)
+        incoming[1].ack.assert_awaited_once_with(multiple=True)
+        incoming[0].ack.assert_not_awaited()
+        assert not broker.unacked
+
+        message = broker.get_nowait('commands')
+        await broker.nack(message.delivery_tag)
+        incoming[2].nack.assert_awaited_once_with(multiple=False, requeue=True)
+
+        await broker.publish('results', b'{}')
+        broker.channel.declare_queue.assert_awaited_once_with('results', durable=True)
+        published = broker.channel.default_exchange.publish.await_args
+        assert published.args[0].body == b'{}'
+        assert published.kwargs == {'routing_key': 'results'}
+
+    async def test_publish_unlimited_retries(self, mocker):
+        '''Тест публикации с неограниченным числом повторов (-1).'''
+        broker = InMemoryBroker()
+        mocker.patch.object(
+            broker, 'publish', side_effect=[ConnectionError, ConnectionError, None]
+        )
+
+        await brokers.publish(broker, 'results', b'{}', 1, -1, 0)
+        assert broker.publish.call_count == 3
@@ -1,7 +1,29 @@
 '''Тесты для сервиса (заказы) 2 версии.'''
+import asyncio
+from decimal import Decimal
+import json
 from unittest.mock import AsyncMock
 
-from src.routers.v2 import cancel_order, create_order
+import aiohttp
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+import yarl
+
+from src.convenience.httpclient import deadline
+from src.convenience.httpclient.httpclient import CircuitOpenError
+from src.convenience.contracts.loaders.input import (
+    GetOrderStatusBatchRequest, GetOrderStatusRequest, OrderClient
+)
+from src.convenience.contracts.loaders.output import (
+    SendOrderResponseSuccess, TransientErrorResponse
+)
+from src import config
+from src.convenience.broker import InMemoryBroker
+from src.convenience.jsoncodec import CodecJSONResponse
+from src.orders import classifier, index, outbox
+from src.routers.v2 import (
+    cancel_order, create_order, get_order_result, get_order_status, get_orders_statuses, router
+)
 import pytest
 
 from .conftest import (
@@ -57,6 +79,131 @@ class TestOrders2:
         # Проверяем, что в ответе вернулся номер заказа
         assert result.their_order_id == PARTNERAPI_ALREADY_EXISTS_ORDER_ID
 
+    async def test_create_order_index(self, order_index, tmp_path):
+        '''Тест создания заказа, ранее созданного этим сервисом, без запросов к партнеру.'''
+        mocked_api_request = AsyncMock()
+        mocked_api_request.app.http.request.return_value = (
+            None,
+            PARTNERAPI_FIND_ORDERS_EMPTY_RAW_RESPONSE
+        )
+        mocked_api_request.app.order_http.request.return_value = (
+            None,
+            PARTNERAPI_ORDER_RAW_RESPONSE
+        )
+
+        await create_order(mocked_api_request, ORDER_SEND_REQUEST_TYPE_ORDER)
+        mocked_api_request.reset_mock()
+
+        result = await create_order(mocked_api_request, ORDER_SEND_REQUEST_TYPE_ORDER)
+        assert result == ORDER_SEND_RESPONSE_SUCCESS
+        mocked_api_request.app.http.request.assert_not_called()
+        mocked_api_request.app.order_http.request.assert_not_called()
+
+        # Индекс сохраняется между перезапусками
+        index.close_index()
+        reopened = index.open_index(str(tmp_path / 'orders.sqlite'), 10)
+        assert reopened.cache == {
+            str(ORDER_SEND_REQUEST_TYPE_ORDER.order_id): PARTNERAPI_ORDER_ID
+        }
+
+    @pytest.mark.parametrize('body', [
+        b'{"status": "ok"}',
+        b'{"status": "ok", "order_id": null}',
+        b'{"status": "ok", "order_id": ""}',
+        ('{"status": "ok", "order_id": "%s"}' % ('1' * 257)).encode()
+    ])
+    async def test_create_order_invalid_id(self, order_index, body):
+        '''Тест ответа создания заказа без корректного ид заказа партнера.'''
+        mocked_api_request = AsyncMock()
+        mocked_api_request.app.http.request.return_value = (
+            None,
+            PARTNERAPI_FIND_ORDERS_EMPTY_RAW_RESPONSE
+        )
+        mocked_api_request.app.order_http.request.return_value = (None, body)
+
+        result = await create_order(mocked_api_request, ORDER_SEND_REQUEST_TYPE_ORDER)
+        assert result == ORDER_SEND_RESPONSE_PARTNER_ERROR
+        assert order_index.cache == {}
+
+    async def test_create_order_async(self, monkeypatch, tmp_path):
+        '''Тест асинхронной отправки заказа через outbox с повтором при ошибке.'''
+        monkeypatch.setattr(config, 'ORDER_OUTBOX_PATH', str(tmp_path / 'outbox.sqlite'))
+        monkeypatch.setattr(config, 'RABBITMQ_RETRIES_SLEEP', 0)
+
+        mocked_api_request = AsyncMock()
+        mocked_api_request.app.http.request.return_value = (
+            None,
+            PARTNERAPI_FIND_ORDERS_EMPTY_RAW_RESPONSE
+        )
+        # Первая попытка создания заказа завершается ошибкой
+        mocked_api_request.app.order_http.request.side_effect = [
+            Exception,
+            (None, PARTNERAPI_ORDER_RAW_RESPONSE)
+        ]
+
+        broker = InMemoryBroker()
+        submitter = mocked_api_request.app.order_submitter = outbox.OrderSubmitter(
+            outbox.Outbox(config.ORDER_OUTBOX_PATH),
+            broker,
+            mocked_api_request.app.order_http,
+            mocked_api_request.app.http,
+            1,
+            config.ORDER_RESULTS_QUEUE
+        )
+
+        result = await create_order(mocked_api_request, ORDER_SEND_REQUEST_TYPE_ORDER)
+        assert result.result == 'accepted'
+        mocked_api_request.app.order_http.request.assert_not_called()
+        assert await get_order_result(
+            mocked_api_request, ORDER_SEND_REQUEST_TYPE_ORDER.order_id
+        ) == result
+
+        # Заказ сохранен и будет отправлен и после перезапуска
+        order_id = ORDER_SEND_REQUEST_TYPE_ORDER.order_id
+        assert outbox.Outbox(config.ORDER_OUTBOX_PATH).unfinished() == [order_id]
+
+        # Повторный прием заказа не ставит его в очередь второй раз
+        await create_order(mocked_api_request, ORDER_SEND_REQUEST_TYPE_ORDER)
+        assert submitter.queue.qsize() == 1
+
+        await submitter.process(submitter.queue.get_nowait())
+
+        message = broker.get_nowait(config.ORDER_RESULTS_QUEUE)
+        assert json.loads(message.body) == {
+            'order_id': order_id,
+            'response': json.loads(ORDER_SEND_RESPONSE_SUCCESS.model_dump_json())
+        }
+        assert submitter.outbox.unfinished() == []
+        assert await get_order_result(mocked_api_request, order_id) == json.loads(
+            ORDER_SEND_RESPONSE_SUCCESS.model_dump_json()
+        )
+
+        with pytest.raises(HTTPException):
+            await get_order_result(mocked_api_request, order_id + 1)
+
+    async def test_create_order_async_requeue(self, monkeypatch, tmp_path):
+        '''Тест повторной обработки заказа после ошибки без перезапуска сервиса.'''
+        monkeypatch.setattr(config, 'RABBITMQ_RETRIES_SLEEP', 0)
+
+        submitter = outbox.OrderSubmitter(
+            outbox.Outbox(str(tmp_path / 'outbox.sqlite')), None, None, None, 1, ''
+        )
+        processed = asyncio.Event()
+
+        async def process(order_id):
+            # Первая обработка завершается ошибкой, например, при недоступном RabbitMQ
+            if not submitter.failures:
+                raise ConnectionError
+            processed.set()
+
+        submitter.process = process
+        worker = asyncio.create_task(submitter._work())
+        submitter.queue.put_nowait(1)
+
+        await asyncio.wait_for(processed.wait(), 1)
+        worker.cancel()
+        assert submitter.failures == {}
+
     @pytest.mark.parametrize('order_http_body', [
         # Общая ошибка в сервисе запроса к партнеру
         (Exception),
@@ -208,3 +355,252 @@ class TestOrders2:
 
         result = await cancel_order(mocked_api_request, ORDER_CANCEL_REQUEST)
         assert result.result == 'transient_error'
+
+    async def test_create_order_circuit_open(self):
+        '''Тест создания заказа - партнер недоступен.'''
+        mocked_api_request = AsyncMock()
+        mocked_api_request.app.http.request.side_effect = CircuitOpenError('Circuit is open')
+        mocked_api_request.app.order_http.request.side_effect = CircuitOpenError(
+            'Circuit is open'
+        )
+
+        result = await create_order(mocked_api_request, ORDER_SEND_REQUEST_TYPE_ORDER)
+        assert isinstance(result, TransientErrorResponse)
+        assert result.message == 'Circuit is open'
+
+    async def test_get_order_status_circuit_open(self):
+        '''Тест получения статуса заказа - партнер недоступен.'''
+        # Мокаем request
+        mocked_api_request = AsyncMock()
+
+        # Имитируем разомкнутый выключатель в HTTP-клиенте
+        mocked_api_request.app.http.request.side_effect = CircuitOpenError('Circuit is open')
+
+        result = await get_order_status(
+            mocked_api_request, int(PARTNERAPI_ORDER_ID), PARTNERAPI_ORDER_ID
+        )
+        assert result.result == 'transient_error'
+
+    async def test_get_order_status_batched(self):
+        '''Тест объединения одновременных запросов статусов в один запрос к партнеру.'''
+        # Мокаем request
+        mocked_api_request = AsyncMock()
+
+        # Имитируем ответ от Партнера со статусами двух заказов
+        mocked_api_request.app.http.request.return_value = (
+            None,
+            json.dumps({
+                'status': 'ok',
+                'data': {'1': {'status': 'created'}, '2': {'status': 'done'}}
+            }).encode('utf-8')
+        )
+
+        results = await asyncio.gather(
+            get_order_status(mocked_api_request, 1, '1'),
+            get_order_status(mocked_api_request, 2, '2')
+        )
+
+        assert [result.status_id for result in results] == [0, 2]
+        # Партнеру отправлен один запрос со списком заказов
+        mocked_api_request.app.http.request.assert_awaited_once()
+        assert mocked_api_request.app.http.request.await_args.args[1].endswith(
+            '/orders-data?order_ids=1,2'
+        )
+
+    async def test_get_order_status_batched_deadline(self):
+        '''Тест крайнего срока одного запроса статуса, не влияющего на объединенный запрос.'''
+        mocked_api_request = AsyncMock()
+        remaining = []
+
+        async def partner_request(method, URL, **kwargs):
+            remaining.append(deadline.remaining())
+            await asyncio.sleep(0.1)
+            return None, b'{"status": "ok", "data": {"3": {"status": "created"}}}'
+
+        mocked_api_request.app.http.request.side_effect = partner_request
+
+        async def short():
+            with deadline.deadline(0.05):
+                return await get_order_status(mocked_api_request, 4, '4')
+
+        results = await asyncio.gather(short(), get_order_status(mocked_api_request, 3, '3'))
+
+        assert isinstance(results[0], TransientErrorResponse)
+        assert results[1].status_id == 0
+        # Общий запрос к партнеру выполняется без крайнего срока первого вызывающего
+        assert remaining == [None]
+
+    async def test_get_order_status_batched_invalid_order(self):
+        '''Тест ошибки контракта в данных одного заказа объединенного запроса.'''
+        mocked_api_request = AsyncMock()
+        mocked_api_request.app.http.request.return_value = (
+            None,
+            b'{"status": "ok", "data": {"1": {"status": null}, "2": {"status": "done"}}}'
+        )
+
+        results = await asyncio.gather(
+            get_order_status(mocked_api_request, 1, '1'),
+            get_order_status(mocked_api_request, 2, '2')
+        )
+
+        assert results[0].result == 'error'
+        assert results[0].message.startswith('Invalid partner response for order 1')
+        assert results[1].status_id == 2
+        mocked_api_request.app.http.request.assert_awaited_once()
+
+    async def test_get_order_status_batched_split(self):
+        '''Тест повторного запроса частей списка, отклоненного партнером из-за одного заказа.'''
+        mocked_api_request = AsyncMock()
+        URLs = []
+
+        async def partner_request(method, URL, **kwargs):
+            URLs.append(URL)
+            their_order_ids = yarl.URL(URL).query['order_ids'].split(',')
+
+            # Партнер отклоняет любой список, содержащий некорректный заказ
+            if 'x&y' in their_order_ids:
+                return None, b'{"status": "error", "errors": ["Invalid order id"]}'
+
+            return None, json.dumps({
+                'status': 'ok',
+                'data': {their_order_id: {'status': 'done'} for their_order_id in their_order_ids}
+            }).encode()
+
+        mocked_api_request.app.http.request.side_effect = partner_request
+
+        results = await asyncio.gather(
+            get_order_status(mocked_api_request, 1, '1'),
+            get_order_status(mocked_api_request, 2, 'x&y'),
+            get_order_status(mocked_api_request, 3, '3')
+        )
+
+        assert [result.result for result in results] == ['success', 'error', 'success']
+        # Идентификаторы заказов кодируются в запросе
+        assert URLs[0].endswith('/orders-data?order_ids=1,x%26y,3')
+        assert len(URLs) == 5
+
+    async def test_get_orders_statuses(self, mocker):
+        '''Тест получения статусов списка заказов частями с ошибками по отдельным заказам.'''
+        mocker.patch('src.config.ORDER_STATUS_BATCH_MAXIMUM_SIZE', 2)
+
+        # Мокаем request
+        mocked_api_request = AsyncMock()
+
+        # Первая часть заказов получена, вторая - ошибка партнера
+        mocked_api_request.app.http.request.side_effect = [
+            (None, b'{"status": "ok", "data": {"1": {"status": "done"}}}'),
+            (None, b'{"status": "error", "errors": ["Internal error"]}')
+        ]
+
+        result = await get_orders_statuses(
+            mocked_api_request,
+            GetOrderStatusBatchRequest(orders=[
+                GetOrderStatusRequest(order_id=order_id, their_order_id=str(order_id))
+                for order_id in (1, 2, 3)
+            ])
+        )
+
+        assert [item.result for item in result] == ['success', 'error', 'error']
+        assert result[0].status_id == 2
+        assert mocked_api_request.app.http.request.await_count == 2
+
+    async def test_partner_contract_violation(self):
+        '''Тест разбора ответов партнера, не соответствующих контракту.'''
+        mocked_api_request = AsyncMock()
+
+        # Поиск заказа вернул ответ без списка заказов
+        mocked_api_request.app.http.request.return_value = (None, b'{"data": {}}')
+        result = await create_order(mocked_api_request, ORDER_SEND_REQUEST_TYPE_ORDER)
+        assert result == ORDER_SEND_RESPONSE_PARTNER_ERROR
+
+        # Статус заказа вернулся не строкой
+        mocked_api_request.app.http.request.return_value = (
+            None,
+            b'{"status": "ok", "data": {"1": {"status": null}}}'
+        )
+        result = await get_order_status(mocked_api_request, 1, '1')
+        assert result.result == 'error'
+        assert result.message.startswith('Invalid partner response')
+
+    async def test_response_codec(self):
+        '''Тест сериализации ответа кодеком, совпадающей со стандартной.'''
+        content = ORDER_SEND_RESPONSE_SUCCESS.model_dump(mode='json')
+
+        response = CodecJSONResponse(content)
+        assert json.loads(response.body) == content
+        assert CodecJSONResponse({'price': Decimal('1.50')}).body == b'{"price":"1.50"}'
+
+    async def test_route_serializes_model(self):
+        '''Тест сериализации модели ответа маршрутом, совпадающей с FastAPI.'''
+        mocked_api_request = AsyncMock()
+        mocked_api_request.app.http.request.return_value = (
+            None,
+            PARTNERAPI_FIND_ORDERS_EMPTY_RAW_RESPONSE
+        )
+        mocked_api_request.app.order_http.request.return_value = (
+            None,
+            PARTNERAPI_ORDER_RAW_RESPONSE
+        )
+
+        route = next(route for route in router.routes if route.name == 'create_order')
+        response = await route.endpoint(mocked_api_request, ORDER_SEND_REQUEST_TWO_ITEMS)
+
+        assert response.media_type == 'application/json'
+        assert json.loads(response.body) == jsonable_encoder(SendOrderResponseSuccess(
+            their_order_id=PARTNERAPI_ORDER_ID,
+            items=ORDER_SEND_REQUEST_TWO_ITEMS.items
+        ))
+
+    async def test_create_order_form(self):
+        '''Тест тела запроса создания заказа, совпадающего с aiohttp.FormData.'''
+        mocked_api_request = AsyncMock()
+        mocked_api_request.app.http.request.return_value = (
+            None,
+            PARTNERAPI_FIND_ORDERS_EMPTY_RAW_RESPONSE
+        )
+        mocked_api_request.app.order_http.request.return_value = (
+            None,
+            PARTNERAPI_ORDER_RAW_RESPONSE
+        )
+
+        order = ORDER_SEND_REQUEST_TWO_ITEMS.model_copy(
+            update={'client': OrderClient(name='Иван И.', phone='+7 999', email='a&b@c.ru')}
+        )
+        await create_order(mocked_api_request, order)
+
+        form = aiohttp.FormData([
+            ('shop_id', order.their_pharmacy_id),
+            ('phone', order.client.phone),
+            ('first_name', order.client.name),
+            ('email', order.client.email),
+            ('external_id', order.order_id)
+        ])
+        for item in order.items:
+            form.add_field('ids[]', item.their_id)
+            form.add_field('quantity[]', item.count)
+            form.add_field('prices[]', item.price)
+
+        kwargs = mocked_api_request.app.order_http.request.await_args.kwargs
+        assert kwargs['data'] == form()._value
+        assert kwargs['headers'] == {'Content-Type': 'application/x-www-form-urlencoded'}
+
+    async def test_item_errors_classifier(self):
+        '''Тест табличной классификации сообщений партнера об ошибках.'''
+        errors = classifier.ErrorClassifier(
+            exact={'Item not found': classifier.ITEM_NOT_FOUND},
+            patterns=[
+                ('Wrong price', classifier.WRONG_PRICE),
+                ('Wrong', classifier.WRONG_QUANTITY)
+            ]
+        )
+
+        assert errors.classify('Item not found') == classifier.ITEM_NOT_FOUND
+        assert errors.classify(
+            'Wrong price: current price is 1.50 or NONE'
+        ) == classifier.WRONG_PRICE
+        assert errors.classify('Wrong quantity') == classifier.WRONG_QUANTITY
+        assert errors.classify('Unknown error') is None
+
+        message = 'Wrong price: current price is 641.52 or NONE'
+        assert classifier.get_available_price(message, reserve=True) == Decimal('641.52')
+        assert classifier.get_available_price(message, reserve=False) == 0